@@ -1,5 +1,6 @@
 from dweam.game import Game
 from dweam.models import GameInfo, Field
 from dweam.utils.entrypoint import get_cache_dir
+from dweam.weights import load_weights
 
-__all__ = ["Game", "GameInfo", "Field", "get_cache_dir"]
+__all__ = ["Game", "GameInfo", "Field", "get_cache_dir", "load_weights"]
@@ -0,0 +1,73 @@
+"""
+Benchmark looking up installed packages in a venv with `pip show` against reading its dist-info directly.
+
+Times both ways of finding each package's install location, which the loader does for every
+game package (and dweam itself) on startup:
+    python -m dweam.benchmarks.distinfo --venv ~/.cache/dweam/venv --package dweam -n 20
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from dweam.utils.distinfo import find_distribution, get_editable_location, get_install_location
+from dweam.utils.venv import get_pip_path
+
+
+def lookup_with_pip(venv_path: Path, name: str) -> Path | None:
+    """The old lookup: run `pip show` in the venv and parse its output"""
+    result = subprocess.run([str(get_pip_path(venv_path)), "show", name], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    location = None
+    for line in result.stdout.splitlines():
+        if line.startswith("Editable project location: "):
+            return Path(line.split(": ", 1)[1])
+        if line.startswith("Location: "):
+            location = Path(line.split(": ", 1)[1])
+    return location
+
+
+def lookup_in_process(venv_path: Path, name: str) -> Path | None:
+    dist = find_distribution(venv_path, name)
+    if dist is None:
+        return None
+    return get_editable_location(dist) or get_install_location(dist)
+
+
+def time_lookups(lookup, venv_path: Path, packages: list[str], iterations: int) -> list[float]:
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        for name in packages:
+            lookup(venv_path, name)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--venv", type=Path, default=Path(sys.prefix), help="venv to look packages up in (default: the current one)")
+    parser.add_argument("--package", action="append", dest="packages", help="package to look up, can be repeated (default: dweam)")
+    parser.add_argument("-n", "--iterations", type=int, default=10, help="times to look up every package with each method")
+    args = parser.parse_args()
+    packages = args.packages or ["dweam"]
+
+    for name in packages:
+        pip_location = lookup_with_pip(args.venv, name)
+        local_location = lookup_in_process(args.venv, name)
+        match = "" if pip_location == local_location else "  MISMATCH"
+        print(f"{name}: pip show={pip_location}, dist-info={local_location}{match}")
+
+    for label, lookup in [("pip show", lookup_with_pip), ("dist-info", lookup_in_process)]:
+        durations = time_lookups(lookup, args.venv, packages, args.iterations)
+        print(
+            f"{label:>10}: median {statistics.median(durations) * 1000:8.2f} ms, "
+            f"min {min(durations) * 1000:8.2f} ms for {len(packages)} package(s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Replay a recorded input trace through a game, headless, and report how fast it stepped.
+
+The game is created in this process (no worker, WebRTC or window) and stepped through its game loop,
+with every recorded input (and params update) posted right before the step that saw it live.
+The same trace on the same game steps the same way, so runs of different package versions or hosts
+can be compared on identical work:
+    DWEAM_RECORD=1 ...  # play a session, then
+    python -m dweam.benchmarks.replay ~/.dweam/cache/recordings/<session> --json before.json
+
+Reports step latency percentiles, throughput, peak RSS, and a checksum of all frames
+(`--checksums` writes one per frame, to find where two runs diverge).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Any
+
+from dweam.log_config import get_logger
+from dweam.recording import RecordedInput, Recording, read_inputs, surface_to_array
+from dweam.utils.compile_cache import export_compile_cache_env
+from dweam.utils.entrypoint import load_games
+from dweam.utils.resources import get_process_rss
+
+
+def get_peak_rss() -> int | None:
+    """Peak resident set size of this process in bytes"""
+    try:
+        import resource
+    except ImportError:
+        return get_process_rss()
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def seed_everything(seed: int) -> None:
+    random.seed(seed)
+    if "numpy" in sys.modules:
+        sys.modules["numpy"].random.seed(seed)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def replay(
+    log,
+    game_type: str,
+    game_id: str,
+    inputs: list[RecordedInput],
+    steps: int,
+    realtime: bool = False,
+    fps: int = 30,
+    seed: int = 0,
+    checksums_path: Path | None = None,
+) -> dict[str, Any]:
+    import pygame
+
+    games = load_games(log)
+    game_info = games.get(game_type, {}).get(game_id)
+    if game_info is None:
+        sys.exit(f"Game {game_type}/{game_id} not found")
+    if game_info._metadata is not None and game_info._metadata._package_name is not None:
+        export_compile_cache_env(log, game_info._metadata._package_name)
+    implementation = game_info.get_implementation()
+
+    seed_everything(seed)
+    game = implementation(log=log, game_id=game_id)
+    warmup_start = time.perf_counter()
+    game.warmup()
+    warmup_seconds = time.perf_counter() - warmup_start
+
+    pending = deque(sorted(inputs, key=lambda item: item.step))
+    durations: list[float] = []
+    digest = hashlib.sha256()
+    checksums = open(checksums_path, "w") if checksums_path is not None else None
+    clock = pygame.time.Clock()
+    start = time.perf_counter()
+    try:
+        for _ in range(steps):
+            while pending and pending[0].step <= game.stats.metrics.steps:
+                event = pending.popleft().event
+                if event.get("type") == "params":
+                    game.on_params_update(implementation.Params.model_validate(event["params"]))
+                    continue
+                game.post_input(event)
+
+            step = game.stats.metrics.steps
+            tick_start = time.perf_counter()
+            surface = game._tick()
+            durations.append(time.perf_counter() - tick_start)
+
+            if surface is not None:
+                frame = surface_to_array(surface)
+                digest.update(frame.tobytes())
+                if checksums is not None:
+                    checksums.write(f"{step} {frame.shape[1]}x{frame.shape[0]} {zlib.crc32(frame.data):08x}\n")
+            if realtime:
+                clock.tick(fps)
+    finally:
+        if checksums is not None:
+            checksums.close()
+    total_seconds = time.perf_counter() - start
+
+    return {
+        "game_type": game_type,
+        "game_id": game_id,
+        "pace": f"realtime ({fps} fps)" if realtime else "fast",
+        "steps": len(durations),
+        "inputs": len(inputs) - len(pending),
+        "warmup_seconds": warmup_seconds,
+        "total_seconds": total_seconds,
+        "steps_per_second": len(durations) / total_seconds if total_seconds > 0 else 0.0,
+        "step_ms": {
+            "mean": statistics.fmean(durations) * 1000,
+            "p50": percentile(durations, 0.5) * 1000,
+            "p90": percentile(durations, 0.9) * 1000,
+            "p99": percentile(durations, 0.99) * 1000,
+            "max": max(durations) * 1000,
+        },
+        "peak_rss_bytes": get_peak_rss(),
+        "frames_sha256": digest.hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("trace", type=Path, help="a session recording dir, or an inputs.jsonl file")
+    parser.add_argument("--type", help="game type (default: the recording's)")
+    parser.add_argument("--id", help="game id (default: the recording's)")
+    parser.add_argument("--steps", type=int, help="steps to run (default: as many as were recorded)")
+    parser.add_argument("--realtime", action="store_true", help="step at the live frame rate instead of as fast as possible")
+    parser.add_argument("--fps", type=int, default=30, help="frame rate for --realtime")
+    parser.add_argument("--seed", type=int, default=0, help="seed for python, numpy and torch RNGs")
+    parser.add_argument("--checksums", type=Path, help="write a checksum of every frame to this file")
+    parser.add_argument("--json", type=Path, help="write the results to this file as JSON")
+    args = parser.parse_args()
+
+    # No window or audio device
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("DWEAM_BUILTIN_GAMES", "1")
+
+    game_type, game_id, steps = args.type, args.id, args.steps
+    if args.trace.is_dir():
+        recording = Recording(args.trace)
+        inputs = recording.inputs()
+        game_type = game_type or recording.meta.game_type
+        game_id = game_id or recording.meta.game_id
+        if steps is None:
+            index = recording.frame_index()
+            if len(index):
+                steps = int(index["step"].max()) + 1
+    else:
+        inputs = read_inputs(args.trace)
+    if game_type is None or game_id is None:
+        sys.exit("--type and --id are needed to replay an input log")
+    if steps is None:
+        steps = max((item.step for item in inputs), default=0) + 1
+
+    results = replay(
+        get_logger(), game_type, game_id, inputs, steps,
+        realtime=args.realtime, fps=args.fps, seed=args.seed, checksums_path=args.checksums,
+    )
+
+    step_ms = results["step_ms"]
+    peak_rss = results["peak_rss_bytes"]
+    print(f"{game_type}/{game_id}: {results['steps']} steps, {results['inputs']} inputs, {results['pace']}")
+    print(f"warmup:     {results['warmup_seconds']:8.3f} s")
+    print(f"throughput: {results['steps_per_second']:8.1f} steps/s over {results['total_seconds']:.2f} s")
+    print(
+        f"step:       mean {step_ms['mean']:.2f} ms, p50 {step_ms['p50']:.2f} ms, p90 {step_ms['p90']:.2f} ms, "
+        f"p99 {step_ms['p99']:.2f} ms, max {step_ms['max']:.2f} ms"
+    )
+    print(f"peak rss:   {peak_rss / 2**20:8.1f} MiB" if peak_rss is not None else "peak rss:   unknown")
+    print(f"frames:     sha256 {results['frames_sha256']}")
+    if args.json is not None:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
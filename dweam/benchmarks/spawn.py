@@ -0,0 +1,77 @@
+"""
+Benchmark the time from spawning a game worker to it being ready for commands, started directly or forked from a zygote.
+
+Spawns workers for the builtin test pattern game (or any installed game) one after another and times
+`GameWorker.start`, which returns once the worker has imported its runtime and connected back:
+    python -m dweam.benchmarks.spawn --venv ~/.dweam/dweam-venv -n 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from dweam.log_config import get_logger
+from dweam.models import GameInfo
+from dweam.utils.entrypoint import load_games
+from dweam.worker import GameWorker
+from dweam.zygote import get_zygote, is_zygote_supported, stop_zygotes
+
+
+async def time_spawns(log, venv_path: Path, game_type: str, game_id: str, game_info: GameInfo, iterations: int) -> list[float]:
+    durations = []
+    for i in range(iterations):
+        worker = GameWorker(log, game_info, f"bench-{i}", game_type, game_id, venv_path)
+        start = time.perf_counter()
+        await worker.start()
+        durations.append(time.perf_counter() - start)
+        await worker.cleanup()
+    return durations
+
+
+async def run(venv_path: Path, game_type: str, game_id: str, iterations: int) -> None:
+    log = get_logger()
+    games = load_games(log)
+    game_info = games.get(game_type, {}).get(game_id)
+    if game_info is None:
+        sys.exit(f"Game {game_type}/{game_id} not found")
+
+    modes = ["direct"]
+    if is_zygote_supported():
+        modes.append("zygote")
+    else:
+        print("Zygotes aren't supported on this platform, only timing direct spawns")
+
+    for mode in modes:
+        os.environ["DWEAM_ZYGOTE"] = "1" if mode == "zygote" else "0"
+        if mode == "zygote":
+            start = time.perf_counter()
+            if await get_zygote(log, venv_path) is None:
+                print("Zygote failed to start, see the log")
+                continue
+            print(f"zygote startup: {time.perf_counter() - start:8.3f} s (once per venv)")
+        durations = await time_spawns(log, venv_path, game_type, game_id, game_info, iterations)
+        print(
+            f"{mode:>8}: median {statistics.median(durations):8.3f} s, "
+            f"min {min(durations):8.3f} s, max {max(durations):8.3f} s over {iterations} spawn(s)"
+        )
+    await stop_zygotes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--venv", type=Path, default=Path(sys.prefix), help="venv to run workers in (default: the current one)")
+    parser.add_argument("--type", default="Dweam", help="game type")
+    parser.add_argument("--id", default="test_pattern", help="game id")
+    parser.add_argument("-n", "--iterations", type=int, default=5, help="workers to spawn with each method")
+    args = parser.parse_args()
+
+    # Workers look the game up themselves, and inherit this
+    os.environ.setdefault("DWEAM_BUILTIN_GAMES", "1")
+    asyncio.run(run(args.venv, args.type, args.id, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
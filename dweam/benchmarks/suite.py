@@ -0,0 +1,346 @@
+"""
+Benchmark each stage of the game pipeline on the CPU, with the builtin reference games.
+
+Stages are timed separately, so a regression points at the stage it's in:
+    step/<game>         the game loop (`Game._tick`) as fast as it goes
+    run/<game>          `Game.run` in its thread, with frames taken from the frame buffer at the video track's pace
+    frame_buffer        the handoff of a frame from the game thread to the event loop
+    recv/<resolution>   the conversion `GameVideoTrack.recv` does from surface to video frame
+    input/...           posting input messages, and a step handling them
+    commands/<command>  a round trip of the worker command channel, to a spawned worker
+
+Results are written as JSON, and compared against an earlier run's JSON as a baseline:
+    python -m dweam.benchmarks.suite --output baseline.json
+    python -m dweam.benchmarks.suite --baseline baseline.json --threshold 0.15
+
+Exits with status 1 when a benchmark's main metric got worse than the baseline by more than the threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from dweam.log_config import get_logger
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    metrics: dict[str, float]
+    # The metric compared against the baseline
+    primary: str
+    higher_is_better: bool
+
+
+# (name, game id, params) of the games whose loop is benchmarked
+REFERENCE_GAMES = [
+    ("test_pattern-320x240", "test_pattern", {}),
+    ("noise-320x240", "noise", {}),
+    ("noise-1280x720", "noise", {"width": 1280, "height": 720}),
+    ("conv_model-160x120", "conv_model", {}),
+    ("conv_model-320x240", "conv_model", {"width": 320, "height": 240}),
+]
+RUN_GAMES = ["test_pattern-320x240", "noise-320x240", "conv_model-160x120"]
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+STAGES = ["step", "run", "frame_buffer", "recv", "input", "commands"]
+
+INPUT_MESSAGES = [
+    {"type": "keydown", "key": 87},
+    {"type": "mousemove", "movementX": 3, "movementY": -2},
+    {"type": "keyup", "key": 87},
+    {"type": "mousedown", "button": 0},
+    {"type": "mouseup", "button": 0},
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def timed_loop(fn: Callable[[], Any], duration: float, min_iterations: int = 5) -> list[float]:
+    """Call `fn` repeatedly for `duration` seconds, returning how long each call took"""
+    durations = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end or len(durations) < min_iterations:
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def latency_metrics(durations: list[float], rate_name: str) -> dict[str, float]:
+    return {
+        rate_name: len(durations) / sum(durations),
+        "mean_ms": statistics.fmean(durations) * 1000,
+        "p50_ms": percentile(durations, 0.5) * 1000,
+        "p99_ms": percentile(durations, 0.99) * 1000,
+    }
+
+
+def create_game(games: dict, game_id: str, params: dict):
+    log = get_logger()
+    implementation = games["Dweam"][game_id].get_implementation()
+    game = implementation(log=log, game_id=game_id)
+    if params:
+        game.on_params_update(implementation.Params.model_validate(params))
+    return game
+
+
+def create_static_game():
+    """A game whose step costs nothing, to time what's around the step"""
+    import pygame
+
+    from dweam.game import Game
+
+    class StaticGame(Game):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.surface = pygame.Surface((320, 240))
+
+        def step(self) -> pygame.Surface:
+            return self.surface
+
+    return StaticGame(log=get_logger(), game_id="static")
+
+
+def bench_step(games: dict, duration: float) -> list[BenchmarkResult]:
+    results = []
+    for name, game_id, params in REFERENCE_GAMES:
+        game = create_game(games, game_id, params)
+        # The first steps allocate
+        for _ in range(3):
+            game._tick()
+        durations = timed_loop(game._tick, duration)
+        results.append(BenchmarkResult(f"step/{name}", latency_metrics(durations, "steps_per_second"), "steps_per_second", True))
+    return results
+
+
+async def consume_frames(game, duration: float) -> list[float]:
+    """Take frames from the game like `GameVideoTrack.recv` does, returning when each arrived"""
+    arrivals = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        await asyncio.sleep(1 / 30)
+        try:
+            await asyncio.wait_for(game.get_next_frame(), timeout=1)
+        except asyncio.TimeoutError:
+            continue
+        arrivals.append(time.perf_counter())
+    return arrivals
+
+
+def bench_run(games: dict, duration: float) -> list[BenchmarkResult]:
+    results = []
+    for name, game_id, params in REFERENCE_GAMES:
+        if name not in RUN_GAMES:
+            continue
+        game = create_game(games, game_id, params)
+        game.start()
+        try:
+            arrivals = asyncio.run(consume_frames(game, duration))
+        finally:
+            game.stop()
+        intervals = [b - a for a, b in zip(arrivals, arrivals[1:])] or [float("inf")]
+        steps = game.stats.metrics.steps
+        results.append(BenchmarkResult(f"run/{name}", {
+            "frames_per_second": len(arrivals) / duration,
+            "steps_per_second": steps / duration,
+            "dropped_fraction": game.stats.metrics.frames_dropped / steps if steps else 0.0,
+            "interval_p50_ms": percentile(intervals, 0.5) * 1000,
+            "interval_p99_ms": percentile(intervals, 0.99) * 1000,
+        }, "frames_per_second", True))
+    return results
+
+
+def bench_frame_buffer(duration: float) -> list[BenchmarkResult]:
+    from dweam.game import FrameBuffer
+
+    class TimedFrameBuffer(FrameBuffer[Any]):
+        """Stamps every frame with when the game thread put it"""
+        def put(self, surface):
+            return super().put((time.perf_counter(), surface))
+
+    async def consume(game) -> list[float]:
+        game._frame_buffer = TimedFrameBuffer()
+        game.start()
+        latencies = []
+        end = time.perf_counter() + duration
+        try:
+            while time.perf_counter() < end:
+                try:
+                    put_at, _ = await asyncio.wait_for(game.get_next_frame(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                latencies.append(time.perf_counter() - put_at)
+        finally:
+            game.stop()
+        return latencies
+
+    latencies = asyncio.run(consume(create_static_game())) or [float("inf")]
+    return [BenchmarkResult("frame_buffer", {
+        "frames": len(latencies),
+        "handoff_p50_ms": percentile(latencies, 0.5) * 1000,
+        "handoff_p99_ms": percentile(latencies, 0.99) * 1000,
+    }, "handoff_p50_ms", False)]
+
+
+def bench_recv(duration: float) -> list[BenchmarkResult]:
+    import numpy as np
+    import pygame
+
+    from dweam.game_process import surface_to_video_frame
+
+    results = []
+    rng = np.random.default_rng(0)
+    for width, height in RESOLUTIONS:
+        surface = pygame.surfarray.make_surface(rng.integers(0, 256, (width, height, 3), dtype=np.uint8))
+        durations = timed_loop(lambda: surface_to_video_frame(surface), duration)
+        results.append(BenchmarkResult(f"recv/{width}x{height}", latency_metrics(durations, "frames_per_second"), "frames_per_second", True))
+    return results
+
+
+def bench_input(duration: float) -> list[BenchmarkResult]:
+    game = create_static_game()
+
+    def post_and_drain():
+        for message in INPUT_MESSAGES:
+            game.post_input(message)
+        game._tick()
+
+    # Posting alone (drained every 1000 posts, as pygame's event queue is bounded)
+    posts = 0
+    post_durations = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        for i in range(1000):
+            game.post_input(INPUT_MESSAGES[i % len(INPUT_MESSAGES)])
+        post_durations.append((time.perf_counter() - start) / 1000)
+        posts += 1000
+        game._tick()
+
+    tick_durations = timed_loop(post_and_drain, duration)
+    return [
+        BenchmarkResult("input/post", latency_metrics(post_durations, "posts_per_second") | {"posts": posts}, "posts_per_second", True),
+        BenchmarkResult(f"input/tick-{len(INPUT_MESSAGES)}", latency_metrics(tick_durations, "ticks_per_second"), "ticks_per_second", True),
+    ]
+
+
+def bench_commands(games: dict, duration: float) -> list[BenchmarkResult]:
+    from dweam.commands import MetricsCommand, SchemaCommand
+    from dweam.worker import GameWorker
+
+    async def run() -> list[BenchmarkResult]:
+        log = get_logger()
+        worker = GameWorker(log, games["Dweam"]["test_pattern"], "bench-commands", "Dweam", "test_pattern", Path(sys.prefix))
+        start = time.perf_counter()
+        await worker.start()
+        spawn_seconds = time.perf_counter() - start
+        results = []
+        try:
+            for name, command in [("metrics", MetricsCommand()), ("schema", SchemaCommand())]:
+                durations = []
+                end = time.perf_counter() + duration
+                while time.perf_counter() < end or len(durations) < 5:
+                    start = time.perf_counter()
+                    await worker._send_command(command)
+                    durations.append(time.perf_counter() - start)
+                metrics = latency_metrics(durations, "round_trips_per_second") | {"spawn_seconds": spawn_seconds}
+                results.append(BenchmarkResult(f"commands/{name}", metrics, "p50_ms", False))
+        finally:
+            await worker.cleanup()
+        return results
+
+    return asyncio.run(run())
+
+
+def compare(results: list[BenchmarkResult], baseline: dict, threshold: float) -> list[str]:
+    """Print how each benchmark's main metric changed from the baseline, returning the ones that regressed"""
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    for result in results:
+        previous = baseline_results.get(result.name)
+        if previous is None or result.primary not in previous["metrics"]:
+            print(f"{result.name:32} {result.primary}: {result.metrics[result.primary]:12.3f} (not in baseline)")
+            continue
+        before, after = previous["metrics"][result.primary], result.metrics[result.primary]
+        change = (after - before) / before if before else 0.0
+        regressed = change < -threshold if result.higher_is_better else change > threshold
+        if regressed:
+            regressions.append(result.name)
+        print(
+            f"{result.name:32} {result.primary}: {before:12.3f} -> {after:12.3f} ({change:+7.1%})"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=2.0, help="seconds to run each benchmark for")
+    parser.add_argument("--stage", action="append", choices=STAGES, help="only run these stages (default: all)")
+    parser.add_argument("--output", type=Path, help="write the results to this file as JSON")
+    parser.add_argument("--baseline", type=Path, help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change of a main metric that counts as a regression")
+    args = parser.parse_args()
+
+    # No window or audio device; workers inherit these
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("DWEAM_BUILTIN_GAMES", "1")
+
+    from dweam.utils.entrypoint import load_games
+
+    games = load_games(get_logger())
+    stages: list[tuple[str, Callable[[], list[BenchmarkResult]]]] = [
+        ("step", lambda: bench_step(games, args.duration)),
+        ("run", lambda: bench_run(games, args.duration)),
+        ("frame_buffer", lambda: bench_frame_buffer(args.duration)),
+        ("recv", lambda: bench_recv(args.duration)),
+        ("input", lambda: bench_input(args.duration)),
+        ("commands", lambda: bench_commands(games, args.duration)),
+    ]
+
+    results: list[BenchmarkResult] = []
+    for stage, run in stages:
+        if args.stage and stage not in args.stage:
+            continue
+        stage_results = run()
+        for result in stage_results:
+            summary = ", ".join(f"{key} {value:.3f}" for key, value in result.metrics.items())
+            print(f"{result.name:32} {summary}")
+        results.extend(stage_results)
+
+    if args.output is not None:
+        import numpy as np
+
+        args.output.write_text(json.dumps({
+            "host": {
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "cpu_count": os.cpu_count(),
+            },
+            "duration": args.duration,
+            "results": {result.name: asdict(result) for result in results},
+        }, indent=2))
+
+    if args.baseline is not None:
+        print()
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pygame
+
+from dweam import Game, Field
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class ConvModelGame(Game):
+    """
+    A stand-in for a generative model on the CPU: every frame runs the previous one through a stack of
+    random convolutions, which WASD scrolls and the mouse paints into
+    """
+
+    class Params(Game.Params):
+        width: int = Field(default=160, ge=16, le=1920, description="Frame width in pixels")
+        height: int = Field(default=120, ge=16, le=1080, description="Frame height in pixels")
+        layers: int = Field(default=3, ge=1, le=16, description="Convolution layers per frame")
+        channels: int = Field(default=8, ge=3, le=64, description="Channels between layers")
+        kernel_size: int = Field(default=3, ge=1, le=7, description="Convolution kernel size (odd)")
+
+    params: Params
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._build(self.params)
+
+    def _build(self, params: Params) -> None:
+        """Create the (seeded, so deterministic) weights and the state for the current params"""
+        rng = np.random.default_rng(0)
+        k, c = params.kernel_size | 1, params.channels
+        self.weights = [
+            rng.normal(0, 1 / np.sqrt(k * k * c), (c, k, k, c)).astype(np.float32)
+            for _ in range(params.layers)
+        ]
+        self.state = rng.random((params.height, params.width, c), dtype=np.float32)
+        self.cursor = np.array([params.width // 2, params.height // 2])
+
+    def on_params_update(self, new_params: Game.Params) -> None:
+        super().on_params_update(new_params)
+        self._build(self.params)
+
+    def snapshot(self) -> dict:
+        # Steps replace the state rather than modify it, so it needn't be copied
+        return {"state": self.state, "cursor": self.cursor.tolist()}
+
+    def restore(self, state: dict) -> None:
+        self.state = state["state"]
+        self.cursor = np.array(state["cursor"])
+
+    def on_mouse_motion(self, motion: tuple[int, int]) -> None:
+        self.cursor = np.clip(self.cursor + motion, 0, [self.params.width - 1, self.params.height - 1])
+
+    def conv(self, x: np.ndarray, weight: np.ndarray) -> np.ndarray:
+        """A 'same' convolution of an (h, w, c) image with (c, k, k, c_out) weights"""
+        pad = weight.shape[1] // 2
+        padded = np.pad(x, ((pad, pad), (pad, pad), (0, 0)), mode="wrap")
+        windows = sliding_window_view(padded, (*weight.shape[1:3], x.shape[2]))[:, :, 0]  # (h, w, k, k, c)
+        return np.tensordot(windows, weight, axes=([2, 3, 4], [1, 2, 0]))
+
+    def step(self) -> pygame.Surface:
+        direction = (
+            (pygame.K_d in self.keys_pressed) - (pygame.K_a in self.keys_pressed),
+            (pygame.K_s in self.keys_pressed) - (pygame.K_w in self.keys_pressed),
+        )
+        x = np.roll(self.state, shift=(-direction[1] * 2, -direction[0] * 2), axis=(0, 1))
+        cx, cy = self.cursor
+        x[max(cy - 3, 0):cy + 3, max(cx - 3, 0):cx + 3] = 1.0
+
+        for weight in self.weights:
+            x = np.tanh(self.conv(x, weight) + x)
+        # Keep the state from settling into a fixed point
+        self.state = (x - x.min()) / (np.ptp(x) + 1e-6)
+
+        rgb = (self.state[..., :3] * 255).astype(np.uint8)
+        # Surfaces are indexed (x, y)
+        return pygame.surfarray.make_surface(rgb.transpose(1, 0, 2))
@@ -0,0 +1,74 @@
+import numpy as np
+import pygame
+
+from dweam import Game, Field
+
+
+# Size of the repeating lattice each octave of noise is interpolated from
+LATTICE_SIZE = 256
+MAX_OCTAVES = 10
+
+
+def value_noise(lattice: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Smoothly interpolate a random lattice at (x, y), broadcasting x against y"""
+    x0, y0 = np.floor(x), np.floor(y)
+    fx, fy = x - x0, y - y0
+    # Smoothstep, so the lattice cells don't show
+    fx, fy = fx * fx * (3 - 2 * fx), fy * fy * (3 - 2 * fy)
+    xi, yi = x0.astype(np.int64) % LATTICE_SIZE, y0.astype(np.int64) % LATTICE_SIZE
+    xj, yj = (xi + 1) % LATTICE_SIZE, (yi + 1) % LATTICE_SIZE
+    top = lattice[xi, yi] * (1 - fx) + lattice[xj, yi] * fx
+    bottom = lattice[xi, yj] * (1 - fx) + lattice[xj, yj] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+class NoiseGame(Game):
+    """Drifting procedural terrain (octaves of value noise) rendered on the CPU, panned by WASD and the mouse"""
+
+    class Params(Game.Params):
+        width: int = Field(default=320, ge=16, le=1920, description="Frame width in pixels")
+        height: int = Field(default=240, ge=16, le=1080, description="Frame height in pixels")
+        octaves: int = Field(default=4, ge=1, le=MAX_OCTAVES, description="Octaves of noise per frame; each one costs about the same")
+
+    params: Params
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frame_count = 0
+        self.offset = np.zeros(2)
+        # Seeded, so every session (and every replay) renders the same terrain
+        rng = np.random.default_rng(0)
+        self.lattices = rng.random((MAX_OCTAVES, LATTICE_SIZE, LATTICE_SIZE), dtype=np.float32)
+        self.palette = np.stack([
+            np.interp(np.arange(256), [0, 100, 128, 180, 255], [10, 30, 200, 60, 250]),
+            np.interp(np.arange(256), [0, 100, 128, 180, 255], [30, 90, 190, 140, 250]),
+            np.interp(np.arange(256), [0, 100, 128, 180, 255], [90, 200, 120, 50, 250]),
+        ], axis=-1).astype(np.uint8)
+
+    def on_mouse_motion(self, motion: tuple[int, int]) -> None:
+        self.offset += motion
+
+    def step(self) -> pygame.Surface:
+        width, height = self.params.width, self.params.height
+        self.frame_count += 1
+
+        direction = np.array([
+            (pygame.K_d in self.keys_pressed) - (pygame.K_a in self.keys_pressed),
+            (pygame.K_s in self.keys_pressed) - (pygame.K_w in self.keys_pressed),
+        ])
+        self.offset += direction * 4
+
+        # Surfaces are indexed (x, y)
+        x = (np.arange(width, dtype=np.float32) + self.offset[0])[:, None]
+        y = (np.arange(height, dtype=np.float32) + self.offset[1])[None, :]
+        height_map = np.zeros((width, height), dtype=np.float32)
+        amplitude, frequency, total_amplitude = 1.0, 1 / 64, 0.0
+        for octave in range(self.params.octaves):
+            # Each octave drifts at its own speed
+            drift = self.frame_count * 0.05 * (octave + 1)
+            height_map += amplitude * value_noise(self.lattices[octave], x * frequency + drift, y * frequency)
+            total_amplitude += amplitude
+            amplitude, frequency = amplitude / 2, frequency * 2
+
+        levels = (height_map * (255 / total_amplitude)).astype(np.uint8)
+        return pygame.surfarray.make_surface(self.palette[levels])
@@ -0,0 +1,44 @@
+import numpy as np
+import pygame
+
+from dweam import Game, Field
+
+
+class TestPatternGame(Game):
+    """A scrolling test pattern rendered on the CPU, with a cursor moved by WASD and the mouse"""
+
+    class Params(Game.Params):
+        width: int = Field(default=320, ge=16, le=1920, description="Frame width in pixels")
+        height: int = Field(default=240, ge=16, le=1080, description="Frame height in pixels")
+
+    params: Params
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.frame_count = 0
+        self.cursor = np.array([self.params.width // 2, self.params.height // 2])
+
+    def on_mouse_motion(self, motion: tuple[int, int]) -> None:
+        self.cursor += motion
+
+    def step(self) -> pygame.Surface:
+        width, height = self.params.width, self.params.height
+        self.frame_count += 1
+
+        direction = np.array([
+            (pygame.K_d in self.keys_pressed) - (pygame.K_a in self.keys_pressed),
+            (pygame.K_s in self.keys_pressed) - (pygame.K_w in self.keys_pressed),
+        ])
+        self.cursor = np.clip(self.cursor + direction * 4, 0, [width - 1, height - 1])
+
+        # Surfaces are indexed (x, y)
+        x = np.arange(width, dtype=np.uint32)[:, None]
+        y = np.arange(height, dtype=np.uint32)[None, :]
+        frame = np.empty((width, height, 3), dtype=np.uint8)
+        frame[..., 0] = (x + self.frame_count * 2) % 256
+        frame[..., 1] = (y + self.frame_count) % 256
+        frame[..., 2] = ((x ^ y) + self.frame_count * 3) % 256
+
+        cx, cy = self.cursor
+        frame[max(cx - 4, 0):cx + 4, max(cy - 4, 0):cy + 4] = 255
+        return pygame.surfarray.make_surface(frame)
@@ -1,5 +1,5 @@
 from typing import Literal, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class SchemaCommand(BaseModel):
     cmd: Literal["schema"] = "schema"
@@ -18,8 +18,19 @@ class OfferData(BaseModel):
 class HandleOfferCommand(BaseModel):
     cmd: Literal["handle_offer"] = "handle_offer"
     data: OfferData
+    snapshot: str | None = Field(default=None, description="Path of a snapshot to resume the game from")
 
-Command = SchemaCommand | StopCommand | UpdateParamsCommand | HandleOfferCommand
+class MetricsCommand(BaseModel):
+    cmd: Literal["metrics"] = "metrics"
+
+class SpectateCommand(BaseModel):
+    cmd: Literal["spectate"] = "spectate"
+    data: OfferData
+
+class SnapshotCommand(BaseModel):
+    cmd: Literal["snapshot"] = "snapshot"
+
+Command = SchemaCommand | StopCommand | UpdateParamsCommand | HandleOfferCommand | MetricsCommand | SpectateCommand | SnapshotCommand
 
 class SuccessResponse(BaseModel):
     status: Literal["success"] = "success"
@@ -0,0 +1,356 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import aiohttp
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+
+from dweam.log_config import get_logger
+from dweam.models import NodeCapacity
+
+log = get_logger().bind(process="front")
+
+# How often node agents are polled for capacity, and when an unresponsive node is taken out of rotation
+POLL_INTERVAL = float(os.environ.get("DWEAM_NODE_POLL_INTERVAL", "2"))
+NODE_TIMEOUT = timedelta(seconds=float(os.environ.get("DWEAM_NODE_TIMEOUT", "10")))
+
+# Headers that must not be forwarded between hops
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "content-length", "content-encoding",
+}
+
+
+@dataclass
+class Node:
+    """A node agent (a `dweam.server` instance) that sessions can be placed on"""
+    url: str
+    capacity: NodeCapacity | None = None
+    last_seen: datetime | None = None
+    # Sessions placed since the last capacity report, so bursts of offers don't all land on one node
+    pending_sessions: int = 0
+    sessions: set[str] = field(default_factory=set)
+
+    @property
+    def is_healthy(self) -> bool:
+        return (
+            self.capacity is not None
+            and self.last_seen is not None
+            and datetime.now() - self.last_seen < NODE_TIMEOUT
+        )
+
+    def has_game(self, game_type: str, game_id: str) -> bool:
+        return self.capacity is not None and game_id in self.capacity.games.get(game_type, [])
+
+    def free_slots(self) -> int | None:
+        if self.capacity is None or self.capacity.free_slots is None:
+            return None
+        return self.capacity.free_slots - self.pending_sessions
+
+
+def parse_node_urls(value: str | None) -> list[str]:
+    """Parse a comma-separated list of node agent URLs"""
+    if not value:
+        return []
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+nodes: list[Node] = [Node(url=url) for url in parse_node_urls(os.environ.get("DWEAM_NODES"))]
+# Which node each session was placed on
+session_nodes: dict[str, Node] = {}
+http_session: aiohttp.ClientSession | None = None
+
+
+def pick_node(game_type: str, game_id: str) -> Node | None:
+    """Pick the node with the most spare capacity that can serve the game"""
+    candidates = []
+    for node in nodes:
+        if not node.is_healthy or not node.has_game(game_type, game_id):
+            continue
+        free_slots = node.free_slots()
+        if free_slots is not None and free_slots <= 0:
+            continue
+        candidates.append(node)
+
+    if not candidates:
+        return None
+
+    def score(node: Node) -> tuple:
+        capacity = node.capacity
+        assert capacity is not None
+        free_slots = node.free_slots()
+        memory_available = capacity.memory_available or 0
+        return (
+            # Prefer nodes that have finished loading their catalog
+            not capacity.is_loading,
+            # Then nodes with the most free slots (unlimited counts as plenty)
+            float("inf") if free_slots is None else free_slots,
+            # Then nodes with the fewest sessions that are being played (idle ones don't step)
+            -(len(capacity.sessions) - len(capacity.idle_sessions)),
+            memory_available,
+        )
+
+    return max(candidates, key=score)
+
+
+def pick_any_node() -> Node:
+    """Pick a healthy node to answer requests that aren't tied to a session"""
+    healthy = [node for node in nodes if node.is_healthy]
+    if not healthy:
+        raise HTTPException(status_code=503, detail="No node agents available")
+    return max(
+        healthy,
+        key=lambda node: sum(len(ids) for ids in node.capacity.games.values()) if node.capacity is not None else 0,
+    )
+
+
+async def poll_node(node: Node) -> None:
+    """Fetch the capacity report of a single node"""
+    assert http_session is not None
+    try:
+        async with http_session.get(f"{node.url}/node/capacity", timeout=aiohttp.ClientTimeout(total=5)) as response:
+            response.raise_for_status()
+            capacity = NodeCapacity.model_validate(await response.json())
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValidationError) as e:
+        if node.is_healthy:
+            log.warning("Node agent unreachable", node=node.url, error=str(e))
+        return
+
+    if node.capacity is None or not node.is_healthy:
+        log.info("Node agent available", node=node.url, node_id=capacity.node_id)
+    node.capacity = capacity
+    node.last_seen = datetime.now()
+    node.pending_sessions = 0
+
+    # Forget sessions that have ended on the node
+    live_sessions = set(capacity.sessions)
+    for session_id in node.sessions - live_sessions:
+        session_nodes.pop(session_id, None)
+    node.sessions &= live_sessions
+
+
+async def poll_nodes() -> None:
+    """Periodically refresh the capacity of all nodes"""
+    while True:
+        await asyncio.gather(*[poll_node(node) for node in nodes])
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_session
+    if not nodes:
+        log.warning("No node agents configured; set DWEAM_NODES to a comma-separated list of node URLs")
+    http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None))
+    poll_task = asyncio.create_task(poll_nodes())
+    yield
+    poll_task.cancel()
+    await http_session.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origin_regex=r'http://localhost(:\d+)?|http://127\.0\.0\.1(:\d+)?',  # Allow any local port
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "OPTIONS", "DELETE", "PATCH", "PUT"],
+    allow_headers=["*"],
+    max_age=86400,  # Cache preflight requests for 24 hours
+)
+
+
+def forwarded_headers(request: Request) -> dict[str, str]:
+    # Keep the Host header, so nodes generate URLs (e.g. TURN) for the public hostname
+    return {key: value for key, value in request.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+
+
+async def forward(request: Request, node: Node, path: str) -> Response:
+    """Forward a request to a node and stream its response back, so SSE streams are relayed as they come"""
+    assert http_session is not None
+    try:
+        response = await http_session.request(
+            request.method,
+            f"{node.url}{path}",
+            params=request.query_params,
+            headers=forwarded_headers(request),
+            data=await request.body(),
+        )
+    except aiohttp.ClientError as e:
+        log.error("Error forwarding request to node", node=node.url, path=path, error=str(e))
+        raise HTTPException(status_code=502, detail=f"Node unavailable: {e}")
+
+    async def relay_body():
+        try:
+            async for chunk in response.content.iter_any():
+                yield chunk
+        finally:
+            response.release()
+
+    headers = {key: value for key, value in response.headers.items() if key.lower() not in HOP_BY_HOP_HEADERS}
+    return StreamingResponse(relay_body(), status_code=response.status, headers=headers)
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+
+@app.get("/nodes")
+async def list_nodes() -> list[dict]:
+    """List the node agents and their last capacity report"""
+    return [
+        {
+            "url": node.url,
+            "healthy": node.is_healthy,
+            "last_seen": node.last_seen,
+            "capacity": node.capacity,
+        }
+        for node in nodes
+    ]
+
+
+@app.post("/offer/{type}/{id}")
+async def offer(request: Request, type: str, id: str):
+    """Place a new session on the best node, and proxy its SSE signaling stream"""
+    assert http_session is not None
+    node = pick_node(type, id)
+    if node is None:
+        if not any(node.has_game(type, id) for node in nodes if node.is_healthy):
+            raise HTTPException(status_code=404, detail="Game not found on any node")
+        raise HTTPException(status_code=503, detail="All nodes are at session capacity")
+
+    node.pending_sessions += 1
+    node_log = log.bind(node=node.url, type=type, id=id)
+    node_log.info("Placing session on node")
+
+    try:
+        response = await http_session.post(
+            f"{node.url}/offer/{type}/{id}",
+            params=request.query_params,
+            headers=forwarded_headers(request),
+            data=await request.body(),
+        )
+    except aiohttp.ClientError as e:
+        node_log.error("Error forwarding offer to node", error=str(e))
+        raise HTTPException(status_code=502, detail=f"Node unavailable: {e}")
+
+    if response.status != 200:
+        detail = await response.text()
+        response.release()
+        raise HTTPException(status_code=response.status, detail=detail)
+
+    async def relay_events():
+        event = None
+        try:
+            async for line in response.content:
+                # Watch the stream for the answer, to learn which node the session lives on
+                text = line.decode("utf-8", errors="replace").strip()
+                if text.startswith("event:"):
+                    event = text.removeprefix("event:").strip()
+                elif text.startswith("data:") and event == "answer":
+                    try:
+                        session_id = json.loads(text.removeprefix("data:").strip())["sessionId"]
+                    except (ValueError, KeyError):
+                        node_log.warning("Could not parse answer event", data=text)
+                    else:
+                        session_nodes[session_id] = node
+                        node.sessions.add(session_id)
+                        node_log.info("Session placed on node", session_id=session_id)
+                yield line
+        finally:
+            response.release()
+
+    return StreamingResponse(relay_events(), media_type="text/event-stream")
+
+
+def get_session_node(session_id: str) -> Node:
+    node = session_nodes.get(session_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Game session not found")
+    return node
+
+
+@app.api_route("/params/{session_id}", methods=["POST"])
+async def update_game_params(request: Request, session_id: str):
+    return await forward(request, get_session_node(session_id), f"/params/{session_id}")
+
+
+@app.api_route("/snapshot/{session_id}", methods=["POST"])
+async def snapshot_session(request: Request, session_id: str):
+    return await forward(request, get_session_node(session_id), f"/snapshot/{session_id}")
+
+
+@app.api_route("/reconnect/{session_id}", methods=["POST"])
+async def reconnect(request: Request, session_id: str):
+    return await forward(request, get_session_node(session_id), f"/reconnect/{session_id}")
+
+
+@app.api_route("/spectate/{session_id}", methods=["POST"])
+async def spectate(request: Request, session_id: str):
+    return await forward(request, get_session_node(session_id), f"/spectate/{session_id}")
+
+
+@app.api_route("/params/{session_id}/schema", methods=["GET"])
+async def get_params_schema_by_session(request: Request, session_id: str):
+    return await forward(request, get_session_node(session_id), f"/params/{session_id}/schema")
+
+
+@app.get("/game_info")
+async def get_games():
+    """Merge the game catalogs of all healthy nodes"""
+    assert http_session is not None
+    healthy = [node for node in nodes if node.is_healthy]
+    if not healthy:
+        raise HTTPException(status_code=503, detail="No node agents available")
+
+    async def fetch(node: Node) -> dict:
+        assert http_session is not None
+        try:
+            async with http_session.get(f"{node.url}/game_info") as response:
+                response.raise_for_status()
+                return await response.json()
+        except aiohttp.ClientError as e:
+            log.warning("Error fetching game info from node", node=node.url, error=str(e))
+            return {}
+
+    merged: dict[str, dict] = {}
+    for catalog in await asyncio.gather(*[fetch(node) for node in healthy]):
+        for game_type, game_infos in catalog.items():
+            merged.setdefault(game_type, {}).update(game_infos)
+    return merged
+
+
+def get_game_node(type: str, id: str) -> Node:
+    """Pick a healthy node that has the game, since nodes can have different catalogs"""
+    node = next((node for node in nodes if node.is_healthy and node.has_game(type, id)), None)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return node
+
+
+@app.get("/game_info/{type}/{id}")
+async def get_game(request: Request, type: str, id: str):
+    return await forward(request, get_game_node(type, id), f"/game_info/{type}/{id}")
+
+
+@app.get("/game/{type}/{id}/params/schema")
+async def get_params_schema(request: Request, type: str, id: str):
+    return await forward(request, get_game_node(type, id), f"/game/{type}/{id}/params/schema")
+
+
+@app.get("/thumb/{type}/{id}.{ext}")
+async def get_thumbnail(request: Request, type: str, id: str, ext: str):
+    return await forward(request, get_game_node(type, id), f"/thumb/{type}/{id}.{ext}")
+
+
+@app.api_route("/{path:path}", methods=["GET"])
+async def forward_any(request: Request, path: str):
+    """Forward catalog, status, thumbnail and TURN requests to any healthy node"""
+    return await forward(request, pick_any_node(), f"/{path}")
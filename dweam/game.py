@@ -1,14 +1,90 @@
 import asyncio
+import queue
 import threading
-from typing import ClassVar, Protocol
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, ClassVar, Generic, Protocol, TypeVar
 from dataclasses import dataclass
 from typing import Optional
+from dweam.constants import JS_TO_PYGAME_BUTTON_MAP, JS_TO_PYGAME_KEY_MAP
 from dweam.models import GameInfo
+from dweam.metrics import SessionStats
+from dweam.recording import SessionRecorder
 from pydantic import BaseModel, Field
 import pygame
 from structlog import BoundLogger
 
 
+T = TypeVar("T")
+
+
+def make_input_event(data: dict) -> pygame.event.Event | None:
+    """Turn an input message from the browser into the pygame event the game loop handles"""
+    if data["type"] == "keydown":
+        pygame_key = JS_TO_PYGAME_KEY_MAP.get(data["key"])
+        if pygame_key is not None:
+            return pygame.event.Event(pygame.KEYDOWN, key=pygame_key)
+    elif data["type"] == "keyup":
+        pygame_key = JS_TO_PYGAME_KEY_MAP.get(data["key"])
+        if pygame_key is not None:
+            return pygame.event.Event(pygame.KEYUP, key=pygame_key)
+    elif data["type"] == "mousemove":
+        movement = (data["movementX"], data["movementY"])
+        return pygame.event.Event(pygame.MOUSEMOTION, rel=movement)
+    elif data["type"] == "mousedown":
+        pygame_button = JS_TO_PYGAME_BUTTON_MAP.get(data["button"])
+        if pygame_button is not None:
+            return pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame_button)
+    elif data["type"] == "mouseup":
+        pygame_button = JS_TO_PYGAME_BUTTON_MAP.get(data["button"])
+        if pygame_button is not None:
+            return pygame.event.Event(pygame.MOUSEBUTTONUP, button=pygame_button)
+    return None
+
+
+class FrameBuffer(Generic[T]):
+    """
+    Hands the latest frame from the game thread to the event loop. A frame that wasn't taken
+    before the next one arrives is replaced.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame: T | None = None
+        self._waiter: asyncio.Future | None = None
+
+    def put(self, surface: T) -> bool:
+        """Store a frame (from any thread), returning whether it replaced one that was never taken"""
+        with self._lock:
+            replaced = self._frame is not None
+            self._frame = surface
+            waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            # The waiter belongs to the event loop, which has to be woken up from this thread
+            waiter.get_loop().call_soon_threadsafe(_wake_waiter, waiter)
+        return replaced
+
+    async def get(self) -> T:
+        """Wait for the next frame"""
+        while True:
+            with self._lock:
+                if self._frame is not None:
+                    surface, self._frame = self._frame, None
+                    return surface
+                waiter = self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if self._waiter is waiter:
+                        self._waiter = None
+
+
+def _wake_waiter(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
 class Game:
     class Params(BaseModel):
         pass
@@ -57,7 +133,30 @@ class Game:
 
         self._thread: threading.Thread | None = None
         self._stop_event = threading.Event()
-        self._frame_buffer: asyncio.Queue[pygame.Surface] = asyncio.Queue(maxsize=1)
+        self._frame_buffer: FrameBuffer[pygame.Surface] = FrameBuffer()
+        # Posting an input and the game loop taking the queued events are atomic,
+        # so recorded inputs are tagged with exactly the step that saw them
+        self._input_lock = threading.Lock()
+        self._next_input_step = 0
+        # Calls from other threads that must run between two steps
+        self._between_steps: queue.SimpleQueue[tuple[Callable[[], Any], Future]] = queue.SimpleQueue()
+        # Params changes not applied yet, merged into one update for the next step
+        self._pending_params: dict[str, Any] = {}
+        self._params_futures: list[Future[None]] = []
+        self._params_lock = threading.Lock()
+
+        self.stats = SessionStats()
+        # Set by the worker when the session is being recorded
+        self.recorder: SessionRecorder | None = None
+
+    def warmup(self) -> None:
+        """
+        Optionally prepare the game before its first frame, e.g. by running a step on dummy inputs
+        so `torch.compile` or `jax.jit` compile (and autotune) before the player is watching.
+        Compiled kernels are kept in the package's compile cache, so later sessions warm up faster.
+        Runs in a thread after `__init__`, before the offer is answered.
+        """
+        pass
 
     def step(self) -> pygame.Surface:
         """
@@ -102,6 +201,64 @@ class Game:
         """
         self.params = new_params
 
+    def update_params(self, changes: dict[str, Any]) -> "Future[None]":
+        """
+        Queue a change of some of the params, applied between two steps (thread-safe).
+        Changes queued before the next step are applied together, with a single `on_params_update`.
+        Raises a `ValidationError` right away if the params would be invalid; the returned future
+        completes once the change is applied, or with the error `on_params_update` raised.
+        """
+        future: Future[None] = Future()
+        with self._params_lock:
+            pending = {**self._pending_params, **changes}
+            type(self).Params.model_validate({**self.params.model_dump(), **pending})
+            self._pending_params = pending
+            self._params_futures.append(future)
+        if self._thread is None:
+            self._apply_params()
+        return future
+
+    def _apply_params(self) -> None:
+        with self._params_lock:
+            pending, self._pending_params = self._pending_params, {}
+            futures, self._params_futures = self._params_futures, []
+        if not pending and not futures:
+            return
+        previous = self.params
+        params = {**previous.model_dump(mode="json"), **pending}
+        try:
+            self.on_params_update(type(self).Params.model_validate(params))
+        except Exception as e:
+            # The game keeps running with the params it had
+            self.log.exception("Error updating params", params=params)
+            self.params = previous
+            for future in futures:
+                future.set_exception(e)
+            return
+        if self.recorder is not None:
+            # Replays need the params as much as the inputs
+            self.recorder.record_input(self.stats.metrics.steps, {"type": "params", "params": params})
+        for future in futures:
+            future.set_result(None)
+
+    def snapshot(self) -> dict[str, Any] | None:
+        """
+        Optionally return the state needed to resume the game in a new worker (see `dweam.snapshots`),
+        or None if the game can't be resumed.
+        Numpy arrays and torch tensors in it are stored as blobs, anything else must be JSON-serializable.
+        Runs on the game thread between two steps, but the state is written while the game keeps running,
+        so return copies of the arrays that later steps modify in place.
+        """
+        return None
+
+    def restore(self, state: dict[str, Any]) -> None:
+        """
+        Resume from the state returned by `snapshot`. Runs after `__init__` and `warmup`,
+        with the params of the snapshot already applied.
+        The arrays are memory-mapped read-only; copy those the game modifies in place.
+        """
+        raise NotImplementedError
+
     def start(self) -> None:
         """
         Start the game in a new thread
@@ -123,11 +280,43 @@ class Game:
         self._thread.join(timeout=3.0)
         if not self._thread.is_alive():
             self._thread = None
+            self._run_between_steps()
+            self._apply_params()
             return
         self.log.warning("Game thread did not finish in 3s; thread is still running", 
                          thread_id=self._thread.ident)
         self._thread = None
 
+    def call_between_steps(self, fn: Callable[[], T]) -> "Future[T]":
+        """Run a function on the game thread between two steps (or right away if the game isn't running)"""
+        future: Future[T] = Future()
+        self._between_steps.put((fn, future))
+        if self._thread is None:
+            self._run_between_steps()
+        return future
+
+    def _run_between_steps(self) -> None:
+        while True:
+            try:
+                fn, future = self._between_steps.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def post_input(self, data: dict) -> None:
+        """Queue an input message from the browser for the next step (thread-safe)"""
+        event = make_input_event(data)
+        with self._input_lock:
+            if event is not None:
+                pygame.event.post(event)
+            if self.recorder is not None:
+                self.recorder.record_input(self._next_input_step, data)
+
     def run(self) -> None:
         """
         Main game loop, runs in a separate thread
@@ -135,75 +324,94 @@ class Game:
         # pygame.init()
 
         while not self._stop_event.is_set():
-            mouse_x, mouse_y = 0, 0
-            pygame.event.pump()
-
-            unprocessed_keys = set()
-            unprocessed_mouse = set()
-            keys_to_release = set()
-            mouse_to_release = set()
-
-            for event in pygame.event.get():
-                if event.type == pygame.MOUSEMOTION:
-                    mouse_x += event.rel[0]
-                    mouse_y += event.rel[1]
-
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button in self.mouse_pressed:
-                        continue
-                    self.mouse_pressed.add(event.button)
-                    self.on_mouse_down(event.button)
-                    unprocessed_mouse.add(event.button)
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    if event.button not in self.mouse_pressed:
-                        continue
-                    if event.button in unprocessed_mouse:
-                        mouse_to_release.add(event.button)
-                    else:
-                        self.mouse_pressed.remove(event.button)
-                        self.on_mouse_up(event.button)
-                elif event.type == pygame.KEYDOWN:
-                    if event.key in self.keys_pressed:
-                        continue
-                    self.keys_pressed.add(event.key)
-                    self.on_key_down(event.key)
-                    unprocessed_keys.add(event.key)
-                elif event.type == pygame.KEYUP:
-                    if event.key not in self.keys_pressed:
-                        continue
-                    if event.key in unprocessed_keys:
-                        keys_to_release.add(event.key)
-                    else:
-                        self.keys_pressed.remove(event.key)
-                        self.on_key_up(event.key)
-            
-            self.mouse_motion = (mouse_x, mouse_y)
-            if self.mouse_motion != (0, 0):
-                self.on_mouse_motion(self.mouse_motion)
-
-            if not self.paused and not self.one_step_queued:
-                # self.log.debug("Initiating game step")
-                surface = self.step()
-                
-                # Now process any pending releases
-                for key in keys_to_release:
-                    self.keys_pressed.remove(key)
-                    self.on_key_up(key)
-                for button in mouse_to_release:
-                    self.mouse_pressed.remove(button)
-                    self.on_mouse_up(button)
-                
-                # Put new frame in buffer
-                while not self._frame_buffer.empty():
-                    self._frame_buffer.get_nowait()
-                self._frame_buffer.put_nowait(surface)
-                
-            self.one_step_queued = False
-
+            self._tick()
             self.clock.tick(30)  # TODO unhardcode FPS
 
         # pygame.quit()
 
+    def _tick(self) -> pygame.Surface | None:
+        """
+        One iteration of the game loop: handle the queued input events and step the game,
+        returning the new frame (or None when paused)
+        """
+        surface = None
+        mouse_x, mouse_y = 0, 0
+        self._run_between_steps()
+        self._apply_params()
+        pygame.event.pump()
+
+        unprocessed_keys = set()
+        unprocessed_mouse = set()
+        keys_to_release = set()
+        mouse_to_release = set()
+
+        stepping = not self.paused and not self.one_step_queued
+        with self._input_lock:
+            events = pygame.event.get()
+            self._next_input_step = self.stats.metrics.steps + stepping
+
+        for event in events:
+            if event.type == pygame.MOUSEMOTION:
+                mouse_x += event.rel[0]
+                mouse_y += event.rel[1]
+
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button in self.mouse_pressed:
+                    continue
+                self.mouse_pressed.add(event.button)
+                self.on_mouse_down(event.button)
+                unprocessed_mouse.add(event.button)
+            elif event.type == pygame.MOUSEBUTTONUP:
+                if event.button not in self.mouse_pressed:
+                    continue
+                if event.button in unprocessed_mouse:
+                    mouse_to_release.add(event.button)
+                else:
+                    self.mouse_pressed.remove(event.button)
+                    self.on_mouse_up(event.button)
+            elif event.type == pygame.KEYDOWN:
+                if event.key in self.keys_pressed:
+                    continue
+                self.keys_pressed.add(event.key)
+                self.on_key_down(event.key)
+                unprocessed_keys.add(event.key)
+            elif event.type == pygame.KEYUP:
+                if event.key not in self.keys_pressed:
+                    continue
+                if event.key in unprocessed_keys:
+                    keys_to_release.add(event.key)
+                else:
+                    self.keys_pressed.remove(event.key)
+                    self.on_key_up(event.key)
+        
+        self.mouse_motion = (mouse_x, mouse_y)
+        if self.mouse_motion != (0, 0):
+            self.on_mouse_motion(self.mouse_motion)
+
+        if stepping:
+            # self.log.debug("Initiating game step")
+            step_index = self.stats.metrics.steps
+            step_start = time.perf_counter()
+            surface = self.step()
+            step_duration = time.perf_counter() - step_start
+            
+            # Now process any pending releases
+            for key in keys_to_release:
+                self.keys_pressed.remove(key)
+                self.on_key_up(key)
+            for button in mouse_to_release:
+                self.mouse_pressed.remove(button)
+                self.on_mouse_up(button)
+            
+            # Put new frame in buffer
+            dropped_frame = self._frame_buffer.put(surface)
+            self.stats.record_step(step_duration, dropped_frame)
+            if self.recorder is not None:
+                self.recorder.record_frame(step_index, surface)
+            
+        self.one_step_queued = False
+        return surface
+
     def do_one_step(self) -> None:
         """
         When paused, perform a single step once
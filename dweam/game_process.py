@@ -4,9 +4,10 @@ logging.getLogger("aioice.ice").disabled = True
 import asyncio
 import json
 import sys
+import time
+import zlib
 from typing import Any
 from datetime import datetime, timedelta
-from dweam.constants import JS_TO_PYGAME_BUTTON_MAP, JS_TO_PYGAME_KEY_MAP
 from dweam.log_config import get_logger
 from pydantic import TypeAdapter
 import pygame
@@ -14,38 +15,147 @@ import numpy as np
 from av.video.frame import VideoFrame
 from aiortc import VideoStreamTrack, RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, RTCDataChannel
 from aiortc.contrib.signaling import object_from_string, object_to_string
-import torch
+import aiortc.rtcrtpsender
+try:
+    # Imported up front for the games that use it (and preloaded by the zygote); games without it run fine
+    import torch
+except ImportError:
+    pass
 import os
 import socket
+from pathlib import Path
 from dweam.utils.process import patch_subprocess_popen
 
 from dweam.utils.entrypoint import load_games, get_cache_dir
+from dweam.utils.compile_cache import export_compile_cache_env
+from dweam.metrics import SessionStats, WorkerMetrics
+from dweam.recording import is_recording_enabled, start_session_recording
+from dweam.relay import SpectatorRelay, SpectatorConnection, get_max_spectators
+from dweam.snapshots import save_snapshot, load_snapshot
+from dweam.idle import IdlePolicy
 from dweam.commands import (
     Command, Response, SchemaCommand, StopCommand, 
-    UpdateParamsCommand, HandleOfferCommand,
+    UpdateParamsCommand, HandleOfferCommand, MetricsCommand, SpectateCommand, SnapshotCommand,
     SuccessResponse, ErrorResponse
 )
 
 
+class TimedEncoder:
+    """Wraps an aiortc encoder to record how long encoding takes"""
+    def __init__(self, encoder: Any, stats: SessionStats):
+        self._encoder = encoder
+        self._stats = stats
+
+    def encode(self, frame, force_keyframe: bool = False):
+        start = time.perf_counter()
+        result = self._encoder.encode(frame, force_keyframe)
+        self._stats.record_encode(time.perf_counter() - start)
+        return result
+
+    def pack(self, packet):
+        return self._encoder.pack(packet)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._encoder, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith("_"):
+            super().__setattr__(name, value)
+        else:
+            setattr(self._encoder, name, value)
+
+
+def instrument_encoders(stats: SessionStats) -> None:
+    """Time the video encoders created by aiortc's RTP senders (encoding happens outside our track)"""
+    # Not exported by aiortc, but looked up by the senders from their module
+    get_encoder = getattr(aiortc.rtcrtpsender, "get_encoder")
+    setattr(aiortc.rtcrtpsender, "get_encoder", lambda codec: TimedEncoder(get_encoder(codec), stats))
+
+
+def surface_to_video_frame(surface: pygame.Surface) -> VideoFrame:
+    """Convert a game's frame to a video frame for the encoder"""
+    frame = pygame.surfarray.array3d(surface)
+    frame = np.fliplr(frame)
+    frame = np.rot90(frame)
+    return VideoFrame.from_ndarray(frame, format='rgb24')
+
+
+# How often the last frame is sent again while the game produces no new ones (e.g. while it's paused)
+KEEPALIVE_SECONDS = 1.0
+
+# Heartbeats of hidden browser tabs are throttled, so they may be this late
+HIDDEN_HEARTBEAT_TIMEOUT = timedelta(seconds=60)
+
+# How long a session whose player lost the connection waits for them to reconnect
+DEFAULT_RECONNECT_GRACE = 30.0
+
+
+def get_reconnect_grace() -> float:
+    return float(os.environ.get("DWEAM_RECONNECT_GRACE", DEFAULT_RECONNECT_GRACE))
+
+
+def surface_digest(surface: pygame.Surface) -> tuple:
+    """A cheap fingerprint of a frame's pixels, to tell unchanged frames apart"""
+    try:
+        pixels: bytes | memoryview = np.asarray(surface.get_view("1")).data
+    except ValueError:
+        # Subsurfaces and surfaces with padded rows can't be viewed as one buffer
+        pixels = pygame.image.tobytes(surface, "RGB")
+    return surface.get_size(), surface.get_bitsize(), zlib.crc32(pixels)
+
+
 class GameVideoTrack(VideoStreamTrack):
     """A video stream track that captures frames from a Pygame application."""
-    def __init__(self, game: Any):
+    def __init__(self, game: Any, relay: SpectatorRelay | None = None):
         super().__init__()
         self.game = game
+        self.relay = relay
+        self.last_frame: VideoFrame | None = None
+        self.last_digest: tuple | None = None
+
+    async def next_changed_frame(self) -> VideoFrame | None:
+        """
+        Convert the next frame that differs from the last one sent. Waits for the first frame however long
+        it takes; after that, returns None if no new frame came in time for the keep-alive.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + KEEPALIVE_SECONDS
+        while True:
+            try:
+                if self.last_frame is None:
+                    surface = await self.game.get_next_frame()
+                else:
+                    surface = await asyncio.wait_for(self.game.get_next_frame(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return None
+            digest = surface_digest(surface)
+            if digest == self.last_digest:
+                # Static scenes don't need converting (or encoding) again
+                self.game.stats.record_frame_unchanged()
+                continue
+            convert_start = time.perf_counter()
+            new_frame = surface_to_video_frame(surface)
+            self.game.stats.record_frame_sent(time.perf_counter() - convert_start)
+            self.last_frame, self.last_digest = new_frame, digest
+            return new_frame
 
     async def recv(self) -> VideoFrame:
         await asyncio.sleep(1 / 30)  # 30 FPS
-        surface = await self.game.get_next_frame()
-        frame = pygame.surfarray.array3d(surface)
-        frame = np.fliplr(frame)
-        frame = np.rot90(frame)
-        new_frame = VideoFrame.from_ndarray(frame, format='rgb24')
+        new_frame = await self.next_changed_frame()
+        if new_frame is None:
+            # Without frames the browser considers the stream frozen, so repeat the last one
+            assert self.last_frame is not None
+            new_frame = self.last_frame
+            self.game.stats.record_frame_repeated()
         new_frame.pts, new_frame.time_base = await self.next_timestamp()
+        if self.relay is not None:
+            self.relay.publish(new_frame)
         return new_frame
 
 class GameRTCConnection:
-    def __init__(self, game: Any, ice_servers: list[dict] | None = None):
+    def __init__(self, game: Any, idle: IdlePolicy, ice_servers: list[dict] | None = None, relay: SpectatorRelay | None = None):
         self.game = game
+        self.idle = idle
         self.last_heartbeat = datetime.now()
         self.cleanup_scheduled = False
         
@@ -57,7 +167,7 @@ class GameRTCConnection:
         self.data_channel: RTCDataChannel | None = None
         
         # Add video track
-        self.pc.addTrack(GameVideoTrack(self.game))
+        self.pc.addTrack(GameVideoTrack(self.game, relay))
         
         @self.pc.on("datachannel")
         def on_datachannel(channel: RTCDataChannel):
@@ -72,7 +182,12 @@ class GameRTCConnection:
                     data = json.loads(message)
                     if data["type"] == "heartbeat":
                         self.last_heartbeat = datetime.now()
+                    elif data["type"] == "visibility":
+                        self.last_heartbeat = datetime.now()
+                        self.idle.on_visibility(data["visible"])
                     else:
+                        self.game.stats.record_input()
+                        self.idle.on_input()
                         self.handle_game_input(data)
                 except Exception as e:
                     print(f"Error handling message: {e}", file=sys.stderr)
@@ -80,36 +195,24 @@ class GameRTCConnection:
         @self.pc.on("connectionstatechange")
         async def on_connectionstatechange():
             # print(f"Connection state changed to: {self.pc.connectionState}", file=sys.stderr)
-            if self.pc.connectionState in ("failed", "closed", "disconnected"):
+            # A disconnected connection may still recover, the worker gives it time to
+            if self.pc.connectionState in ("failed", "closed"):
                 await self.cleanup()
 
+    @property
+    def is_lost(self) -> bool:
+        return self.is_stale or self.pc.connectionState in ("failed", "closed", "disconnected")
+
     @property
     def is_stale(self) -> bool:
         """Check if the connection hasn't received a heartbeat recently"""
-        return datetime.now() - self.last_heartbeat > timedelta(seconds=5)
+        timeout = timedelta(seconds=5) if self.idle.visible else HIDDEN_HEARTBEAT_TIMEOUT
+        return datetime.now() - self.last_heartbeat > timeout
 
     def handle_game_input(self, data: dict):
         """Handle game input events"""
         try:
-            if data["type"] == "keydown":
-                pygame_key = JS_TO_PYGAME_KEY_MAP.get(data["key"])
-                if pygame_key is not None:
-                    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame_key))
-            elif data["type"] == "keyup":
-                pygame_key = JS_TO_PYGAME_KEY_MAP.get(data["key"])
-                if pygame_key is not None:
-                    pygame.event.post(pygame.event.Event(pygame.KEYUP, key=pygame_key))
-            elif data["type"] == "mousemove":
-                movement = (data["movementX"], data["movementY"])
-                pygame.event.post(pygame.event.Event(pygame.MOUSEMOTION, rel=movement))
-            elif data["type"] == "mousedown":
-                pygame_button = JS_TO_PYGAME_BUTTON_MAP.get(data["button"])
-                if pygame_button is not None:
-                    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=pygame_button))
-            elif data["type"] == "mouseup":
-                pygame_button = JS_TO_PYGAME_BUTTON_MAP.get(data["button"])
-                if pygame_button is not None:
-                    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, button=pygame_button))
+            self.game.post_input(data)
         except Exception as e:
             print(f"Error handling input: {e}", file=sys.stderr)
 
@@ -136,6 +239,13 @@ class GameRTCConnection:
             await self.pc.close()
         # Game cleanup will be handled by the main process
 
+def restore_game(game: Any, implementation: Any, path: Path) -> None:
+    """Resume a game (before it starts) from a snapshot, with the snapshot's params"""
+    meta, state = load_snapshot(path)
+    game.on_params_update(implementation.Params.model_validate(meta.params))
+    game.restore(state)
+
+
 async def main():
     # Patch subprocess to hide windows in release mode
     patch_subprocess_popen()
@@ -189,23 +299,55 @@ async def main():
         raise KeyError(f"Game ID '{game_id}' not found in {game_type}")
     
     game_info = games[game_type][game_id]
+    if game_info._metadata is not None and game_info._metadata._package_name is not None:
+        export_compile_cache_env(log, game_info._metadata._package_name)
     implementation = game_info.get_implementation()
     
     game = None
     rtc = None
+    idle: IdlePolicy | None = None
+    relay: SpectatorRelay | None = None
+    spectators: list[SpectatorConnection] = []
     should_exit = False
+    reconnect_grace = get_reconnect_grace()
+    # When the player's connection was lost, if they haven't reconnected yet
+    connection_lost_at: float | None = None
+
+    async def close_spectators():
+        await asyncio.gather(*[spectator.close() for spectator in spectators])
+        spectators.clear()
+        if relay is not None:
+            relay.close()
 
     async def check_connection():
-        """Check connection state and cleanup if stale"""
-        nonlocal should_exit
+        """Check connection state, and cleanup if the player doesn't reconnect in time"""
+        nonlocal should_exit, connection_lost_at
         while not should_exit:
             await asyncio.sleep(1)  # Check every second
-            if rtc and (rtc.is_stale or rtc.pc.connectionState in ("failed", "closed", "disconnected")):
+            # The game, its idle policy and the player's connection are created together
+            if game is None or idle is None or rtc is None:
+                continue
+            idle.check()
+            if not rtc.is_lost and connection_lost_at is not None and rtc.pc.connectionState == "connected":
+                log.info("Player reconnected", seconds=time.monotonic() - connection_lost_at)
+                connection_lost_at = None
+                game.stats.record_reconnect()
+                idle.resume()
+            if rtc.is_lost:
+                if connection_lost_at is None:
+                    # Keep the game (paused) so the player can reconnect with POST /reconnect/<session id>
+                    connection_lost_at = time.monotonic()
+                    log.info("Connection lost, waiting for the player to reconnect", grace_seconds=reconnect_grace)
+                    idle.on_disconnect()
+                if time.monotonic() - connection_lost_at < reconnect_grace:
+                    continue
                 log.info("Connection stale or closed, cleaning up")
                 await rtc.cleanup()
-                if game:
-                    game.stop()
-                    
+                await close_spectators()
+                game.stop()
+                if game.recorder is not None:
+                    game.recorder.close()
+
                 writer.close()
                 await writer.wait_closed()
                 log.info("Connection checker requesting process exit")
@@ -232,21 +374,75 @@ async def main():
                     response = SuccessResponse(data=schema)
                     
                 elif isinstance(command, UpdateParamsCommand):
-                    params = implementation.Params.model_validate(command.data)
-                    game.on_params_update(params)
+                    if game is None:
+                        raise ValueError("The game hasn't started yet")
+                    # Applied by the game thread before its next step
+                    await asyncio.wrap_future(game.update_params(command.data))
                     response = SuccessResponse()
                     
                 elif isinstance(command, HandleOfferCommand):
                     if game is None:
+                        offer_received = time.perf_counter()
                         game = implementation(
                             log=log,
                             game_id=game_id,
                         )
+                        game.stats.record_offer(at=offer_received)
+                        instrument_encoders(game.stats)
+                        warmup_start = time.perf_counter()
+                        await asyncio.to_thread(game.warmup)
+                        game.stats.record_warmup(time.perf_counter() - warmup_start)
+                        if command.snapshot is not None:
+                            restore_start = time.perf_counter()
+                            await asyncio.to_thread(restore_game, game, implementation, Path(command.snapshot))
+                            game.stats.record_restore(time.perf_counter() - restore_start)
+                            log.info("Restored snapshot", path=command.snapshot)
+                        if is_recording_enabled():
+                            game.recorder = start_session_recording(log, game_type, game_id)
                         game.start()
-                    rtc = GameRTCConnection(game, ice_servers)
+                        relay = SpectatorRelay(game.stats)
+                        idle = IdlePolicy(game)
+                    elif rtc is not None:
+                        if connection_lost_at is None and not rtc.is_lost:
+                            raise RuntimeError("The player's connection is still up")
+                        # The player reconnects, the new connection replaces the lost one
+                        await rtc.cleanup()
+                    assert idle is not None
+                    rtc = GameRTCConnection(game, idle, ice_servers, relay)
                     answer = await rtc.handle_offer(command.data.sdp, command.data.type)
                     response = SuccessResponse(data=answer)
                     
+                elif isinstance(command, MetricsCommand):
+                    metrics = game.stats.snapshot() if game is not None else WorkerMetrics()
+                    response = SuccessResponse(data=metrics.model_dump())
+
+                elif isinstance(command, SpectateCommand):
+                    if game is None or relay is None:
+                        raise RuntimeError("The session hasn't started")
+                    spectators[:] = [spectator for spectator in spectators if not spectator.is_closed]
+                    max_spectators = get_max_spectators()
+                    if len(spectators) >= max_spectators:
+                        raise RuntimeError(f"The session already has {max_spectators} spectators")
+                    spectator = SpectatorConnection(relay, ice_servers)
+                    spectators.append(spectator)
+                    answer = await spectator.handle_offer(command.data.sdp, command.data.type)
+                    log.info("Spectator joined", spectators=len(spectators))
+                    response = SuccessResponse(data=answer)
+
+                elif isinstance(command, SnapshotCommand):
+                    if game is None:
+                        raise RuntimeError("The session hasn't started")
+                    running_game = game
+                    # Taken between two steps, and written while the game keeps running
+                    state, steps, params = await asyncio.wrap_future(running_game.call_between_steps(
+                        lambda: (running_game.snapshot(), running_game.stats.metrics.steps, running_game.params.model_dump(mode="json"))
+                    ))
+                    if state is None:
+                        raise RuntimeError(f"{implementation.__name__} doesn't support snapshots")
+                    meta = await asyncio.to_thread(save_snapshot, game_type, game_id, steps, params, state)
+                    log.info("Saved snapshot", snapshot_id=meta.snapshot_id, steps=steps)
+                    response = SuccessResponse(data=meta.model_dump(mode="json", exclude={"state", "tensors"}))
+
                 elif isinstance(command, StopCommand):
                     if rtc:
                         await rtc.cleanup()
@@ -267,8 +463,11 @@ async def main():
     # Clean up
     if rtc:
         await rtc.cleanup()
+    await close_spectators()
     if game:
         game.stop()
+        if game.recorder is not None:
+            game.recorder.close()
     writer.close()
     await writer.wait_closed()
     checker_task.cancel()
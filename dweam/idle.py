@@ -0,0 +1,75 @@
+"""
+Pausing sessions that nobody is playing.
+
+The browser reports when the game's tab is hidden (or the desktop window minimised). A session whose player
+has looked away for DWEAM_PAUSE_HIDDEN_AFTER seconds (default 10), or hasn't sent any input for
+DWEAM_PAUSE_IDLE_AFTER seconds (default 300), stops stepping until the player is back; 0 disables either.
+A session whose player lost the connection is paused right away, until they reconnect.
+While paused, the video track repeats the last frame once in a while to keep the stream alive.
+"""
+import os
+import time
+from typing import Any
+
+
+DEFAULT_PAUSE_HIDDEN_AFTER = 10.0
+DEFAULT_PAUSE_IDLE_AFTER = 300.0
+
+
+def _get_seconds(name: str, default: float) -> float | None:
+    seconds = float(os.environ.get(name, default))
+    return seconds if seconds > 0 else None
+
+
+class IdlePolicy:
+    """Pauses a game while its player is away, and resumes it as soon as they're back"""
+
+    def __init__(self, game: Any):
+        self.game = game
+        self.pause_hidden_after = _get_seconds("DWEAM_PAUSE_HIDDEN_AFTER", DEFAULT_PAUSE_HIDDEN_AFTER)
+        self.pause_idle_after = _get_seconds("DWEAM_PAUSE_IDLE_AFTER", DEFAULT_PAUSE_IDLE_AFTER)
+        self.visible = True
+        self.hidden_since: float | None = None
+        self.last_input = time.monotonic()
+        # Whether the game was paused by us (and not by the game itself)
+        self.paused_game = False
+
+    def on_input(self) -> None:
+        self.last_input = time.monotonic()
+        self.resume()
+
+    def on_visibility(self, visible: bool) -> None:
+        self.visible = visible
+        if visible:
+            self.hidden_since = None
+            self.on_input()
+        elif self.hidden_since is None:
+            self.hidden_since = time.monotonic()
+
+    def on_disconnect(self) -> None:
+        self.pause(disconnected=True)
+
+    def check(self) -> None:
+        """Pause the game if its player has been away for long enough; called periodically"""
+        if self.paused_game:
+            return
+        now = time.monotonic()
+        hidden = self.pause_hidden_after is not None and self.hidden_since is not None and now - self.hidden_since >= self.pause_hidden_after
+        idle = self.pause_idle_after is not None and now - self.last_input >= self.pause_idle_after
+        if hidden or idle:
+            self.pause(hidden=hidden, idle=idle)
+
+    def pause(self, **reason: bool) -> None:
+        if self.paused_game or self.game.paused:
+            return
+        self.game.log.info("Pausing idle session", **reason)
+        self.game.paused = True
+        self.paused_game = True
+        self.game.stats.record_idle(True)
+
+    def resume(self) -> None:
+        if self.paused_game:
+            self.game.log.info("Resuming idle session")
+            self.game.paused = False
+            self.paused_game = False
+            self.game.stats.record_idle(False)
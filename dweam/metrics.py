@@ -0,0 +1,206 @@
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from pydantic import BaseModel, Field
+
+from dweam.utils.resources import get_process_rss
+
+
+# Window over which the achieved frame rate of a session is measured
+FPS_WINDOW_SECONDS = 5.0
+
+
+class MappedWeights(BaseModel):
+    """A weights file mapped by a worker with `dweam.weights`"""
+    package: str | None = None
+    mapped_bytes: int
+    resident_bytes: int | None = None
+    proportional_bytes: int | None = Field(default=None, description="Resident bytes divided among the processes sharing each page")
+
+
+class WorkerMetrics(BaseModel):
+    """Performance counters of a single session, reported by its worker over the control channel"""
+    steps: int = 0
+    step_seconds_sum: float = 0.0
+    frames_dropped: int = 0
+    frames_sent: int = 0
+    frames_unchanged: int = Field(default=0, description="Frames skipped for being the same as the last one sent")
+    frames_repeated: int = Field(default=0, description="Frames sent again to keep the stream alive while no new frame came")
+    convert_seconds_sum: float = 0.0
+    encoded_frames: int = 0
+    encode_seconds_sum: float = 0.0
+    input_messages: int = 0
+    idle: bool = False
+    idle_seconds: float = 0.0
+    reconnects: int = Field(default=0, description="Times the player reconnected after losing the connection")
+    spectators: int = 0
+    relay_frames: int = 0
+    relay_seconds_sum: float = Field(default=0.0, description="Time encoding frames for spectators and forwarding them")
+    relay_frames_skipped: int = Field(default=0, description="Frames not relayed because the previous one was still encoding")
+    relay_packets_dropped: int = Field(default=0, description="Packets not forwarded to a spectator that fell behind")
+    fps: float = 0.0
+    time_to_first_frame: float | None = None
+    warmup_seconds: float | None = None
+    restore_seconds: float | None = None
+    cpu_seconds: float = 0.0
+    rss_bytes: int | None = None
+    weights: dict[str, MappedWeights] = Field(default_factory=dict, description="Mapped weights files, by path")
+
+
+def get_weights_metrics() -> dict[str, MappedWeights]:
+    """Memory of the weights files this process has mapped, by path"""
+    from dweam.weights import get_mapped_memory, get_mapped_weights
+
+    mapped_files = get_mapped_weights()
+    if not mapped_files:
+        return {}
+    memory = get_mapped_memory({str(mapped.path) for mapped in mapped_files})
+    weights = {}
+    for mapped in mapped_files:
+        resident, proportional = memory.get(str(mapped.path), (None, None))
+        weights[str(mapped.path)] = MappedWeights(
+            package=mapped.package, mapped_bytes=mapped.size,
+            resident_bytes=resident, proportional_bytes=proportional,
+        )
+    return weights
+
+
+class SessionStats:
+    """Collects the performance counters of a session inside the worker process"""
+
+    def __init__(self):
+        self.metrics = WorkerMetrics()
+        self._frame_times: deque[float] = deque()
+        self._offer_time: float | None = None
+        self._idle_since: float | None = None
+
+    def record_step(self, duration: float, dropped_frame: bool) -> None:
+        """Record a game step, and whether its frame replaced one that was never sent"""
+        self.metrics.steps += 1
+        self.metrics.step_seconds_sum += duration
+        if dropped_frame:
+            self.metrics.frames_dropped += 1
+
+    def record_offer(self, at: float | None = None) -> None:
+        """Mark the start of the session (a `time.perf_counter()` value), for time-to-first-frame"""
+        self._offer_time = time.perf_counter() if at is None else at
+
+    def record_warmup(self, duration: float) -> None:
+        self.metrics.warmup_seconds = duration
+
+    def record_restore(self, duration: float) -> None:
+        self.metrics.restore_seconds = duration
+
+    def record_frame_sent(self, convert_duration: float) -> None:
+        """Record a frame handed to the video track, and how long its conversion took"""
+        now = time.perf_counter()
+        self.metrics.frames_sent += 1
+        self.metrics.convert_seconds_sum += convert_duration
+        if self.metrics.time_to_first_frame is None and self._offer_time is not None:
+            self.metrics.time_to_first_frame = now - self._offer_time
+        self._frame_times.append(now)
+
+    def record_frame_unchanged(self) -> None:
+        self.metrics.frames_unchanged += 1
+
+    def record_frame_repeated(self) -> None:
+        self.metrics.frames_repeated += 1
+
+    def record_idle(self, idle: bool) -> None:
+        """Record the session being paused for its player being away, or resumed"""
+        now = time.perf_counter()
+        if self._idle_since is not None:
+            self.metrics.idle_seconds += now - self._idle_since
+        self._idle_since = now if idle else None
+        self.metrics.idle = idle
+
+    def record_reconnect(self) -> None:
+        self.metrics.reconnects += 1
+
+    def record_encode(self, duration: float) -> None:
+        self.metrics.encoded_frames += 1
+        self.metrics.encode_seconds_sum += duration
+
+    def record_input(self) -> None:
+        self.metrics.input_messages += 1
+
+    def record_spectators(self, count: int) -> None:
+        self.metrics.spectators = count
+
+    def record_relay(self, duration: float, dropped_packets: int) -> None:
+        """Record a frame encoded once and forwarded to the spectators"""
+        self.metrics.relay_frames += 1
+        self.metrics.relay_seconds_sum += duration
+        self.metrics.relay_packets_dropped += dropped_packets
+
+    def record_relay_skipped(self) -> None:
+        self.metrics.relay_frames_skipped += 1
+
+    def snapshot(self) -> WorkerMetrics:
+        now = time.perf_counter()
+        while self._frame_times and now - self._frame_times[0] > FPS_WINDOW_SECONDS:
+            self._frame_times.popleft()
+        self.metrics.fps = len(self._frame_times) / FPS_WINDOW_SECONDS
+        if self._idle_since is not None:
+            self.metrics.idle_seconds += now - self._idle_since
+            self._idle_since = now
+        self.metrics.cpu_seconds = time.process_time()
+        self.metrics.rss_bytes = get_process_rss()
+        self.metrics.weights = get_weights_metrics()
+        return self.metrics.model_copy()
+
+
+@dataclass
+class Summary:
+    """Running sum and count of observations, rendered as a Prometheus summary"""
+    sum: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+
+
+@dataclass
+class Metric:
+    """A metric family in the Prometheus text exposition format"""
+    name: str
+    type: str
+    help: str
+    samples: list[tuple[str, dict[str, str], float]] = field(default_factory=list)
+
+    def add(self, value: float, suffix: str = "", **labels: str) -> None:
+        self.samples.append((self.name + suffix, labels, value))
+
+    def add_summary(self, summary: Summary, **labels: str) -> None:
+        self.add(summary.sum, "_sum", **labels)
+        self.add(summary.count, "_count", **labels)
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render_prometheus(metrics: Iterable[Metric]) -> str:
+    """Render metric families in the Prometheus text exposition format"""
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples:
+            if labels:
+                label_str = ",".join(f'{key}="{_escape_label_value(str(val))}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_str}}} {_format_value(value)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -64,14 +64,15 @@ class GameInfo(StrictModel):
     description: str | None = Field(default=None, description="Short description for the game")
     tags: list[str] | None = Field(default=None, description="List of tags for the game")
     buttons: dict[str, str] | None = Field(default=None, description="Mapping of button labels to key combinations")
+    entrypoint: str | None = Field(default=None, description="Implementation of this game, if not the package's entrypoint")
     _metadata: "PackageMetadata | None" = PrivateAttr(None)
 
     def get_implementation(self) -> type:
-        """Get the game implementation class from the metadata's entrypoint"""
+        """Get the game implementation class from the game's or the metadata's entrypoint"""
         if not self._metadata:
             raise ValueError("Game metadata not set")
         from dweam.utils.entrypoint import load_game_implementation
-        return load_game_implementation(self._metadata.entrypoint)
+        return load_game_implementation(self.entrypoint or self._metadata.entrypoint)
 
 
 class GameInfoWithMetadata(GameInfo):
@@ -87,6 +88,8 @@ class PackageMetadata(StrictModel):
     thumbnail_dir: str = Field(default="thumbnails", description="Directory containing thumbnail videos (gif/webm/mp4)")
     games: dict[str, GameInfo]
     _module_dir: Path | None = PrivateAttr(None)
+    _package_name: str | None = PrivateAttr(None)
+    _venv_path: Path | None = PrivateAttr(None)
 
 
 class SourceConfig(StrictModel):
@@ -96,15 +99,48 @@ class SourceConfig(StrictModel):
 
 
 class ParamsUpdate(BaseModel):
-    """Parameter update request"""
-    session_id: str
-    params: dict
+    """Parameter update request: some of the params, or a batch of such changes applied in order"""
+    params: dict[str, Any] | list[dict[str, Any]]
+
+    def merged(self) -> dict[str, Any]:
+        """The changes of the batch, as a single update"""
+        if isinstance(self.params, dict):
+            return self.params
+        merged: dict[str, Any] = {}
+        for changes in self.params:
+            merged.update(changes)
+        return merged
+
+
+class InstallProgress(BaseModel):
+    """Progress of a package install, parsed from the installer's output"""
+    phase: Literal["resolving", "downloading", "building", "installing", "done"]
+    package: str | None = None
+    bytes_done: int | None = None
+    bytes_total: int | None = None
 
 
 class StatusResponse(BaseModel):
     is_loading: bool
+    is_refreshing: bool = Field(default=False, description="Whether games from the last run are served while checking for updates")
+    catalog_version: int = Field(default=0, description="Incremented whenever the games catalog changes")
     loading_message: str | None = None
     loading_detail: str | None = None
+    loading_progress: InstallProgress | None = None
+
+
+class NodeCapacity(BaseModel):
+    """Capacity report of a node agent, polled by the front server"""
+    node_id: str
+    is_loading: bool
+    max_sessions: int | None = Field(default=None, description="Session limit of the node, None if unlimited")
+    free_slots: int | None = Field(default=None, description="Number of sessions that can still be started, None if unlimited")
+    sessions: list[str] = Field(default_factory=list, description="IDs of the sessions running on the node")
+    idle_sessions: list[str] = Field(default_factory=list, description="IDs of the sessions paused because their player is away")
+    games: dict[str, list[str]] = Field(default_factory=dict, description="Game IDs available on the node, by game type")
+    warm_workers: dict[str, int] = Field(default_factory=dict, description="Number of running workers, by '{type}/{id}'")
+    memory_total: int | None = None
+    memory_available: int | None = None
 
 
 if __name__ == "__main__":
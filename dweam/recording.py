@@ -0,0 +1,298 @@
+"""
+Session recordings: every frame a game steps and every input it's sent, timestamped against the step counter.
+
+Recording is opt-in (DWEAM_RECORD=1, or DWEAM_RECORD_DIR to choose where). A recording is a directory of
+append-only files, so a crash leaves everything written so far readable:
+
+    meta.json       game, session, frame format
+    chunks.jsonl    one line per frame chunk: file name, frame shape, index of its first frame
+    frames-NNNNN.*  frame chunks, raw uint8 (height, width, 3) frames that can be memory-mapped,
+                    or encoded through PyAV with DWEAM_RECORD_FORMAT=video
+    frames.idx      (step, seconds) of every frame, as little-endian int64 + float64
+    inputs.jsonl    one [step, seconds, event] line per input or params update, `step` being the step that first sees it
+
+Frames are written by a background thread through a bounded queue; when the disk can't keep up,
+frames are left out of the recording (and counted) instead of holding up the game.
+"""
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Literal
+
+import numpy as np
+import pygame
+from pydantic import BaseModel, Field
+from structlog.stdlib import BoundLogger
+
+from dweam.utils.entrypoint import get_cache_dir
+
+
+RecordingFormat = Literal["raw", "video"]
+
+FRAME_INDEX = struct.Struct("<qd")
+# Raw chunks are closed after this many frames, so finished chunks are never written to again
+RAW_CHUNK_FRAMES = 256
+
+
+class RecordingMeta(BaseModel):
+    game_type: str
+    game_id: str
+    session_id: str | None = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    format: RecordingFormat = "raw"
+
+
+class FrameChunk(BaseModel):
+    file: str
+    shape: tuple[int, int, int]
+    first_frame: int
+
+
+@dataclass
+class RecordedInput:
+    step: int
+    seconds: float
+    event: dict[str, Any]
+
+
+def is_recording_enabled() -> bool:
+    return bool(os.environ.get("DWEAM_RECORD") or os.environ.get("DWEAM_RECORD_DIR"))
+
+
+def get_recordings_dir() -> Path:
+    """Where recordings are written (DWEAM_RECORD_DIR, by default in the cache dir)"""
+    recordings_dir = os.environ.get("DWEAM_RECORD_DIR")
+    if recordings_dir:
+        return Path(recordings_dir)
+    return get_cache_dir() / "recordings"
+
+
+def get_recording_format() -> RecordingFormat:
+    return "video" if os.environ.get("DWEAM_RECORD_FORMAT") == "video" else "raw"
+
+
+def surface_to_array(surface: pygame.Surface) -> np.ndarray:
+    """A pygame surface as a (height, width, 3) uint8 array"""
+    return np.ascontiguousarray(pygame.surfarray.array3d(surface).transpose(1, 0, 2))
+
+
+class SessionRecorder:
+    """Records a session's frames and inputs from any thread, writing them in the background"""
+
+    def __init__(
+        self,
+        log: BoundLogger,
+        path: Path,
+        meta: RecordingMeta,
+        max_buffered_frames: int = 8,
+    ):
+        self.log = log
+        self.path = path
+        self.meta = meta
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "meta.json").write_text(meta.model_dump_json(indent=2))
+        self._chunks_file = open(path / "chunks.jsonl", "a")
+        self._index_file = open(path / "frames.idx", "ab")
+        self._inputs_file = open(path / "inputs.jsonl", "a")
+
+        self._start = time.perf_counter()
+        self._frames: queue.Queue[tuple[int, float, pygame.Surface] | None] = queue.Queue(maxsize=max_buffered_frames)
+        # Inputs are tiny, and needed to replay the session, so they get a much deeper buffer
+        self._inputs: queue.Queue[tuple[int, float, dict]] = queue.Queue(maxsize=10_000)
+        self._chunk: BinaryIO | None = None
+        self._chunk_shape: tuple[int, int, int] | None = None
+        self._chunk_frames = 0
+        self._chunk_count = 0
+        self._container: Any = None
+        self._stream: Any = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True, name="session-recorder")
+        self._thread.start()
+
+    def record_frame(self, step: int, surface: pygame.Surface) -> None:
+        """Record the frame of a step; never blocks, dropping the frame if the writer is behind"""
+        if self._frames.full():
+            self.frames_dropped += 1
+            return
+        try:
+            # Games may draw their next frame into the same surface
+            self._frames.put_nowait((step, time.perf_counter() - self._start, surface.copy()))
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def record_input(self, step: int, event: dict) -> None:
+        try:
+            self._inputs.put_nowait((step, time.perf_counter() - self._start, event))
+        except queue.Full:
+            self.log.warning("Recorder input buffer full, dropping input")
+
+    def close(self) -> None:
+        """Write out everything buffered and close the recording"""
+        if not self._thread.is_alive():
+            return
+        self._frames.put(None)
+        self._thread.join(timeout=30)
+        self.log.info(
+            "Closed session recording", path=str(self.path),
+            frames_recorded=self.frames_recorded, frames_dropped=self.frames_dropped,
+        )
+
+    def _write_loop(self) -> None:
+        try:
+            while True:
+                try:
+                    item = self._frames.get(timeout=0.5)
+                except queue.Empty:
+                    self._write_inputs()
+                    continue
+                self._write_inputs()
+                if item is None:
+                    break
+                self._write_frame(*item)
+        except Exception:
+            self.log.exception("Session recording failed")
+        finally:
+            self._write_inputs()
+            self._close_chunk()
+            for f in (self._chunks_file, self._index_file, self._inputs_file):
+                f.close()
+
+    def _write_inputs(self) -> None:
+        while True:
+            try:
+                step, seconds, event = self._inputs.get_nowait()
+            except queue.Empty:
+                break
+            self._inputs_file.write(json.dumps([step, round(seconds, 6), event], separators=(",", ":")) + "\n")
+        self._inputs_file.flush()
+
+    def _write_frame(self, step: int, seconds: float, surface: pygame.Surface) -> None:
+        frame = surface_to_array(surface)
+        shape = (frame.shape[0], frame.shape[1], frame.shape[2])
+        if shape != self._chunk_shape or (self.meta.format == "raw" and self._chunk_frames >= RAW_CHUNK_FRAMES):
+            self._open_chunk(shape)
+
+        if self.meta.format == "video":
+            from av.video.frame import VideoFrame
+
+            video_frame = VideoFrame.from_ndarray(frame, format="rgb24")
+            # Plays back at the nominal rate; when each frame was actually stepped is in the frame index
+            video_frame.pts = self._chunk_frames
+            for packet in self._stream.encode(video_frame):
+                self._container.mux(packet)
+        else:
+            assert self._chunk is not None
+            self._chunk.write(frame.tobytes())
+            self._chunk.flush()
+
+        self._index_file.write(FRAME_INDEX.pack(step, seconds))
+        self._index_file.flush()
+        self._chunk_frames += 1
+        self.frames_recorded += 1
+
+    def _open_chunk(self, shape: tuple[int, int, int]) -> None:
+        self._close_chunk()
+        chunk_number = self._chunk_count
+        if self.meta.format == "video":
+            import av.container
+
+            file = f"frames-{chunk_number:05d}.mp4"
+            self._container = av.container.open(str(self.path / file), mode="w")
+            self._stream = self._container.add_stream("mpeg4", rate=30)
+            # yuv420p needs even dimensions
+            self._stream.height = shape[0] - shape[0] % 2
+            self._stream.width = shape[1] - shape[1] % 2
+            self._stream.pix_fmt = "yuv420p"
+        else:
+            file = f"frames-{chunk_number:05d}.raw"
+            self._chunk = open(self.path / file, "ab")
+        chunk = FrameChunk(file=file, shape=shape, first_frame=self.frames_recorded)
+        self._chunks_file.write(chunk.model_dump_json() + "\n")
+        self._chunks_file.flush()
+        self._chunk_shape = shape
+        self._chunk_frames = 0
+        self._chunk_count += 1
+
+    def _close_chunk(self) -> None:
+        if self._chunk is not None:
+            self._chunk.close()
+            self._chunk = None
+        if self._container is not None:
+            for packet in self._stream.encode(None):
+                self._container.mux(packet)
+            self._container.close()
+            self._container = None
+            self._stream = None
+
+
+def start_session_recording(log: BoundLogger, game_type: str, game_id: str, session_id: str | None = None) -> SessionRecorder:
+    """Start recording a session into a new directory under the recordings dir"""
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{game_id}" + (f"-{session_id}" if session_id else "")
+    meta = RecordingMeta(game_type=game_type, game_id=game_id, session_id=session_id, format=get_recording_format())
+    return SessionRecorder(log, get_recordings_dir() / name, meta)
+
+
+def read_inputs(path: Path) -> list[RecordedInput]:
+    """Read an input log (a recording's inputs.jsonl)"""
+    inputs = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                step, seconds, event = json.loads(line)
+                inputs.append(RecordedInput(step, seconds, event))
+    return inputs
+
+
+class Recording:
+    """A recording on disk, for reading back"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.meta = RecordingMeta.model_validate_json((path / "meta.json").read_text())
+
+    def chunks(self) -> list[FrameChunk]:
+        with open(self.path / "chunks.jsonl") as f:
+            return [FrameChunk.model_validate_json(line) for line in f if line.strip()]
+
+    def frame_index(self) -> np.ndarray:
+        """(step, seconds) of every recorded frame, as a structured array"""
+        data = (self.path / "frames.idx").read_bytes()
+        data = data[:len(data) - len(data) % FRAME_INDEX.size]
+        return np.frombuffer(data, dtype=np.dtype([("step", "<i8"), ("seconds", "<f8")]))
+
+    def inputs(self) -> list[RecordedInput]:
+        return read_inputs(self.path / "inputs.jsonl")
+
+    def frames(self) -> Iterator[tuple[int, float, np.ndarray]]:
+        """Every recorded frame with its step and time; raw frames are memory-mapped, not read"""
+        index = self.frame_index()
+        for chunk in self.chunks():
+            if self.meta.format == "video":
+                import av.container
+
+                with av.container.open(str(self.path / chunk.file)) as container:
+                    for i, video_frame in enumerate(container.decode(video=0)):
+                        if chunk.first_frame + i >= len(index):
+                            return
+                        step, seconds = index[chunk.first_frame + i]
+                        yield int(step), float(seconds), video_frame.to_ndarray(format="rgb24")
+            else:
+                chunk_path = self.path / chunk.file
+                frame_bytes = int(np.prod(chunk.shape))
+                count = chunk_path.stat().st_size // frame_bytes
+                if count == 0:
+                    continue
+                frames = np.memmap(chunk_path, dtype=np.uint8, mode="r", shape=(count, *chunk.shape))
+                for i in range(count):
+                    if chunk.first_frame + i >= len(index):
+                        return
+                    step, seconds = index[chunk.first_frame + i]
+                    yield int(step), float(seconds), frames[i]
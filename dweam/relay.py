@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+from av.packet import Packet
+from av.video.frame import VideoFrame, PictureType
+from aiortc import MediaStreamTrack, RTCPeerConnection, RTCRtpSender, RTCSessionDescription, RTCConfiguration, RTCIceServer
+from aiortc.codecs.h264 import create_encoder_context, DEFAULT_BITRATE
+
+from dweam.metrics import SessionStats
+
+
+DEFAULT_MAX_SPECTATORS = 8
+
+# Packets a spectator may fall behind before it's resynchronised on the next keyframe
+SPECTATOR_QUEUE_SIZE = 30
+
+# A keyframe every few seconds, so spectators recover from packet loss (they can't ask for one)
+KEYFRAME_INTERVAL = 60
+
+
+def get_max_spectators() -> int:
+    return int(os.environ.get("DWEAM_MAX_SPECTATORS", DEFAULT_MAX_SPECTATORS))
+
+
+class RelayedVideoTrack(MediaStreamTrack):
+    """A spectator's video track, fed with packets already encoded by the relay"""
+    kind = "video"
+
+    def __init__(self, relay: "SpectatorRelay"):
+        super().__init__()
+        self.relay = relay
+        self.queue: asyncio.Queue[Packet] = asyncio.Queue(maxsize=SPECTATOR_QUEUE_SIZE)
+        self.waiting_for_keyframe = True
+
+    def push(self, packet: Packet) -> bool:
+        """Queue a packet, or return False if it had to be dropped"""
+        if self.waiting_for_keyframe:
+            if not packet.is_keyframe:
+                return False
+            self.waiting_for_keyframe = False
+        try:
+            self.queue.put_nowait(packet)
+            return True
+        except asyncio.QueueFull:
+            # Decoding can only resume from a keyframe, so skip ahead to the next one
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.waiting_for_keyframe = True
+            self.relay.request_keyframe()
+            return False
+
+    async def recv(self) -> Packet:
+        # aiortc's sender packetizes `Packet`s as they are, without encoding them again
+        return await self.queue.get()
+
+    def stop(self) -> None:
+        super().stop()
+        self.relay.unsubscribe(self)
+
+
+class SpectatorRelay:
+    """
+    Encodes a session's frames once, with H.264, and forwards the packets to every spectator.
+    The player keeps its own encoder, whose bitrate adapts to its connection.
+    """
+
+    def __init__(self, stats: SessionStats):
+        self.stats = stats
+        self.tracks: set[RelayedVideoTrack] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spectator-relay")
+        self._codec = None
+        self._frames_since_keyframe = 0
+        self._force_keyframe = False
+        self._encoding = False
+
+    def subscribe(self) -> RelayedVideoTrack:
+        track = RelayedVideoTrack(self)
+        self.tracks.add(track)
+        self.stats.record_spectators(len(self.tracks))
+        self.request_keyframe()
+        return track
+
+    def unsubscribe(self, track: RelayedVideoTrack) -> None:
+        self.tracks.discard(track)
+        self.stats.record_spectators(len(self.tracks))
+
+    def request_keyframe(self) -> None:
+        self._force_keyframe = True
+
+    def publish(self, frame: VideoFrame) -> None:
+        """Hand over a frame sent to the player; must be called from the event loop"""
+        if not self.tracks:
+            return
+        if self._encoding:
+            # Spectators get the same frame rate as the encoder manages, never a backlog
+            self.stats.record_relay_skipped()
+            return
+        self._encoding = True
+        # The track may send the same frame again with a new timestamp while it's being encoded
+        asyncio.ensure_future(self._relay(frame, frame.pts, frame.time_base))
+
+    async def _relay(self, frame: VideoFrame, pts: int, time_base: Fraction) -> None:
+        start = time.perf_counter()
+        try:
+            packets = await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, frame, pts, time_base)
+        finally:
+            self._encoding = False
+        dropped = 0
+        for packet in packets:
+            for track in list(self.tracks):
+                if not track.push(packet):
+                    dropped += 1
+        self.stats.record_relay(time.perf_counter() - start, dropped)
+
+    def _encode(self, frame: VideoFrame, pts: int, time_base: Fraction) -> list[Packet]:
+        # Work on a copy: the player's encoder sets the picture type of the original
+        image = frame.reformat(format="yuv420p")
+        if self._codec is not None and (image.width != self._codec.width or image.height != self._codec.height):
+            self._codec = None
+        if self._codec is None:
+            self._codec, _ = create_encoder_context("libx264", image.width, image.height, bitrate=DEFAULT_BITRATE)
+            self._force_keyframe = True
+
+        if self._force_keyframe or self._frames_since_keyframe >= KEYFRAME_INTERVAL:
+            image.pict_type = PictureType.I
+            self._force_keyframe = False
+            self._frames_since_keyframe = 0
+        self._frames_since_keyframe += 1
+
+        packets = self._codec.encode(image)
+        for packet in packets:
+            # Zero-latency x264 emits a packet per frame, so the frame's timestamp applies
+            packet.pts = pts
+            packet.time_base = time_base
+        return packets
+
+    def close(self) -> None:
+        for track in list(self.tracks):
+            track.stop()
+        self._executor.shutdown(wait=False)
+
+
+class SpectatorConnection:
+    """A read-only peer of a session: receives the relayed video and sends nothing back"""
+
+    def __init__(self, relay: SpectatorRelay, ice_servers: list[dict] | None = None):
+        config = RTCConfiguration(
+            iceServers=[RTCIceServer(**server) for server in (ice_servers or [])]
+        )
+        self.pc = RTCPeerConnection(configuration=config)
+        self.track = relay.subscribe()
+        self.pc.addTrack(self.track)
+        # The relayed packets are H.264, so that's the only codec the answer may pick
+        h264 = [codec for codec in RTCRtpSender.getCapabilities("video").codecs if codec.mimeType == "video/H264"]
+        for transceiver in self.pc.getTransceivers():
+            transceiver.setCodecPreferences(h264)
+
+        @self.pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            if self.pc.connectionState in ("failed", "closed", "disconnected"):
+                await self.close()
+
+    @property
+    def is_closed(self) -> bool:
+        return self.pc.connectionState == "closed"
+
+    async def handle_offer(self, sdp: str, type_: str) -> dict:
+        await self.pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=type_))
+        answer = await self.pc.createAnswer()
+        await self.pc.setLocalDescription(answer)
+        return {
+            "sdp": self.pc.localDescription.sdp,
+            "type": self.pc.localDescription.type
+        }
+
+    async def close(self) -> None:
+        self.track.stop()
+        if self.pc.connectionState != "closed":
+            await self.pc.close()
@@ -0,0 +1,100 @@
+"""
+Run a front server that places sessions across node agents.
+
+Each node agent is a regular `dweam.server` instance; the front server (`dweam.front`)
+polls their `/node/capacity` and routes `/offer` to the node with the most spare capacity.
+
+Examples:
+    # Three local node agents on ports 8081-8083 behind a front server on 8080
+    python dweam/scripts/cluster.py --local-nodes 3 --max-sessions 2
+
+    # Front server only, in front of agents running on other hosts
+    python dweam/scripts/cluster.py --node http://gpu-1:8080 --node http://gpu-2:8080
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import requests
+import uvicorn
+
+
+def wait_for_node(url: str, process: subprocess.Popen, timeout: float) -> bool:
+    """Wait until a node agent has started and finished loading its games"""
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        if process.poll() is not None:
+            return False
+        try:
+            response = requests.get(f"{url}/status", timeout=2)
+            if response.ok and not response.json()["is_loading"]:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    return False
+
+
+def start_local_nodes(count: int, host: str, base_port: int, max_sessions: int | None, timeout: float) -> tuple[list[subprocess.Popen], list[str]]:
+    processes = []
+    urls = []
+    for i in range(count):
+        port = base_port + i
+        url = f"http://{host}:{port}"
+        env = os.environ.copy()
+        env["DWEAM_NODE_ID"] = f"local-{i}"
+        if max_sessions is not None:
+            env["DWEAM_MAX_SESSIONS"] = str(max_sessions)
+
+        print(f"Starting node agent {i} on {url}")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "dweam.server:app", "--host", host, "--port", str(port)],
+            env=env,
+        )
+        processes.append(process)
+        urls.append(url)
+
+        # Agents share the venv, so let each finish installing before starting the next
+        if not wait_for_node(url, process, timeout):
+            print(f"Node agent {i} failed to start")
+            for process in processes:
+                process.terminate()
+            sys.exit(1)
+
+    return processes, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--node", action="append", default=[], help="URL of an already running node agent")
+    parser.add_argument("--local-nodes", type=int, default=0, help="Number of node agents to start on this host")
+    parser.add_argument("--max-sessions", type=int, default=None, help="Session limit of each local node agent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Port of the front server")
+    parser.add_argument("--node-base-port", type=int, default=8081, help="Port of the first local node agent")
+    parser.add_argument("--node-timeout", type=float, default=3600, help="Seconds to wait for a local node agent to load its games")
+    args = parser.parse_args()
+
+    processes, urls = start_local_nodes(args.local_nodes, args.host, args.node_base_port, args.max_sessions, args.node_timeout)
+    urls += args.node
+    if not urls:
+        parser.error("Specify --node or --local-nodes")
+
+    os.environ["DWEAM_NODES"] = ",".join(urls)
+
+    # Imported after DWEAM_NODES is set, since the node list is read at import time
+    from dweam.front import app
+
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,328 @@
-import glob
-import subprocess
+"""
+Generate the thumbnail clips of games (a webm and an mp4 each) into their package's thumbnail dir.
+
+Clips are made from a headless run of the game (replaying a recorded session's inputs with `--trace`),
+a session recording, or a GIF, and encoded with PyAV, one game per process of a pool as large as the
+number of cores. A game's clips are only rebuilt when their source or the encode settings change: a hash
+of both is kept in the thumbnail dir's thumbnails.json manifest, which the server serves the clips from.
+
+    python -m dweam.scripts.generate_thumbnails                         # every installed game, run headless
+    python -m dweam.scripts.generate_thumbnails --game Dweam/noise --recording ~/.dweam/cache/recordings/<session>
+    python -m dweam.scripts.generate_thumbnails --game Diamond/csgo --gif csgo.gif
+"""
+import argparse
+import hashlib
+import json
 import os
-import re
-from PIL import Image
-import yaml
-import pydantic
-
-
-# def get_game_list(games_js_path) -> list[Game]:
-#     with open(games_js_path, 'r') as file:
-#         content = yaml.safe_load(file)
-#     return pydantic.TypeAdapter(GamesConfig).validate_python(content).games
-
-
-# def generate_gif_for_game(game: Game, num_frames=50, fps=15, size=640, output_dir='dweam_web/public/thumbnails', force=False):
-#     os.makedirs(output_dir, exist_ok=True)
-
-#     gif_path = os.path.join(output_dir, f"{game.id}.gif")
-#     if os.path.exists(gif_path) and not force:
-#         print(f"GIF already exists for {game.id}")
-#         return gif_path
-    
-#     # Prepare the game using prepare_play_mode_impl
-#     if game.id == 'csgo':
-#         from diamond_csgo.play import prepare_play_mode_impl
-#         game_obj = prepare_play_mode_impl(
-#             pretrained=True,
-#             record=True,
-#             num_steps_initial_collect=1000,
-#             store_denoising_trajectory=False,
-#             store_original_obs=False,
-#             fps=fps,
-#             size=size,
-#             no_header=True,
-#             record_frames=30 * 10,
-#             # record_frames=num_frames,
-#             human_player=False,
-#         )
-#     else:
-#         from diamond.play import prepare_play_mode_impl
-#         game_obj = prepare_play_mode_impl(
-#             pretrained=True,
-#             id=game.id,
-#             record=True,
-#             num_steps_initial_collect=1000,
-#             store_denoising_trajectory=False,
-#             store_original_obs=False,
-#             fps=fps,
-#             size=size,
-#             no_header=True,
-#             record_frames=num_frames,
-#             human_player=False,
-#         )
-    
-#     # Run the game and record frames
-#     game_obj.run()
-    
-#     # Retrieve frames and save as GIF
-#     frames = game_obj.frames
-#     frames = [frame.transpose((1, 0, 2)) for frame in frames]  # Convert frames for saving
-    
-#     # Save frames as GIF
-#     pil_frames = [Image.fromarray(frame) for frame in frames]
-#     pil_frames[0].save(
-#         gif_path,
-#         save_all=True,
-#         append_images=pil_frames[1:],
-#         duration=int(1000/fps),
-#         loop=0
-#     )
-
-#     return gif_path
-    
-
-# def generate_thumbnail_gifs(force=False):
-#     # TODO this is outdated
-#     games_js_path = 'games_config.yaml'
-#     games = get_game_list(games_js_path)
-    
-#     paths = []
-#     for game in games:
-#         print(f"Generating GIF for {game}")
-#         path = generate_gif_for_game(game, force=force)
-#         paths.append(path)
-#         print(f"Saved GIF to {path}")
-#     return paths
-
-
-def convert_gifs(force=False):
-    paths = glob.glob('*.gif')
-    for path in paths:
-        webm_path = path.replace(".gif", ".webm")
-        if os.path.exists(webm_path) and not force:
-            print(f"Webm already exists for {path}")
-        else:
-            print(f"Converting {path} to webm")
-            if path.endswith('csgo.gif'):
-                subprocess.run(['ffmpeg', '-y', '-i', path, '-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '20', '-b:v', '1M', f'{path.replace(".gif", ".webm")}'])
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from importlib import metadata as importlib_metadata
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Literal
+
+from dweam.log_config import get_logger
+from dweam.models import GameInfo
+from dweam.utils.thumbnails import ThumbnailEntry, ThumbnailFile, get_thumbnail_dir, load_manifest, write_manifest
+from dweam.utils.wheelhouse import hash_file
+
+
+# Bump to rebuild every clip, e.g. when the frame pipeline changes
+PIPELINE_VERSION = 1
+
+# (codec, codec options, container options) by extension, with fallbacks for PyAV builds without the codec
+ENCODERS: dict[str, list[tuple[str, dict[str, str], dict[str, str]]]] = {
+    "webm": [("libvpx-vp9", {"crf": "30", "b": "0"}, {})],
+    "mp4": [
+        ("libx264", {"crf": "23", "preset": "medium"}, {"movflags": "+faststart"}),
+        ("mpeg4", {"qscale": "4"}, {"movflags": "+faststart"}),
+    ],
+}
+
+
+@dataclass
+class ClipJob:
+    game_type: str
+    game_id: str
+    source: Literal["game", "recording", "gif"]
+    output_dir: Path
+    source_path: Path | None = None
+    trace: Path | None = None
+    params: dict[str, Any] = field(default_factory=dict)
+    frames: int = 90
+    skip: int = 30
+    fps: int = 30
+    max_width: int = 640
+    formats: tuple[str, ...] = ("webm", "mp4")
+    seed: int = 0
+
+    def settings(self) -> dict[str, Any]:
+        """Everything about the job that changes its clips, besides the source's content"""
+        settings = asdict(self)
+        del settings["output_dir"], settings["source_path"], settings["trace"]
+        settings["encoders"] = {ext: ENCODERS[ext] for ext in self.formats}
+        settings["pipeline_version"] = PIPELINE_VERSION
+        return settings
+
+
+def hash_tree(path: Path, pattern: str) -> str:
+    digest = hashlib.sha256()
+    for file in sorted(path.rglob(pattern)):
+        if "__pycache__" in file.parts:
+            continue
+        digest.update(str(file.relative_to(path)).encode())
+        digest.update(hash_file(file).encode())
+    return digest.hexdigest()
+
+
+def get_source_key(job: ClipJob, game_info: GameInfo) -> str:
+    """Hash of what the clips are made from and how, so unchanged clips aren't re-encoded"""
+    digest = hashlib.sha256(json.dumps(job.settings(), sort_keys=True, default=str).encode())
+    if job.source == "game":
+        metadata = game_info._metadata
+        assert metadata is not None and metadata._module_dir is not None
+        package_name = metadata._package_name or "dweam"
+        try:
+            version = importlib_metadata.version(package_name)
+        except importlib_metadata.PackageNotFoundError:
+            version = None
+        # Editable installs change without a version bump
+        digest.update(f"{package_name}=={version}:{hash_tree(metadata._module_dir, '*.py')}".encode())
+        if job.trace is not None:
+            trace_files = [job.trace / "inputs.jsonl"] if job.trace.is_dir() else [job.trace]
+            for trace_file in trace_files:
+                digest.update(hash_file(trace_file).encode())
+    elif job.source == "recording":
+        assert job.source_path is not None
+        digest.update(hash_tree(job.source_path, "*").encode())
+    else:
+        assert job.source_path is not None
+        digest.update(hash_file(job.source_path).encode())
+    return digest.hexdigest()
+
+
+def run_game_frames(job: ClipJob) -> list:
+    """Frames of a headless run of the game, replaying the trace's inputs if there is one"""
+    import random
+
+    import numpy as np
+
+    from dweam.recording import Recording, read_inputs, surface_to_array
+    from dweam.utils.entrypoint import load_games
+
+    log = get_logger()
+    game_info = load_games(log)[job.game_type][job.game_id]
+    implementation = game_info.get_implementation()
+    random.seed(job.seed)
+    np.random.seed(job.seed)
+    game = implementation(log=log, game_id=job.game_id)
+    if job.params:
+        game.on_params_update(implementation.Params.model_validate(job.params))
+    game.warmup()
+
+    inputs = []
+    if job.trace is not None:
+        inputs = Recording(job.trace).inputs() if job.trace.is_dir() else read_inputs(job.trace)
+    inputs.sort(key=lambda item: item.step)
+
+    frames = []
+    while len(frames) < job.frames:
+        while inputs and inputs[0].step <= game.stats.metrics.steps:
+            event = inputs.pop(0).event
+            if event.get("type") == "params":
+                game.on_params_update(implementation.Params.model_validate(event["params"]))
             else:
-                subprocess.run(['ffmpeg', '-y', '-i', path, '-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '30', f'{path.replace(".gif", ".webm")}'])
-            print(f"Converted {path} to webm")
-
-        mp4_path = path.replace(".gif", ".mp4")
-        if os.path.exists(mp4_path) and not force:
-            print(f"MP4 already exists for {path}")
-        else:
-            print(f"Converting {path} to mp4")
-            subprocess.run(['ffmpeg', '-y', '-i', path, '-movflags', 'faststart', '-pix_fmt', 'yuv420p', '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2', f'{path.replace(".gif", ".mp4")}'])
-            print(f"Converted {path} to mp4")
-
-
-if __name__ == '__main__':
-    force = False
-    # paths = generate_thumbnail_gifs(force=force)
-    convert_gifs(force=force)
+                game.post_input(event)
+        step = game.stats.metrics.steps
+        surface = game._tick()
+        if surface is not None and step >= job.skip:
+            frames.append(surface_to_array(surface))
+    return frames
+
+
+def read_frames(job: ClipJob) -> list:
+    """The frames of the job's source, as (height, width, 3) uint8 arrays"""
+    if job.source == "game":
+        return run_game_frames(job)
+
+    assert job.source_path is not None
+    frames = []
+    if job.source == "recording":
+        from dweam.recording import Recording
+
+        for i, (_, _, frame) in enumerate(Recording(job.source_path).frames()):
+            if i >= job.skip:
+                frames.append(frame)
+            if len(frames) >= job.frames:
+                break
+    else:
+        import av.container
+
+        with av.container.open(str(job.source_path)) as container:
+            for i, video_frame in enumerate(container.decode(video=0)):
+                if i >= job.skip:
+                    frames.append(video_frame.to_ndarray(format="rgb24"))
+                if len(frames) >= job.frames:
+                    break
+    return frames
+
+
+def encode_clip(frames: list, path: Path, ext: str, fps: int, width: int, height: int) -> None:
+    """Encode frames into a clip, atomically"""
+    import av.container
+    from av.codec.codec import Codec
+    from av.video.frame import VideoFrame
+    from av.video.stream import VideoStream
+
+    for codec, options, container_options in ENCODERS[ext]:
+        try:
+            Codec(codec, "w")
+            break
+        except Exception:
+            continue
+    else:
+        raise RuntimeError(f"No encoder for .{ext} clips in this PyAV build")
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-")
+    os.close(fd)
+    try:
+        with av.container.open(tmp_path, mode="w", format=ext, options=container_options) as container:
+            stream = container.add_stream(codec, rate=fps, options=options)
+            assert isinstance(stream, VideoStream)
+            stream.width, stream.height = width, height
+            stream.pix_fmt = "yuv420p"
+            # The pool already uses every core
+            stream.thread_count = 1
+            for i, frame in enumerate(frames):
+                video_frame = VideoFrame.from_ndarray(frame, format="rgb24").reformat(width=width, height=height, format="yuv420p")
+                video_frame.pts = i
+                for packet in stream.encode(video_frame):
+                    container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+        # mkstemp creates files only the owner can read
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def build_clips(job: ClipJob, key: str) -> ThumbnailEntry:
+    """Make a game's clips (runs in a pool process)"""
+    frames = read_frames(job)
+    if not frames:
+        raise ValueError(f"No frames in the source of {job.game_type}/{job.game_id}")
+    height, width = frames[0].shape[:2]
+    if width > job.max_width:
+        width, height = job.max_width, round(height * job.max_width / width)
+    # yuv420p needs even dimensions
+    width, height = width - width % 2, height - height % 2
+
+    job.output_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for ext in job.formats:
+        path = job.output_dir / f"{job.game_id}.{ext}"
+        encode_clip(frames, path, ext, job.fps, width, height)
+        files[ext] = ThumbnailFile(file=path.name, sha256=hash_file(path), size=path.stat().st_size)
+    source = str(job.source_path) if job.source_path is not None else "game"
+    return ThumbnailEntry(key=key, source=source, frames=len(frames), width=width, height=height, fps=job.fps, files=files)
+
+
+def is_up_to_date(output_dir: Path, game_id: str, key: str) -> bool:
+    entry = load_manifest(output_dir).games.get(game_id)
+    if entry is None or entry.key != key:
+        return False
+    return all(
+        (output_dir / file.file).exists() and (output_dir / file.file).stat().st_size == file.size
+        for file in entry.files.values()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--game", action="append", help="TYPE/ID of a game to make clips of (default: every installed game)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--recording", type=Path, help="make the clip from this session recording instead of running the game")
+    source.add_argument("--gif", type=Path, help="make the clip from this GIF instead of running the game")
+    parser.add_argument("--trace", type=Path, help="recording (or inputs.jsonl) whose inputs to play when running the game")
+    parser.add_argument("--params", type=json.loads, default={}, help="game params as JSON, when running the game")
+    parser.add_argument("--frames", type=int, default=90, help="frames per clip")
+    parser.add_argument("--skip", type=int, default=30, help="frames to skip at the start of the source")
+    parser.add_argument("--fps", type=int, default=30, help="frame rate of the clips")
+    parser.add_argument("--max-width", type=int, default=640, help="scale clips down to this width")
+    parser.add_argument("--output", type=Path, help="write clips and the manifest here instead of the packages' thumbnail dirs")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="games to encode in parallel")
+    parser.add_argument("--force", action="store_true", help="rebuild clips that are up to date")
+    args = parser.parse_args()
+
+    if (args.recording or args.gif) and (not args.game or len(args.game) != 1):
+        sys.exit("--recording and --gif need exactly one --game")
+
+    # No window or audio device; pool processes inherit these
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    from dweam.utils.entrypoint import load_games
+
+    log = get_logger()
+    games = load_games(log)
+    selected = args.game or [f"{game_type}/{game_id}" for game_type, type_games in games.items() for game_id in type_games]
+
+    jobs: list[tuple[ClipJob, str]] = []
+    for name in selected:
+        game_type, _, game_id = name.partition("/")
+        game_info = games.get(game_type, {}).get(game_id)
+        if game_info is None or game_info._metadata is None:
+            sys.exit(f"Game {name} not found")
+        output_dir = args.output or get_thumbnail_dir(game_info._metadata)
+        if output_dir is None:
+            print(f"{name}: package not installed, skipping")
+            continue
+        job = ClipJob(
+            game_type=game_type,
+            game_id=game_id,
+            source="recording" if args.recording else "gif" if args.gif else "game",
+            output_dir=output_dir,
+            source_path=args.recording or args.gif,
+            trace=args.trace,
+            params=args.params,
+            frames=args.frames,
+            skip=args.skip,
+            fps=args.fps,
+            max_width=args.max_width,
+        )
+        key = get_source_key(job, game_info)
+        if not args.force and is_up_to_date(output_dir, game_id, key):
+            print(f"{name}: up to date")
+            continue
+        jobs.append((job, key))
+
+    if not jobs:
+        return
+    failed = 0
+    # Spawned rather than forked, as games may initialize CUDA
+    with ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs)), mp_context=get_context("spawn")) as pool:
+        futures = {pool.submit(build_clips, job, key): job for job, key in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            name = f"{job.game_type}/{job.game_id}"
+            try:
+                entry = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"{name}: failed: {e}")
+                continue
+            # Re-read, as games of the same package finish in any order
+            manifest = load_manifest(job.output_dir)
+            manifest.games[job.game_id] = entry
+            write_manifest(job.output_dir, manifest)
+            print(f"{name}: {entry.frames} frames at {entry.width}x{entry.height} -> {', '.join(file.file for file in entry.files.values())}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
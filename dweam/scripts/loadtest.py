@@ -0,0 +1,426 @@
+"""
+Synthetic WebRTC load test for the offer/stream path.
+
+Opens concurrent sessions against a running server the same way the web client does:
+POST /offer, read the answer from the SSE stream, connect with aiortc, then send heartbeats
+and scripted inputs over the data channel while receiving video.
+Reports per-session received FPS, frame jitter and time-to-first-frame, along with the
+CPU and memory use of the server and its workers (scraped from /metrics) and of the host.
+
+Start a server with the CPU-only test game enabled, then step through session counts
+to find where received FPS starts dropping:
+    DWEAM_BUILTIN_GAMES=1 python dweam/scripts/serve.py
+    python dweam/scripts/loadtest.py --sessions 1,2,4,8,16 --duration 30
+
+With --spectators, every session is also watched by read-only viewers (POST /spectate),
+which share one encode of the session's frames.
+
+Note that the clients decode video on the same host, which takes CPU of its own.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field, asdict
+from urllib.parse import urlparse
+
+import aiohttp
+from aiortc import RTCPeerConnection, RTCSessionDescription
+from aiortc.mediastreams import MediaStreamError
+
+from dweam.utils.resources import get_memory_info, get_system_cpu_times
+
+
+# Inputs cycled through by each session, mirroring what GameViewReact.tsx sends
+INPUT_SCRIPT = [
+    {"type": "keydown", "key": 87},  # W
+    {"type": "mousemove", "movementX": 5, "movementY": 0},
+    {"type": "keyup", "key": 87},
+    {"type": "keydown", "key": 68},  # D
+    {"type": "mousemove", "movementX": -5, "movementY": 2},
+    {"type": "keyup", "key": 68},
+    {"type": "mousedown", "button": 0},
+    {"type": "mouseup", "button": 0},
+]
+
+
+@dataclass
+class SpectatorResult:
+    error: str | None = None
+    time_to_first_frame: float | None = None
+    frames: int = 0
+    fps: float | None = None
+
+
+@dataclass
+class SessionResult:
+    index: int
+    session_id: str | None = None
+    error: str | None = None
+    answer_seconds: float | None = None
+    time_to_first_frame: float | None = None
+    frames: int = 0
+    fps: float | None = None
+    jitter_ms: float | None = None
+    inputs_sent: int = 0
+    spectators: list[SpectatorResult] = field(default_factory=list)
+
+
+@dataclass
+class ResourceSample:
+    host_cpu_percent: float | None = None
+    host_memory_used: int | None = None
+    server_cpu_percent: float | None = None
+    server_rss: int | None = None
+    workers_cpu_percent: float | None = None
+    workers_rss: int | None = None
+
+
+@dataclass
+class LevelResult:
+    sessions: int
+    results: list[SessionResult] = field(default_factory=list)
+    samples: list[ResourceSample] = field(default_factory=list)
+
+
+async def read_answer(response: aiohttp.ClientResponse, on_loading) -> dict:
+    """Read SSE events from the offer response until the answer arrives"""
+    event = None
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        if line.startswith("event:"):
+            event = line.removeprefix("event:").strip()
+        elif line.startswith("data:"):
+            data = line.removeprefix("data:").strip()
+            if event == "answer":
+                return json.loads(data)
+            if event == "error":
+                raise RuntimeError(data)
+            if event == "loading":
+                on_loading(data)
+    raise RuntimeError("Offer stream closed before an answer was received")
+
+
+def consume_video(pc: RTCPeerConnection, frame_times: list[float], first_frame: asyncio.Event, tasks: list[asyncio.Task]) -> None:
+    """Record the arrival time of every video frame the connection receives"""
+    async def consume(track):
+        while True:
+            try:
+                await track.recv()
+            except MediaStreamError:
+                return
+            frame_times.append(time.perf_counter())
+            first_frame.set()
+
+    @pc.on("track")
+    def on_track(track):
+        if track.kind == "video":
+            tasks.append(asyncio.create_task(consume(track)))
+
+
+def get_fps(frame_times: list[float]) -> float | None:
+    if len(frame_times) < 2:
+        return None
+    return (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+
+
+async def watch_session(http: aiohttp.ClientSession, args: argparse.Namespace, session_id: str) -> SpectatorResult:
+    """Spectate a session for the test's duration"""
+    result = SpectatorResult()
+    frame_times: list[float] = []
+    first_frame = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    pc = RTCPeerConnection()
+    pc.addTransceiver("video", direction="recvonly")
+    consume_video(pc, frame_times, first_frame, tasks)
+
+    start = time.perf_counter()
+    try:
+        offer = await pc.createOffer()
+        await pc.setLocalDescription(offer)
+        url = f"{args.url}/spectate/{session_id}"
+        async with http.post(url, json={"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Spectate failed with status {response.status}: {await response.text()}")
+            answer = await response.json()
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+        await asyncio.wait_for(first_frame.wait(), timeout=args.start_timeout)
+        result.time_to_first_frame = frame_times[0] - start
+        await asyncio.sleep(args.duration)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pc.close()
+
+    result.frames = len(frame_times)
+    result.fps = get_fps(frame_times)
+    return result
+
+
+async def run_session(
+    http: aiohttp.ClientSession,
+    args: argparse.Namespace,
+    index: int,
+) -> SessionResult:
+    result = SessionResult(index=index)
+    frame_times: list[float] = []
+    first_frame = asyncio.Event()
+    tasks: list[asyncio.Task] = []
+
+    pc = RTCPeerConnection()
+    channel = pc.createDataChannel("controls")
+    pc.addTransceiver("video", direction="recvonly")
+    consume_video(pc, frame_times, first_frame, tasks)
+
+    async def send_inputs():
+        inputs = itertools.cycle(INPUT_SCRIPT)
+        interval = 1 / args.input_rate if args.input_rate > 0 else None
+        last_heartbeat = 0.0
+        while True:
+            if channel.readyState == "open":
+                now = time.perf_counter()
+                if now - last_heartbeat >= 1.0:
+                    channel.send(json.dumps({"type": "heartbeat"}))
+                    last_heartbeat = now
+                if interval is not None:
+                    channel.send(json.dumps(next(inputs)))
+                    result.inputs_sent += 1
+            await asyncio.sleep(interval if interval is not None else 1.0)
+
+    start = time.perf_counter()
+    try:
+        offer = await pc.createOffer()
+        await pc.setLocalDescription(offer)
+
+        url = f"{args.url}/offer/{args.type}/{args.id}"
+        async with http.post(url, json={"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Offer failed with status {response.status}: {await response.text()}")
+            answer = await asyncio.wait_for(read_answer(response, lambda _: None), timeout=args.start_timeout)
+            result.answer_seconds = time.perf_counter() - start
+            session_id = result.session_id = answer["sessionId"]
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+            tasks.append(asyncio.create_task(send_inputs()))
+
+            # Like the web client, keep the signaling stream open until the first frame arrives
+            await asyncio.wait_for(first_frame.wait(), timeout=args.start_timeout)
+            result.time_to_first_frame = frame_times[0] - start
+
+        watchers = [watch_session(http, args, session_id) for _ in range(args.spectators)]
+        _, result.spectators = await asyncio.gather(asyncio.sleep(args.duration), asyncio.gather(*watchers))
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await pc.close()
+
+    result.frames = len(frame_times)
+    if len(frame_times) >= 2:
+        intervals = [b - a for a, b in zip(frame_times, frame_times[1:])]
+        result.fps = get_fps(frame_times)
+        result.jitter_ms = statistics.pstdev(intervals) * 1000
+    return result
+
+
+def parse_prometheus(text: str) -> dict[str, float]:
+    """Sum the samples of each metric in Prometheus text format, across labels"""
+    totals: defaultdict[str, float] = defaultdict(float)
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_and_labels, _, value = line.rpartition(" ")
+        name = name_and_labels.split("{", 1)[0]
+        try:
+            totals[name] += float(value)
+        except ValueError:
+            continue
+    return totals
+
+
+async def sample_resources(
+    http: aiohttp.ClientSession,
+    args: argparse.Namespace,
+    samples: list[ResourceSample],
+    stop: asyncio.Event,
+) -> None:
+    """Sample host and server resource use once per interval until stopped"""
+    is_local = urlparse(args.url).hostname in ("localhost", "127.0.0.1", "::1")
+    previous_host = get_system_cpu_times() if is_local else None
+    previous_metrics: dict[str, float] | None = None
+    previous_time = time.perf_counter()
+
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=args.sample_interval)
+        except asyncio.TimeoutError:
+            pass
+        now = time.perf_counter()
+        elapsed = now - previous_time
+        previous_time = now
+        sample = ResourceSample()
+
+        if is_local:
+            host = get_system_cpu_times()
+            if host is not None and previous_host is not None and host[1] > previous_host[1]:
+                sample.host_cpu_percent = 100 * (host[0] - previous_host[0]) / (host[1] - previous_host[1])
+            previous_host = host
+            memory_total, memory_available = get_memory_info()
+            if memory_total is not None and memory_available is not None:
+                sample.host_memory_used = memory_total - memory_available
+
+        try:
+            async with http.get(f"{args.url}/metrics", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                metrics = parse_prometheus(await response.text())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            metrics = None
+
+        if metrics is not None:
+            sample.server_rss = int(metrics.get("process_resident_memory_bytes", 0)) or None
+            sample.workers_rss = int(metrics.get("dweam_session_worker_rss_bytes", 0))
+            if previous_metrics is not None:
+                # CPU percent of a single core
+                server_cpu = metrics.get("process_cpu_seconds_total", 0) - previous_metrics.get("process_cpu_seconds_total", 0)
+                workers_cpu = metrics.get("dweam_session_worker_cpu_seconds_total", 0) - previous_metrics.get("dweam_session_worker_cpu_seconds_total", 0)
+                sample.server_cpu_percent = 100 * server_cpu / elapsed
+                # Negative when a worker exited between samples
+                sample.workers_cpu_percent = max(100 * workers_cpu / elapsed, 0)
+            previous_metrics = metrics
+
+        samples.append(sample)
+
+
+async def run_level(http: aiohttp.ClientSession, args: argparse.Namespace, sessions: int) -> LevelResult:
+    level = LevelResult(sessions=sessions)
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_resources(http, args, level.samples, stop))
+
+    async def start_session(index: int) -> SessionResult:
+        await asyncio.sleep(index * args.ramp)
+        return await run_session(http, args, index)
+
+    level.results = await asyncio.gather(*[start_session(i) for i in range(sessions)])
+    stop.set()
+    await sampler
+    return level
+
+
+def mean(values: list[float]) -> float | None:
+    return statistics.fmean(values) if values else None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)]
+
+
+def fmt(value: float | None, spec: str = ".1f", scale: float = 1.0) -> str:
+    return "-" if value is None else format(value / scale, spec)
+
+
+def print_level(level: LevelResult, verbose: bool) -> None:
+    ok = [result for result in level.results if result.error is None]
+    if verbose:
+        for result in level.results:
+            if result.error:
+                print(f"  session {result.index}: ERROR {result.error}")
+            else:
+                print(
+                    f"  session {result.index} ({result.session_id}): fps={fmt(result.fps)} "
+                    f"jitter={fmt(result.jitter_ms)}ms ttff={fmt(result.time_to_first_frame, '.2f')}s "
+                    f"frames={result.frames} inputs={result.inputs_sent}"
+                )
+            for spectator in result.spectators:
+                if spectator.error:
+                    print(f"    spectator: ERROR {spectator.error}")
+                else:
+                    print(
+                        f"    spectator: fps={fmt(spectator.fps)} "
+                        f"ttff={fmt(spectator.time_to_first_frame, '.2f')}s frames={spectator.frames}"
+                    )
+
+    fps = [result.fps for result in ok if result.fps is not None]
+    ttff = [result.time_to_first_frame for result in ok if result.time_to_first_frame is not None]
+    jitter = [result.jitter_ms for result in ok if result.jitter_ms is not None]
+
+    def peak(attr: str) -> float | None:
+        values = [getattr(sample, attr) for sample in level.samples if getattr(sample, attr) is not None]
+        return max(values) if values else None
+
+    def average(attr: str) -> float | None:
+        return mean([getattr(sample, attr) for sample in level.samples if getattr(sample, attr) is not None])
+
+    print(
+        f"sessions={level.sessions} ok={len(ok)} failed={len(level.results) - len(ok)} | "
+        f"fps mean={fmt(mean(fps))} min={fmt(min(fps) if fps else None)} | "
+        f"jitter mean={fmt(mean(jitter))}ms | "
+        f"ttff p50={fmt(percentile(ttff, 50), '.2f')}s p95={fmt(percentile(ttff, 95), '.2f')}s"
+    )
+    spectators = [spectator for result in ok for spectator in result.spectators]
+    if spectators:
+        watching = [spectator for spectator in spectators if spectator.error is None]
+        spectator_fps = [spectator.fps for spectator in watching if spectator.fps is not None]
+        print(
+            f"  spectators={len(spectators)} ok={len(watching)} failed={len(spectators) - len(watching)} | "
+            f"fps mean={fmt(mean(spectator_fps))} min={fmt(min(spectator_fps) if spectator_fps else None)}"
+        )
+    print(
+        f"  host cpu avg={fmt(average('host_cpu_percent'))}% peak={fmt(peak('host_cpu_percent'))}% "
+        f"mem peak={fmt(peak('host_memory_used'), '.0f', 2**20)}MiB | "
+        f"server cpu avg={fmt(average('server_cpu_percent'))}% rss peak={fmt(peak('server_rss'), '.0f', 2**20)}MiB | "
+        f"workers cpu avg={fmt(average('workers_cpu_percent'))}% rss peak={fmt(peak('workers_rss'), '.0f', 2**20)}MiB"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> list[LevelResult]:
+    levels = []
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None)) as http:
+        for sessions in args.sessions:
+            print(f"Running {sessions} concurrent session(s) for {args.duration}s...")
+            level = await run_level(http, args, sessions)
+            print_level(level, args.verbose)
+            levels.append(level)
+            # Let the server clean up the previous level's workers
+            await asyncio.sleep(args.cooldown)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080", help="Base URL of the dweam server")
+    parser.add_argument("--type", default="Dweam", help="Game type")
+    parser.add_argument("--id", default="test_pattern", help="Game ID")
+    parser.add_argument("--sessions", type=lambda value: [int(n) for n in value.split(",")], default=[1],
+                        help="Comma-separated concurrent session counts to step through, e.g. 1,2,4,8")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds to stream after the first frame")
+    parser.add_argument("--ramp", type=float, default=0.5, help="Seconds between starting sessions")
+    parser.add_argument("--spectators", type=int, default=0, help="Spectators watching each session")
+    parser.add_argument("--input-rate", type=float, default=10, help="Scripted input messages per second per session")
+    parser.add_argument("--start-timeout", type=float, default=120, help="Seconds to wait for the answer and the first frame")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between resource samples")
+    parser.add_argument("--cooldown", type=float, default=5, help="Seconds to wait between session counts")
+    parser.add_argument("--json", dest="json_path", default=None, help="Write the full results to this JSON file")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print per-session results")
+    args = parser.parse_args()
+    args.url = args.url.rstrip("/")
+
+    levels = asyncio.run(main_async(args))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump([asdict(level) for level in levels], f, indent=2)
+        print(f"Wrote results to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
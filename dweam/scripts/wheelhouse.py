@@ -0,0 +1,81 @@
+"""
+Build a wheelhouse: every wheel the game packages (and dweam itself) need, for installing without an index.
+
+Run it on a host with internet access, matching the Python version and platform of the target hosts:
+    python -m dweam.scripts.wheelhouse build --output ./wheelhouse
+
+Then copy the directory over and point the server at it, so venvs are created from the locked wheels only:
+    DWEAM_WHEELHOUSE=./wheelhouse python -m dweam.scripts.serve
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from dweam.log_config import get_logger
+from dweam.models import GameSource
+from dweam.utils.entrypoint import DEFAULT_SOURCE_CONFIG, evaluate_markers, get_git_mirrors
+from dweam.utils.installer import PYTORCH_INDEX_URL, can_install_source
+from dweam.utils.venv import get_dweam_source_path, run_pip_with_output
+from dweam.utils.wheelhouse import get_wheel_requirement, write_lock
+
+
+def build(output: Path, python: str) -> int:
+    log = get_logger()
+    output = output.absolute()
+    output.mkdir(parents=True, exist_ok=True)
+
+    mirrors = get_git_mirrors(log)
+    packages: dict[str, GameSource] = {}
+    requirements: list[str] = []
+    try:
+        for name, sources in DEFAULT_SOURCE_CONFIG.packages.items():
+            for source in sources:
+                if not evaluate_markers(source.markers) or not can_install_source(log, source):
+                    continue
+                requirement = get_wheel_requirement(log, source, name, mirrors)
+                if requirement is not None:
+                    packages[name] = source
+                    requirements.append(requirement)
+                    break
+            else:
+                log.warning("No source to build a wheel from, leaving package out", package=name)
+
+        # dweam is installed editable, which needs its build backend too
+        requirements += [str(get_dweam_source_path()), "poetry-core"]
+
+        log.info("Building wheelhouse", output=str(output), packages=list(packages))
+        returncode = run_pip_with_output(log, [
+            python, "-m", "pip", "wheel",
+            "--wheel-dir", str(output),
+            "--extra-index-url", PYTORCH_INDEX_URL,
+            *requirements,
+        ])
+    finally:
+        mirrors.cleanup()
+    if returncode != 0:
+        log.error("Failed to build wheelhouse", returncode=returncode)
+        return 1
+
+    lock = write_lock(log, output, packages, python)
+    log.info("Wrote wheelhouse lock", wheels=len(lock.wheels), packages=list(lock.packages))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Download and build every wheel into a wheelhouse")
+    build_parser.add_argument("--output", type=Path, default=Path("wheelhouse"), help="Wheelhouse directory")
+    build_parser.add_argument(
+        "--python", default=sys.executable,
+        help="Python to build wheels with (its version and platform decide which wheels are picked)",
+    )
+
+    args = parser.parse_args()
+    if args.command == "build":
+        sys.exit(build(args.output, args.python))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,16 @@ from collections import defaultdict
 import json
 import os
 import pathlib
+import secrets
+import socket
 import sys
 import uuid
 import yaml
-from dweam.models import GameInfo, GameInfoWithMetadata, GitBranchSource, ParamsUpdate, PathSource, StatusResponse
+from dweam.models import GameInfo, GameInfoWithMetadata, GitBranchSource, InstallProgress, NodeCapacity, PackageMetadata, ParamsUpdate, PathSource, StatusResponse
 from dweam.utils.turn import create_turn_credentials, get_turn_stun_urls
 from pydantic import ValidationError
 from typing_extensions import assert_never
-from time import time
+from time import time, process_time
 import threading
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -18,32 +20,60 @@ from typing import Literal, Optional, Any
 
 from structlog.stdlib import BoundLogger
 from fastapi import Depends, FastAPI, HTTPException, Query, Request, Path
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.background import BackgroundTask
 from aiortc import RTCSessionDescription
 import numpy as np
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from dweam.log_config import get_logger
-from dweam.utils.entrypoint import load_games, get_cache_dir
+from dweam.utils.entrypoint import (
+    build_games, install_package, is_lazy_install, load_cached_packages, load_games, get_cache_dir, mark_package_used
+)
 from dweam.worker import GameWorker
+from dweam.zygote import stop_zygotes
 from contextlib import asynccontextmanager
 from dweam.utils.venv import get_venv_path
+from dweam.utils.install_runner import cancel_running_installs
+from dweam.utils.resources import get_memory_info, get_process_rss
+from dweam.utils.thumbnails import load_manifest
+from dweam.snapshots import META_NAME, SnapshotMeta, get_snapshot_path
+from dweam.metrics import Metric, Summary, render_prometheus
 from sse_starlette.sse import EventSourceResponse
 
 log = get_logger()
 is_loading = True
+# Serving the catalog of the last run while games are checked for updates and installed
+is_refreshing = False
 games: defaultdict[str, dict[str, GameInfo]] = defaultdict(dict)
+# Bumped whenever `games` is swapped, so clients know to refetch it
+catalog_version = 0
+# Progress of the package being installed while loading games
+loading_progress: InstallProgress | None = None
 game_loading_thread = None
 
-def _load_games():
+def swap_games(new_games: defaultdict[str, dict[str, GameInfo]]) -> None:
+    """Replace the games catalog in one assignment, so requests never see it half-loaded"""
     global games
+    global catalog_version
+    games = new_games
+    catalog_version += 1
+
+def _load_games():
     global is_loading
+    global is_refreshing
     global game_loading_thread
+    global loading_progress
     global log
     
     # Store last log message on the thread object
     game_loading_thread = threading.current_thread()
     game_loading_thread.last_log_line = {'message': '', 'detail': ''}  # Initialize with empty strings
+    loading_progress = None
+
+    def on_install_progress(progress: InstallProgress):
+        global loading_progress
+        loading_progress = progress
     
     # Create a log handler that updates the thread's last_log_line
     class ThreadLogHandler:
@@ -86,8 +116,32 @@ def _load_games():
     )
     
     venv_path = get_venv_path(games_loading_log)
-    load_games(games_loading_log, venv_path, games)
+
+    # Serve the games that were installed on the last run right away, while checking for updates
+    cached_packages = load_cached_packages(games_loading_log, venv_path)
+    if cached_packages:
+        log.info("Serving cached games while checking for updates", packages=list(cached_packages))
+        swap_games(build_games(log, cached_packages.values()))
+        is_refreshing = True
+        is_loading = False
+
+    def withdraw_reinstalled(names: list[str]):
+        # Games can't be played while their package is being reinstalled
+        reinstalled = [name for name in names if cached_packages.pop(name, None) is not None]
+        if reinstalled:
+            log.info("Withdrawing games while their packages are reinstalled", packages=reinstalled)
+            swap_games(build_games(log, cached_packages.values()))
+
+    swap_games(load_games(
+        games_loading_log,
+        venv_path,
+        on_reinstall=withdraw_reinstalled,
+        on_progress=on_install_progress,
+        lazy=is_lazy_install(),
+    ))
     is_loading = False
+    is_refreshing = False
+    loading_progress = None
 
 game_loading_thread = None
 
@@ -101,9 +155,12 @@ async def lifespan(app: FastAPI):
     game_loading_thread = threading.Thread(target=_load_games)
     game_loading_thread.start()
     yield
+    # Don't keep shutdown waiting on a long install
+    cancel_running_installs()
     # Clean up active games on shutdown
     await asyncio.gather(*[worker.cleanup() for worker in active_workers.values()])
     active_workers.clear()
+    await stop_zygotes()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -119,20 +176,96 @@ app.add_middleware(
 
 # Global worker management
 active_workers: dict[str, GameWorker] = {}
+# Offers that passed the MAX_SESSIONS check but whose worker isn't in `active_workers` yet
+pending_sessions: set[str] = set()
+
+# Node agent settings, used when running behind the front server (see dweam/front.py)
+NODE_ID = os.environ.get("DWEAM_NODE_ID", socket.gethostname())
+MAX_SESSIONS = int(os.environ["DWEAM_MAX_SESSIONS"]) if os.environ.get("DWEAM_MAX_SESSIONS") else None
+
+# Per-game counters that outlive individual sessions, by (type, id)
+sessions_started: defaultdict[tuple[str, str], int] = defaultdict(int)
+spawn_seconds: defaultdict[tuple[str, str], Summary] = defaultdict(Summary)
+
+@dataclass
+class PackageInstall:
+    """An on-demand install of a game package, shared by all offers waiting on it"""
+    task: "asyncio.Task[PackageMetadata | None]"
+    message: str | None = None
+
+# On-demand installs in progress, by package name (with DWEAM_LAZY_INSTALL)
+package_installs: dict[str, PackageInstall] = {}
+
+def format_install_progress(package_name: str, progress: InstallProgress) -> str:
+    if progress.phase == "downloading" and progress.bytes_total:
+        return f"Installing {package_name}: downloading {progress.package} ({(progress.bytes_done or 0) / 1e6:.0f}/{progress.bytes_total / 1e6:.0f} MB)"
+    if progress.package:
+        return f"Installing {package_name}: {progress.phase} {progress.package}"
+    return f"Installing {package_name}: {progress.phase}"
+
+def start_package_install(log: BoundLogger, package_name: str) -> PackageInstall:
+    """Install a game package in the background, or join the install that's already running"""
+    running = package_installs.get(package_name)
+    if running is not None:
+        return running
+
+    def on_progress(progress: InstallProgress):
+        install.message = format_install_progress(package_name, progress)
+
+    async def run() -> PackageMetadata | None:
+        try:
+            metadata = await asyncio.to_thread(install_package, log, get_venv_path(log), package_name, on_progress)
+            if metadata is not None:
+                # Swap in the installed package's games
+                new_games: defaultdict[str, dict[str, GameInfo]] = defaultdict(dict, {
+                    game_type: dict(game_ids) for game_type, game_ids in games.items()
+                })
+                for game_id, game_info in metadata.games.items():
+                    game_info._metadata = metadata
+                    new_games[metadata.type][game_id] = game_info
+                swap_games(new_games)
+            return metadata
+        finally:
+            package_installs.pop(package_name, None)
+
+    log.info("Installing game package on demand", package=package_name)
+    install = PackageInstall(task=asyncio.create_task(run()), message=f"Installing {package_name}")
+    package_installs[package_name] = install
+    return install
+
+def get_game_venv_path(log: BoundLogger, game_info: GameInfo) -> pathlib.Path:
+    """The venv a game's package is installed in, whose interpreter its worker runs on"""
+    metadata = game_info._metadata
+    if metadata is not None and metadata._venv_path is not None:
+        return metadata._venv_path
+    return get_venv_path(log)
+
+def live_workers() -> dict[str, GameWorker]:
+    """Workers that are starting or running (exited workers linger in `active_workers` until cleaned up)"""
+    return {
+        session_id: worker for session_id, worker in active_workers.items()
+        if not worker.cleanup_scheduled
+        and (worker.process is None or worker.process.returncode is None)
+    }
 
 @app.get('/status')
 async def status() -> StatusResponse:
     message = None
     detail = None
-    if is_loading and game_loading_thread and hasattr(game_loading_thread, 'last_log_line'):
+    progress = None
+    if (is_loading or is_refreshing) and game_loading_thread and hasattr(game_loading_thread, 'last_log_line'):
         log_line = game_loading_thread.last_log_line
         if isinstance(log_line, dict):
             message = log_line.get('message')
             detail = log_line.get('detail')
+        progress = loading_progress
     response = StatusResponse(
         is_loading=is_loading,
+        is_refreshing=is_refreshing,
+        catalog_version=catalog_version,
         loading_message=message,
-        loading_detail=detail
+        loading_detail=detail,
+        loading_progress=progress,
     )
     print(f"Status response: {response}")
     return response
@@ -145,18 +278,20 @@ async def get_games() -> dict[str, dict[str, GameInfo]]:
 # Endpoint to serve the entire games list
 @app.get('/game_info/{type}')
 async def get_games_by_type(type: str) -> list[GameInfo]:
-    if type not in games:
+    catalog = games
+    if type not in catalog:
         raise HTTPException(status_code=404, detail="Game type not found")
-    return list(games[type].values())
+    return list(catalog[type].values())
 
 # Endpoint to serve a singular game based on query parameter
 @app.get('/game_info/{type}/{id}')
 async def get_game(type: str, id: str) -> GameInfoWithMetadata:
-    if type not in games:
+    catalog = games
+    if type not in catalog:
         raise HTTPException(status_code=404, detail="Game type not found")
-    if id not in games[type]:
+    if id not in catalog[type]:
         raise HTTPException(status_code=404, detail="Game not found")
-    game_info = games[type][id]
+    game_info = catalog[type][id]
     if game_info._metadata is None:
         raise HTTPException(status_code=404, detail="Game metadata not found")
     game_info_with_metadata = GameInfoWithMetadata(
@@ -181,30 +316,81 @@ async def offer(
     request: Request,
     type: str = Path(...),
     id: str = Path(...),
+    snapshot: str | None = None,
     log: BoundLogger = Depends(logger_dependency),
 ):
-    if type not in games:
+    catalog = games
+    if type not in catalog:
         raise HTTPException(status_code=404, detail="Game type not found")
-    if id not in games[type]:
+    if id not in catalog[type]:
         raise HTTPException(status_code=404, detail="Game not found")
-    game_info = games[type][id]
+    game_info = catalog[type][id]
+    snapshot_path = None
+    if snapshot is not None:
+        snapshot_path = get_snapshot_path(snapshot)
+        if snapshot_path is None:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        snapshot_meta = SnapshotMeta.model_validate_json((snapshot_path / META_NAME).read_text())
+        if (snapshot_meta.game_type, snapshot_meta.game_id) != (type, id):
+            raise HTTPException(status_code=400, detail="Snapshot is of another game")
 
     params = await request.json()
     offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
     session_id = str(uuid.uuid4())[:8]
     log = log.bind(session_id=session_id)
 
+    if MAX_SESSIONS is not None and len(live_workers()) + len(pending_sessions) >= MAX_SESSIONS:
+        raise HTTPException(status_code=503, detail="Node is at session capacity")
+    # Hold the slot while the package installs and the worker is created, so concurrent offers can't overshoot
+    pending_sessions.add(session_id)
+
     async def event_generator():
-        # Create and start game worker
-        worker = GameWorker(
-            log=log,
-            game_info=game_info,
-            session_id=session_id,
-            game_type=type,
-            game_id=id,
-            venv_path=get_venv_path(log)
-        )
-        active_workers[session_id] = worker
+        nonlocal game_info
+        try:
+            metadata = game_info._metadata
+            package_name = metadata._package_name if metadata is not None else None
+            if metadata is not None and metadata._module_dir is None and package_name is not None:
+                # Not installed yet (DWEAM_LAZY_INSTALL), install it or wait for the install already running
+                install = start_package_install(log, package_name)
+                last_install_message = None
+                while not install.task.done():
+                    if install.message != last_install_message:
+                        last_install_message = install.message
+                        yield {
+                            "event": "loading",
+                            "data": last_install_message
+                        }
+                    await asyncio.sleep(0.1)
+                try:
+                    installed = install.task.result()
+                except Exception:
+                    log.exception("Error installing game package", package=package_name)
+                    installed = None
+                if installed is None or id not in installed.games:
+                    yield {
+                        "event": "error",
+                        "data": f"Failed to install {package_name}"
+                    }
+                    return
+                game_info = installed.games[id]
+            if package_name is not None and is_lazy_install():
+                asyncio.create_task(asyncio.to_thread(mark_package_used, log, get_venv_path(log), package_name))
+
+            sessions_started[(type, id)] += 1
+            # Create and start game worker
+            worker = GameWorker(
+                log=log,
+                game_info=game_info,
+                session_id=session_id,
+                game_type=type,
+                game_id=id,
+                venv_path=get_game_venv_path(log, game_info),
+                snapshot=snapshot_path,
+            )
+            active_workers[session_id] = worker
+        finally:
+            # From here the worker counts against MAX_SESSIONS itself, or won't be started at all
+            pending_sessions.discard(session_id)
         
         # Start worker.run in a separate task
         run_task = asyncio.create_task(worker.run(offer))
@@ -224,12 +410,15 @@ async def offer(
 
             # Get and send the answer
             answer = await run_task
+            if worker.spawn_seconds is not None:
+                spawn_seconds[(type, id)].observe(worker.spawn_seconds)
             yield {
                 "event": "answer",
                 "data": json.dumps({
                     "sdp": answer.sdp,
                     "type": answer.type,
-                    "sessionId": session_id
+                    "sessionId": session_id,
+                    "reconnectToken": worker.reconnect_token,
                 })
             }
 
@@ -252,12 +441,39 @@ async def offer(
                 "data": str(e)
             }
 
-    return EventSourceResponse(event_generator())
+    # The generator never runs if the client leaves before the stream starts, so release the slot after it too
+    return EventSourceResponse(event_generator(), background=BackgroundTask(pending_sessions.discard, session_id))
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/node/capacity")
+async def node_capacity() -> NodeCapacity:
+    """Report the capacity of this node to the front server"""
+    workers = live_workers()
+    warm_workers: defaultdict[str, int] = defaultdict(int)
+    for worker in workers.values():
+        if worker.process is not None:
+            warm_workers[f"{worker.game_type}/{worker.game_id}"] += 1
+
+    memory_total, memory_available = get_memory_info()
+    return NodeCapacity(
+        node_id=NODE_ID,
+        is_loading=is_loading,
+        max_sessions=MAX_SESSIONS,
+        free_slots=None if MAX_SESSIONS is None else max(MAX_SESSIONS - len(workers) - len(pending_sessions), 0),
+        sessions=list(workers.keys()),
+        idle_sessions=[
+            session_id for session_id, worker in workers.items()
+            if worker.metrics is not None and worker.metrics.idle
+        ],
+        games={game_type: list(game_ids.keys()) for game_type, game_ids in games.items()},
+        warm_workers=dict(warm_workers),
+        memory_total=memory_total,
+        memory_available=memory_available,
+    )
+
 @app.get("/turn-credentials")
 async def turn_credentials(
     request: Request,
@@ -283,6 +499,128 @@ async def turn_credentials(
         "stun_urls": [stun_url]
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Performance counters of the server and its sessions, in the Prometheus text format"""
+    workers = live_workers()
+
+    async def fetch(worker: GameWorker):
+        try:
+            # A slow worker answers later, into the cached metrics of the next scrape
+            return await asyncio.wait_for(asyncio.shield(worker.get_metrics()), timeout=1.0)
+        except Exception:
+            return worker.metrics
+
+    worker_metrics = dict(zip(workers.keys(), await asyncio.gather(*[fetch(worker) for worker in workers.values()])))
+
+    active_sessions = Metric("dweam_active_sessions", "gauge", "Number of running sessions")
+    started = Metric("dweam_sessions_started_total", "counter", "Number of sessions started")
+    spawn = Metric("dweam_worker_spawn_seconds", "summary", "Time from spawning a worker process until it connects")
+    sessions_by_game: defaultdict[tuple[str, str], int] = defaultdict(int)
+    for worker in workers.values():
+        sessions_by_game[(worker.game_type, worker.game_id)] += 1
+    for (game_type, game_id) in set(sessions_by_game) | set(sessions_started):
+        active_sessions.add(sessions_by_game[(game_type, game_id)], type=game_type, id=game_id)
+        started.add(sessions_started[(game_type, game_id)], type=game_type, id=game_id)
+    for (game_type, game_id), summary in spawn_seconds.items():
+        spawn.add_summary(summary, type=game_type, id=game_id)
+
+    rpc = Metric("dweam_command_rpc_seconds", "summary", "Round-trip time of worker control channel commands")
+    rpc_totals: defaultdict[str, Summary] = defaultdict(Summary)
+    for worker in active_workers.values():
+        for command, summary in worker.rpc_seconds.items():
+            rpc_totals[command].sum += summary.sum
+            rpc_totals[command].count += summary.count
+    for command, summary in rpc_totals.items():
+        rpc.add_summary(summary, command=command)
+
+    ttff = Metric("dweam_session_time_to_first_frame_seconds", "gauge", "Time from receiving the offer until the first frame was sent")
+    warmup = Metric("dweam_session_warmup_seconds", "gauge", "Time spent in Game.warmup before the offer was answered")
+    restore = Metric("dweam_session_restore_seconds", "gauge", "Time resuming the game from a snapshot before the offer was answered")
+    step = Metric("dweam_session_step_seconds", "summary", "Time spent in Game.step")
+    fps = Metric("dweam_session_fps", "gauge", "Frames sent per second, over the last few seconds")
+    frames_sent = Metric("dweam_session_frames_sent_total", "counter", "Frames handed to the video track")
+    dropped = Metric("dweam_session_frames_dropped_total", "counter", "Frames replaced by a newer frame before being sent")
+    unchanged = Metric("dweam_session_frames_unchanged_total", "counter", "Frames skipped for being the same as the last one sent")
+    repeated = Metric("dweam_session_frames_repeated_total", "counter", "Frames sent again to keep the stream alive while the game produced none")
+    idle = Metric("dweam_session_idle", "gauge", "Whether the session is paused because its player is away")
+    idle_seconds = Metric("dweam_session_idle_seconds_total", "counter", "Time the session spent paused because its player was away")
+    reconnects = Metric("dweam_session_reconnects_total", "counter", "Times the player reconnected to the session after losing the connection")
+    convert = Metric("dweam_session_convert_seconds", "summary", "Time converting frames to video frames")
+    encode = Metric("dweam_session_encode_seconds", "summary", "Time encoding video frames")
+    inputs = Metric("dweam_session_input_messages_total", "counter", "Input messages received over the data channel")
+    spectators = Metric("dweam_session_spectators", "gauge", "Spectators watching the session")
+    relay = Metric("dweam_session_relay_seconds", "summary", "Time encoding a frame once for all spectators and forwarding it")
+    relay_skipped = Metric("dweam_session_relay_frames_skipped_total", "counter", "Frames not relayed because the previous one was still encoding")
+    relay_dropped = Metric("dweam_session_relay_packets_dropped_total", "counter", "Packets not forwarded to spectators that fell behind")
+    cpu = Metric("dweam_session_worker_cpu_seconds_total", "counter", "CPU time of the worker process")
+    rss = Metric("dweam_session_worker_rss_bytes", "gauge", "Resident memory of the worker process")
+    for session_id, session_metrics in worker_metrics.items():
+        if session_metrics is None:
+            continue
+        worker = workers[session_id]
+        labels = dict(type=worker.game_type, id=worker.game_id, session_id=session_id)
+        if session_metrics.time_to_first_frame is not None:
+            ttff.add(session_metrics.time_to_first_frame, **labels)
+        if session_metrics.warmup_seconds is not None:
+            warmup.add(session_metrics.warmup_seconds, **labels)
+        if session_metrics.restore_seconds is not None:
+            restore.add(session_metrics.restore_seconds, **labels)
+        step.add_summary(Summary(session_metrics.step_seconds_sum, session_metrics.steps), **labels)
+        fps.add(session_metrics.fps, **labels)
+        frames_sent.add(session_metrics.frames_sent, **labels)
+        dropped.add(session_metrics.frames_dropped, **labels)
+        unchanged.add(session_metrics.frames_unchanged, **labels)
+        repeated.add(session_metrics.frames_repeated, **labels)
+        idle.add(int(session_metrics.idle), **labels)
+        idle_seconds.add(session_metrics.idle_seconds, **labels)
+        reconnects.add(session_metrics.reconnects, **labels)
+        convert.add_summary(Summary(session_metrics.convert_seconds_sum, session_metrics.frames_sent), **labels)
+        encode.add_summary(Summary(session_metrics.encode_seconds_sum, session_metrics.encoded_frames), **labels)
+        inputs.add(session_metrics.input_messages, **labels)
+        spectators.add(session_metrics.spectators, **labels)
+        relay.add_summary(Summary(session_metrics.relay_seconds_sum, session_metrics.relay_frames), **labels)
+        relay_skipped.add(session_metrics.relay_frames_skipped, **labels)
+        relay_dropped.add(session_metrics.relay_packets_dropped, **labels)
+        cpu.add(session_metrics.cpu_seconds, **labels)
+        if session_metrics.rss_bytes is not None:
+            rss.add(session_metrics.rss_bytes, **labels)
+
+    # Workers of a game share its mapped weights, so files are counted once and memory in proportion to sharing
+    weights_mapped = Metric("dweam_weights_mapped_bytes", "gauge", "Size of the weights files mapped by a package's workers")
+    weights_resident = Metric("dweam_weights_resident_bytes", "gauge", "Physical memory taken by a package's mapped weights, over all its workers")
+    weights_sessions = Metric("dweam_weights_sessions", "gauge", "Sessions mapping a package's weights")
+    mapped_sizes: defaultdict[str, dict[str, int]] = defaultdict(dict)
+    resident_bytes: defaultdict[str, int] = defaultdict(int)
+    mapping_sessions: defaultdict[str, set[str]] = defaultdict(set)
+    for session_id, session_metrics in worker_metrics.items():
+        if session_metrics is None:
+            continue
+        for path, weights in session_metrics.weights.items():
+            package = weights.package or "unknown"
+            mapped_sizes[package][path] = weights.mapped_bytes
+            resident_bytes[package] += weights.proportional_bytes or 0
+            mapping_sessions[package].add(session_id)
+    for package, sizes in mapped_sizes.items():
+        weights_mapped.add(sum(sizes.values()), package=package)
+        weights_resident.add(resident_bytes[package], package=package)
+        weights_sessions.add(len(mapping_sessions[package]), package=package)
+
+    process_cpu = Metric("process_cpu_seconds_total", "counter", "CPU time of the server process")
+    process_cpu.add(process_time())
+    process_rss = Metric("process_resident_memory_bytes", "gauge", "Resident memory of the server process")
+    server_rss = get_process_rss()
+    if server_rss is not None:
+        process_rss.add(server_rss)
+
+    return render_prometheus([
+        active_sessions, started, spawn, rpc,
+        ttff, warmup, restore, step, fps, frames_sent, dropped, unchanged, repeated, idle, idle_seconds, reconnects, convert, encode, inputs,
+        spectators, relay, relay_skipped, relay_dropped, cpu, rss,
+        weights_mapped, weights_resident, weights_sessions,
+        process_cpu, process_rss,
+    ])
+
 # Background cleanup task
 async def cleanup_stale_workers() -> None:
     """Periodically check for and cleanup stale game workers"""
@@ -317,6 +655,8 @@ async def get_params_schema(
     game_info = games.get(type, {}).get(id)
     if not game_info:
         raise HTTPException(status_code=404, detail="Game not found")
+    if game_info._metadata is not None and game_info._metadata._module_dir is None:
+        raise HTTPException(status_code=409, detail="Game is not installed yet")
     
     # Create a temporary worker to get the schema
     session_id = str(uuid.uuid4())[:8]
@@ -324,7 +664,7 @@ async def get_params_schema(
         log=log,
         game_info=game_info,
         session_id=session_id,
-        venv_path=get_venv_path(log),
+        venv_path=get_game_venv_path(log, game_info),
         game_type=type,
         game_id=id
     )
@@ -344,13 +684,13 @@ async def update_game_params(
     if not worker:
         raise HTTPException(status_code=404, detail="Game session not found")
 
-    params = await request.json()
-    
     try:
-        # Send params to worker for validation and update
-        await worker.update_params(params['params'])
+        update = ParamsUpdate.model_validate(await request.json())
+        # Only the params that change are sent, and applied by the game before its next step
+        await worker.update_params(update.merged())
         return {"status": "success"}
-    except ValidationError as e:
+    except ValueError as e:
+        # Invalid params, as reported by the worker's validation or ours
         log.error("Invalid game parameters", 
                  session_id=session_id, 
                  error=str(e))
@@ -361,20 +701,82 @@ async def update_game_params(
                  error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/snapshot/{session_id}")
+async def snapshot_session(
+    session_id: str = Path(...),
+    log: BoundLogger = Depends(logger_dependency),
+):
+    """Save the state of a running session; POST /offer/{type}/{id}?snapshot=<snapshot_id> resumes it"""
+    worker = active_workers.get(session_id)
+    if not worker or worker.cleanup_scheduled:
+        raise HTTPException(status_code=404, detail="Game session not found")
+    try:
+        return await worker.snapshot()
+    except ValueError as e:
+        log.warning("Snapshot failed", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/reconnect/{session_id}")
+async def reconnect(
+    request: Request,
+    session_id: str = Path(...),
+    log: BoundLogger = Depends(logger_dependency),
+):
+    """Reattach the player to their running session after losing the connection, without starting a new worker"""
+    worker = live_workers().get(session_id)
+    if not worker or worker.process is None:
+        raise HTTPException(status_code=404, detail="Game session not found")
+
+    params = await request.json()
+    if not secrets.compare_digest(str(params.get("reconnectToken", "")), worker.reconnect_token):
+        raise HTTPException(status_code=403, detail="Invalid reconnect token")
+    offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
+    try:
+        # Refused by the worker while the player's connection is still up
+        answer = await worker.reconnect(offer)
+    except ValueError as e:
+        log.warning("Reconnect refused", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    log.info("Player reconnected", session_id=session_id)
+    return {"sdp": answer.sdp, "type": answer.type, "sessionId": session_id}
+
+@app.post("/spectate/{session_id}")
+async def spectate(
+    request: Request,
+    session_id: str = Path(...),
+    log: BoundLogger = Depends(logger_dependency),
+):
+    """Watch a running session: answers a WebRTC offer with a receive-only video stream"""
+    worker = active_workers.get(session_id)
+    if not worker or worker.cleanup_scheduled:
+        raise HTTPException(status_code=404, detail="Game session not found")
+
+    params = await request.json()
+    offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
+    try:
+        answer = await worker.spectate(offer)
+    except ValueError as e:
+        # Raised for errors reported by the worker, like the session being full
+        log.warning("Spectator refused", session_id=session_id, error=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"sdp": answer.sdp, "type": answer.type}
+
 @app.get('/thumb/{type}/{id}.{ext}')
 async def get_thumbnail(
     type: str,
     id: str,
     ext: str,
+    request: Request,
     log: BoundLogger = Depends(logger_dependency),
-) -> FileResponse:
+) -> Response:
     """Serve thumbnail files from the package's thumbnail directory"""
-    if type not in games:
+    catalog = games
+    if type not in catalog:
         raise HTTPException(status_code=404, detail="Game type not found")
-    if id not in games[type]:
+    if id not in catalog[type]:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    game_info = games[type][id]
+    game_info = catalog[type][id]
     if not game_info._metadata:
         raise HTTPException(status_code=404, detail="Game metadata not found")
     
@@ -389,7 +791,18 @@ async def get_thumbnail(
     thumbnail_dir = local_dir / game_info._metadata.thumbnail_dir
     if not thumbnail_dir.exists():
         raise HTTPException(status_code=404, detail="Thumbnail directory not found")
-    
+
+    # Clips made by generate_thumbnails are listed in the manifest with their hash,
+    # so browsers can revalidate them instead of downloading them again
+    entry = load_manifest(thumbnail_dir).games.get(id)
+    thumbnail_file = entry.files.get(ext) if entry is not None else None
+    if thumbnail_file is not None and (thumbnail_dir / thumbnail_file.file).exists():
+        etag = f'"{thumbnail_file.sha256}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(thumbnail_dir / thumbnail_file.file, headers=headers)
+
     filename = f"{id}.{ext}"
     thumbnail_path = thumbnail_dir / filename
     
@@ -422,8 +835,8 @@ async def loading_status(
     request: Request,
     log: BoundLogger = Depends(logger_dependency),
 ):
-    """Stream loading status messages while games are being installed"""
-    if not is_loading:
+    """Stream loading status messages while games are being installed, and catalog changes"""
+    if not is_loading and not is_refreshing:
         return JSONResponse({"status": "ready"})
 
     async def event_generator():
@@ -432,6 +845,8 @@ async def loading_status(
             return
             
         last_message = None
+        last_progress = None
+        last_catalog_version = catalog_version
         while game_loading_thread.is_alive():
             if hasattr(game_loading_thread, 'last_log_line') and game_loading_thread.last_log_line != last_message:
                 last_message = game_loading_thread.last_log_line
@@ -440,6 +855,19 @@ async def loading_status(
                         "event": "loading",
                         "data": last_message
                     }
+            progress = loading_progress
+            if progress is not None and progress != last_progress:
+                last_progress = progress
+                yield {
+                    "event": "progress",
+                    "data": progress.model_dump_json()
+                }
+            if catalog_version != last_catalog_version:
+                last_catalog_version = catalog_version
+                yield {
+                    "event": "catalog",
+                    "data": str(catalog_version)
+                }
             await asyncio.sleep(0.1)
             
         # Send final ready message
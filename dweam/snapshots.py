@@ -0,0 +1,192 @@
+"""
+Session snapshots: the state of a running game, saved so that a new worker can resume it.
+
+Games opt in by implementing `Game.snapshot()` and `Game.restore()`. A snapshot is a directory:
+
+    snapshot.json           game, params, step count, and the state with its arrays replaced by references
+    tensors.safetensors     the arrays (numpy) and tensors (torch) of the state, in the safetensors format
+
+On restore, the arrays are memory-mapped read-only instead of read, so resuming doesn't wait for the disk
+and large states are only paged in as the game touches them.
+Snapshots are written to DWEAM_SNAPSHOT_DIR (by default in the cache dir); to move sessions between nodes,
+point it at a directory the nodes share.
+"""
+import json
+import mmap
+import os
+import re
+import shutil
+import uuid
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from dweam.utils.entrypoint import get_cache_dir
+from dweam.weights import SAFETENSORS_DTYPES
+
+
+META_NAME = "snapshot.json"
+TENSORS_NAME = "tensors.safetensors"
+# Placeholder of an array in the JSON state
+TENSOR_REF = "__tensor__"
+
+SNAPSHOT_ID = re.compile(r"^[0-9a-f]{12}$")
+
+
+class SnapshotMeta(BaseModel):
+    snapshot_id: str
+    game_type: str
+    game_id: str
+    created_at: datetime = Field(default_factory=datetime.now)
+    steps: int = Field(description="Steps the game had run when it was snapshotted")
+    params: dict[str, Any]
+    state: Any = Field(description="The game's state, with arrays replaced by references to the tensors file")
+    tensors: dict[str, Literal["numpy", "torch"]] = Field(default_factory=dict)
+
+
+def get_snapshots_dir() -> Path:
+    """Where snapshots are written (DWEAM_SNAPSHOT_DIR, by default in the cache dir)"""
+    snapshots_dir = os.environ.get("DWEAM_SNAPSHOT_DIR")
+    if snapshots_dir:
+        return Path(snapshots_dir)
+    return get_cache_dir() / "snapshots"
+
+
+def get_snapshot_path(snapshot_id: str) -> Path | None:
+    """The directory of a snapshot, or None if there's no such snapshot"""
+    if not SNAPSHOT_ID.match(snapshot_id):
+        return None
+    path = get_snapshots_dir() / snapshot_id
+    return path if (path / META_NAME).exists() else None
+
+
+def _is_torch_tensor(value: Any) -> bool:
+    return type(value).__module__ == "torch" and type(value).__name__ == "Tensor"
+
+
+def _split_state(state: Any, arrays: dict[str, Any], prefix: str = "") -> Any:
+    """Replace the arrays in a state by references, collecting them by name"""
+    if isinstance(state, np.ndarray) or _is_torch_tensor(state):
+        name = prefix or "state"
+        arrays[name] = state
+        return {TENSOR_REF: name}
+    if isinstance(state, dict):
+        return {key: _split_state(value, arrays, f"{prefix}.{key}" if prefix else str(key)) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return [_split_state(value, arrays, f"{prefix}.{i}" if prefix else str(i)) for i, value in enumerate(state)]
+    return state
+
+
+def _join_state(state: Any, arrays: dict[str, Any]) -> Any:
+    if isinstance(state, dict):
+        if state.keys() == {TENSOR_REF}:
+            return arrays[state[TENSOR_REF]]
+        return {key: _join_state(value, arrays) for key, value in state.items()}
+    if isinstance(state, list):
+        return [_join_state(value, arrays) for value in state]
+    return state
+
+
+def _array_bytes(array: Any) -> tuple[str, int, np.ndarray]:
+    """The dtype name, element size and raw bytes of a numpy array or torch tensor"""
+    if _is_torch_tensor(array):
+        import torch
+        data = array.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy()
+        return str(array.dtype).removeprefix("torch."), array.element_size(), data
+    array = np.ascontiguousarray(array)
+    return array.dtype.name, array.itemsize, array.reshape(-1).view(np.uint8)
+
+
+def write_tensors(arrays: dict[str, Any], path: Path) -> None:
+    """Write numpy arrays and torch tensors in the safetensors format"""
+    items = []
+    for name, array in arrays.items():
+        dtype, itemsize, data = _array_bytes(array)
+        if dtype not in SAFETENSORS_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype} for {name}")
+        items.append((itemsize, name, SAFETENSORS_DTYPES[dtype], list(array.shape), data))
+    # Largest elements first, so every array starts aligned to its element size
+    items.sort(key=lambda item: (-item[0], item[1]))
+
+    header: dict[str, Any] = {}
+    offset = 0
+    for _, name, dtype, shape, data in items:
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + data.nbytes]}
+        offset += data.nbytes
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    header_bytes += b" " * (-(8 + len(header_bytes)) % 8)
+
+    with open(path, "wb") as f:
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for *_, data in items:
+            f.write(data.tobytes())
+
+
+def map_tensors(path: Path, kinds: dict[str, Literal["numpy", "torch"]]) -> dict[str, Any]:
+    """Map a safetensors file read-only, as numpy arrays or torch tensors"""
+    dtype_names = {safetensors_dtype: dtype for dtype, safetensors_dtype in SAFETENSORS_DTYPES.items()}
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = int.from_bytes(mapping[:8], "little")
+    header = json.loads(mapping[8:8 + header_size])
+    data_start = 8 + header_size
+
+    arrays = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = dtype_names[info["dtype"]]
+        start, end = info["data_offsets"]
+        if kinds.get(name) == "torch":
+            import torch
+            if start == end:
+                arrays[name] = torch.empty(info["shape"], dtype=getattr(torch, dtype))
+                continue
+            with warnings.catch_warnings():
+                # torch warns that the buffer isn't writable, which is the point
+                warnings.filterwarnings("ignore", message=".*not writable.*")
+                tensor = torch.frombuffer(mapping, dtype=torch.uint8, count=end - start, offset=data_start + start)
+            arrays[name] = tensor.view(getattr(torch, dtype)).view(info["shape"])
+        else:
+            arrays[name] = np.frombuffer(
+                mapping, dtype=np.dtype(dtype), count=(end - start) // np.dtype(dtype).itemsize, offset=data_start + start,
+            ).reshape(info["shape"])
+    return arrays
+
+
+def save_snapshot(game_type: str, game_id: str, steps: int, params: dict[str, Any], state: Any) -> SnapshotMeta:
+    """Write a game's state as a new snapshot, atomically"""
+    arrays: dict[str, Any] = {}
+    meta = SnapshotMeta(
+        snapshot_id=uuid.uuid4().hex[:12],
+        game_type=game_type,
+        game_id=game_id,
+        steps=steps,
+        params=params,
+        state=_split_state(state, arrays),
+        tensors={name: "torch" if _is_torch_tensor(array) else "numpy" for name, array in arrays.items()},
+    )
+
+    snapshots_dir = get_snapshots_dir()
+    tmp_path = snapshots_dir / f".{meta.snapshot_id}"
+    tmp_path.mkdir(parents=True)
+    try:
+        write_tensors(arrays, tmp_path / TENSORS_NAME)
+        (tmp_path / META_NAME).write_text(meta.model_dump_json(indent=2))
+        tmp_path.rename(snapshots_dir / meta.snapshot_id)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return meta
+
+
+def load_snapshot(path: Path) -> tuple[SnapshotMeta, Any]:
+    """Read a snapshot's metadata, and its state with the arrays mapped"""
+    meta = SnapshotMeta.model_validate_json((path / META_NAME).read_text())
+    arrays = map_tensors(path / TENSORS_NAME, meta.tensors)
+    return meta, _join_state(meta.state, arrays)
@@ -0,0 +1,64 @@
+import os
+import platform
+import re
+import sys
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+
+from structlog.stdlib import BoundLogger
+
+from dweam.utils.distinfo import normalize_name
+from dweam.utils.entrypoint import get_cache_dir
+
+
+def get_host_key() -> str:
+    """
+    Name for what compiled kernels depend on besides the package: the platform, python, and GPU.
+    The GPU is only looked up if torch is already imported, as it initializes CUDA.
+    """
+    parts = [platform.system(), platform.machine(), f"py{sys.version_info.major}{sys.version_info.minor}"]
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        try:
+            if torch.cuda.is_available():
+                parts += [torch.cuda.get_device_name(0), f"cuda{torch.version.cuda}", f"torch{torch.__version__}"]
+        except Exception:
+            pass
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", "-".join(parts)).lower()
+
+
+def get_compile_cache_dir(package_name: str, version: str | None) -> Path:
+    """Where a game package's compiled kernels are kept, by package version and host"""
+    return get_cache_dir() / "compile" / f"{normalize_name(package_name)}-{version or 'unknown'}" / get_host_key()
+
+
+# Where each compiler looks for its persistent cache, relative to the package's compile cache dir
+COMPILE_CACHE_ENV = {
+    "TORCHINDUCTOR_CACHE_DIR": "inductor",
+    "TRITON_CACHE_DIR": "triton",
+    "JAX_COMPILATION_CACHE_DIR": "jax",
+    "CUDA_CACHE_PATH": "cuda",
+}
+
+
+def export_compile_cache_env(log: BoundLogger, package_name: str) -> Path:
+    """
+    Point the compilers of the current process (torch.compile, Triton, JAX, the CUDA JIT) at the package's
+    compile cache dir, so kernels compiled by one session are reused by the next.
+    Has to run before the game is imported; variables that are already set are left alone.
+    """
+    try:
+        version = importlib_metadata.version(package_name)
+    except importlib_metadata.PackageNotFoundError:
+        version = None
+    cache_dir = get_compile_cache_dir(package_name, version)
+    for name, subdir in COMPILE_CACHE_ENV.items():
+        if name not in os.environ:
+            path = cache_dir / subdir
+            path.mkdir(parents=True, exist_ok=True)
+            os.environ[name] = str(path)
+    # Off by default in older torch versions
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+    log.info("Using compile cache", cache_dir=str(cache_dir))
+    return cache_dir
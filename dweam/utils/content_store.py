@@ -0,0 +1,89 @@
+import errno
+import os
+import stat
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from structlog.stdlib import BoundLogger
+
+from dweam.utils.wheelhouse import hash_file
+
+
+# Small files aren't worth a hash and a link each
+MIN_LINK_SIZE = 16 * 1024
+
+
+@dataclass
+class LinkStats:
+    files: int = 0
+    linked: int = 0
+    bytes_saved: int = 0
+
+
+class ContentStore:
+    """
+    Files shared between venvs, stored once by content hash and hardlinked into every venv that has them,
+    so a dependency installed into several package venvs (like torch) takes up disk space once.
+
+    Installers replace files rather than writing into them, so a hardlinked file is never changed under
+    another venv. The store has to be on the same filesystem as the venvs.
+    """
+
+    def __init__(self, log: BoundLogger, path: Path):
+        self.log = log
+        self.path = path
+        self.objects_dir = path / "objects"
+
+    def get_object_path(self, digest: str, executable: bool) -> Path:
+        # Links share their permissions, so executables are kept apart from the same content without the bit
+        return self.objects_dir / digest[:2] / (digest[2:] + (".x" if executable else ""))
+
+    def link_tree(self, root: Path) -> LinkStats:
+        """Replace every file under root that's already in the store with a link to it, and add the rest"""
+        stats = LinkStats()
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = Path(dirpath) / filename
+                try:
+                    st = path.lstat()
+                except OSError:
+                    continue
+                # Files with other links are in the store already (or linked by something else)
+                if not stat.S_ISREG(st.st_mode) or st.st_nlink > 1 or st.st_size < MIN_LINK_SIZE:
+                    continue
+                stats.files += 1
+
+                object_path = self.get_object_path(hash_file(path), bool(st.st_mode & stat.S_IXUSR))
+                try:
+                    if object_path.exists():
+                        tmp_path = path.with_name(f".{filename}-{uuid.uuid4().hex[:8]}")
+                        os.link(object_path, tmp_path)
+                        os.replace(tmp_path, path)
+                        stats.linked += 1
+                        stats.bytes_saved += st.st_size
+                    else:
+                        object_path.parent.mkdir(parents=True, exist_ok=True)
+                        os.link(path, object_path)
+                except OSError as e:
+                    if e.errno == errno.EXDEV:
+                        self.log.warning("Content store is on another filesystem, not linking", store=str(self.path), root=str(root))
+                        return stats
+                    # e.g. a file in use on Windows
+                    self.log.debug("Failed to link file", path=str(path), error=str(e))
+        return stats
+
+    def prune(self) -> int:
+        """Remove the stored files no venv links to anymore, returning how many bytes were freed"""
+        freed = 0
+        if not self.objects_dir.exists():
+            return freed
+        for object_path in self.objects_dir.glob("*/*"):
+            try:
+                st = object_path.stat()
+                if st.st_nlink == 1:
+                    object_path.unlink()
+                    freed += st.st_size
+            except OSError:
+                continue
+        return freed
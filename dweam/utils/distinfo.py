@@ -0,0 +1,94 @@
+import importlib.metadata
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Iterable
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a distribution name as in PEP 503, with underscores as used in dist-info directories"""
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def get_site_packages_dirs(venv_path: Path) -> list[Path]:
+    """Get the site-packages directories of a venv"""
+    if sys.platform == "win32":
+        return [venv_path / "Lib" / "site-packages"]
+    return sorted((venv_path / "lib").glob("python*/site-packages"))
+
+
+class VenvMetadata:
+    """
+    importlib.metadata-style lookups over the distributions installed in another venv,
+    reading its *.dist-info directories directly instead of running `pip show` there
+    """
+
+    def __init__(self, venv_path: Path):
+        self.venv_path = venv_path
+        self.path = [str(site_packages) for site_packages in get_site_packages_dirs(venv_path)]
+
+    def distributions(self) -> Iterable[importlib.metadata.Distribution]:
+        return importlib.metadata.distributions(path=self.path)
+
+    def distribution(self, name: str) -> importlib.metadata.Distribution:
+        """Get an installed distribution, raising PackageNotFoundError if it's not installed"""
+        for dist in importlib.metadata.distributions(name=name, path=self.path):
+            return dist
+        raise importlib.metadata.PackageNotFoundError(name)
+
+    def version(self, name: str) -> str:
+        return self.distribution(name).version
+
+    def files(self, name: str) -> list[importlib.metadata.PackagePath] | None:
+        """Files listed in the distribution's RECORD"""
+        return self.distribution(name).files
+
+
+def get_dist_info_path(dist: importlib.metadata.Distribution) -> Path | None:
+    """Get the dist-info directory of a distribution found on disk"""
+    path = getattr(dist, "_path", None)
+    return Path(path) if path is not None else None
+
+
+def get_install_location(dist: importlib.metadata.Distribution) -> Path:
+    """Get the directory the distribution is installed into (what `pip show` calls Location)"""
+    return Path(str(dist.locate_file("")))
+
+
+def get_direct_url(dist: importlib.metadata.Distribution) -> dict | None:
+    """Get the PEP 610 direct_url.json of a distribution installed from a URL or path"""
+    text = dist.read_text("direct_url.json")
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def get_editable_location(dist: importlib.metadata.Distribution) -> Path | None:
+    """Get the project directory of an editable install (what `pip show` calls Editable project location)"""
+    direct_url = get_direct_url(dist)
+    if direct_url is None or not direct_url.get("dir_info", {}).get("editable"):
+        return None
+    url = urlparse(direct_url["url"])
+    if url.scheme != "file":
+        return None
+    return Path(url2pathname(url.path))
+
+
+def find_distribution(venv_path: Path, name: str) -> importlib.metadata.Distribution | None:
+    """Find an installed distribution in a venv, or None if it's not installed"""
+    try:
+        return VenvMetadata(venv_path).distribution(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def find_dist_info(venv_path: Path, name: str) -> Path | None:
+    """Find the dist-info directory of an installed distribution"""
+    dist = find_distribution(venv_path, name)
+    return get_dist_info_path(dist) if dist is not None else None
@@ -3,7 +3,6 @@ import importlib
 import os
 import uuid
 from typing_extensions import assert_never
-import subprocess
 import sys
 try:
     import tomli as toml_lib
@@ -15,15 +14,31 @@ except ImportError:
 from pathlib import Path
 from structlog.stdlib import BoundLogger
 import importlib.util
-from typing import BinaryIO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+import threading
+from importlib.resources import files
+from typing import BinaryIO, Callable, Iterable
 import shutil
 from packaging import markers as pkg_markers
+from pydantic import ValidationError
 
 from dweam.models import (
     PackageMetadata, GameInfo, GameSource,
     GitBranchSource, PathSource, PyPISource, SourceConfig
 )
-from dweam.utils.venv import ensure_correct_dweam_version, run_pip_with_output
+from dweam.utils.venv import ensure_correct_dweam_version, ensure_venv, get_dweam_source_path
+from dweam.utils.content_store import ContentStore
+from dweam.utils.distinfo import find_distribution, get_editable_location, get_install_location, get_site_packages_dirs
+from dweam.utils.install_cache import InstallCache, get_source_fingerprint
+from dweam.utils.installer import (
+    InstallerBackend, can_install_source, get_install_timeout, get_installer_backend, get_source_requirements,
+    install_requirements, uninstall_packages,
+)
+from dweam.utils.git_mirror import GitMirrors
+from dweam.utils.install_runner import ProgressCallback
+from dweam.utils.source_metadata import fetch_source_metadata
 
 
 # Define default sources for each game
@@ -89,6 +104,44 @@ DEFAULT_SOURCE_CONFIG = SourceConfig(
 )
 
 
+# Installs into the venvs (and updates of their install manifest) happen one at a time
+install_lock = threading.Lock()
+
+
+def is_lazy_install() -> bool:
+    """Whether game packages are installed on their first offer instead of on startup (DWEAM_LAZY_INSTALL)"""
+    return bool(os.environ.get("DWEAM_LAZY_INSTALL"))
+
+
+def get_evict_after() -> timedelta | None:
+    """How long a lazily installed package may go unused before it's uninstalled (DWEAM_EVICT_AFTER_DAYS)"""
+    days = os.environ.get("DWEAM_EVICT_AFTER_DAYS")
+    return timedelta(days=float(days)) if days else None
+
+
+def is_isolated_venvs() -> bool:
+    """Whether every game package is installed into its own venv instead of the shared one (DWEAM_ISOLATED_VENVS)"""
+    return bool(os.environ.get("DWEAM_ISOLATED_VENVS"))
+
+
+def get_package_venv_path(venv_path: Path, name: str) -> Path:
+    """The venv a game package is installed into: its own one next to the shared venv if isolated, else the shared venv"""
+    if not is_isolated_venvs():
+        return venv_path
+    return venv_path.parent / "venvs" / name
+
+
+def get_venv_paths(venv_path: Path) -> list[Path]:
+    """The shared venv, and the package venvs that have been created"""
+    venv_paths = [venv_path]
+    if is_isolated_venvs():
+        for name in DEFAULT_SOURCE_CONFIG.packages:
+            package_venv = get_package_venv_path(venv_path, name)
+            if package_venv.exists():
+                venv_paths.append(package_venv)
+    return venv_paths
+
+
 def get_cache_dir() -> Path:
     """Get the cache directory for storing git repositories"""
     cache_dir = os.environ.get("CACHE_DIR")
@@ -97,11 +150,6 @@ def get_cache_dir() -> Path:
     return Path.home() / ".dweam" / "cache"
 
 
-def get_pip_path(venv_path: Path) -> Path:
-    """Get the pip executable path for the given venv"""
-    return venv_path / "Scripts" / "pip.exe" if sys.platform == "win32" else venv_path / "bin" / "pip"
-
-
 def evaluate_markers(markers: str | None) -> bool:
     """Evaluate environment markers like 'platform_system != "Windows"'"""
     if not markers:
@@ -111,95 +159,197 @@ def evaluate_markers(markers: str | None) -> bool:
     return marker.evaluate()
 
 
-def install_game_source(log: BoundLogger, venv_path: Path, source: GameSource, name: str) -> Path | None:
+def get_package_location(log: BoundLogger, venv_path: Path, name: str) -> Path | None:
+    """Get the module path of a package installed in the given venv"""
+    dist = find_distribution(venv_path, name)
+    if dist is None:
+        log.error("Package not found in venv", package=name, venv_path=str(venv_path))
+        return None
+
+    # Prefer editable location if available
+    editable_location = get_editable_location(dist)
+    if editable_location is not None:
+        return editable_location / name
+    return get_install_location(dist) / name
+
+
+def install_game_source(
+    log: BoundLogger,
+    venv_path: Path,
+    source: GameSource,
+    name: str,
+    backend: InstallerBackend | None = None,
+    on_progress: ProgressCallback | None = None,
+    mirrors: GitMirrors | None = None,
+) -> Path | None:
     """Install a game from its source into the given venv and return the module path"""
     if not evaluate_markers(source.markers):
         log.info("Skipping installation due to environment markers", markers=source.markers)
         return None
 
-    pip_path = get_pip_path(venv_path)
-    
-    if not pip_path.exists():
-        log.error("Pip executable not found", path=str(pip_path))
+    if backend is None:
+        backend = get_installer_backend(log, venv_path)
+    if not backend.is_available():
+        log.error("Installer not available", installer=backend.name, venv_path=str(venv_path))
         return None
 
     try:
-        # Common pip install args
-        pip_base_args = [
-            str(pip_path),
-            "install",
-            "--extra-index-url",
-            "https://download.pytorch.org/whl/cu121",
-        ]
-
-        # Install package based on source type
-        if isinstance(source, PathSource):
-            abs_path = source.path.absolute()
-            if not abs_path.exists():
-                log.warning("Source path does not exist", path=str(abs_path))
-                return None
-                
-            log.info("Installing from local path", path=str(abs_path))
-            returncode = run_pip_with_output(log, [*pip_base_args, "-e", str(abs_path)])
-            if returncode != 0:
-                log.error("Failed to install from local path")
-                return None
-            
-        elif isinstance(source, GitBranchSource):
-            git_url = f"git+{source.git}@{source.branch}#egg={name}"
-            log.info("Installing from git", url=git_url)
-            
-            returncode = run_pip_with_output(log, [*pip_base_args, git_url])
-            if returncode != 0:
-                log.error("Failed to install from git")
-                return None
-            
-        elif isinstance(source, PyPISource):
-            package_spec = f"{name}=={source.version}"
-            log.info("Installing from PyPI", package=package_spec)
-            
-            returncode = run_pip_with_output(log, [*pip_base_args, package_spec])
-            if returncode != 0:
-                log.error("Failed to install from PyPI")
-                return None
-            
-        else:
-            assert_never(source)
+        requirements = get_source_requirements(log, source, name, mirrors)
+        if requirements is None:
             return None
 
-        # Get the installed package location
-        result = subprocess.run(
-            [str(pip_path), "show", name],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            log.error("Failed to get package location", stdout=result.stdout, stderr=result.stderr)
+        log.info("Installing game package", package=name, installer=backend.name, source=" ".join(requirements))
+        if not install_requirements(log, backend, requirements, on_progress, get_install_timeout()):
+            log.error("Failed to install game package", package=name)
             return None
-            
-        # Parse the Location and Editable project location from pip show output
-        location = None
-        editable_location = None
-        for line in result.stdout.splitlines():
-            if line.startswith("Editable project location: "):
-                editable_location = Path(line.split(": ")[1]) / name
-            elif line.startswith("Location: "):
-                location = Path(line.split(": ")[1]) / name
-        
-        # Prefer editable location if available
-        if editable_location is not None:
-            return editable_location
-        elif location is not None:
-            return location
-        
-        log.error("Could not find package location in pip show output")
-        return None
+
+        return get_package_location(log, venv_path, name)
             
     except Exception as e:
         log.exception("Unexpected error installing game source")
         return None
 
 
+def get_install_cache(log: BoundLogger, venv_path: Path) -> InstallCache:
+    """Get the record of what's installed in a venv, stored in the cache dir"""
+    return InstallCache(log, venv_path, get_cache_dir() / "install-manifest.json")
+
+
+def get_git_mirrors(log: BoundLogger) -> GitMirrors:
+    """Get the mirrors of the git repositories games are installed from, stored in the cache dir"""
+    return GitMirrors(log, get_cache_dir() / "git")
+
+
+def get_content_store(log: BoundLogger) -> ContentStore:
+    """Get the store that package venvs share their files through, in the cache dir"""
+    return ContentStore(log, get_cache_dir() / "store")
+
+
+def link_venvs(log: BoundLogger, venv_paths: list[Path]) -> None:
+    """Deduplicate the installed files of venvs through the content store, and drop files no venv uses anymore"""
+    store = get_content_store(log)
+    for venv_path in venv_paths:
+        for site_packages in get_site_packages_dirs(venv_path):
+            stats = store.link_tree(site_packages)
+            if stats.files:
+                log.info(
+                    "Linked venv files into the content store", venv_path=str(venv_path),
+                    files=stats.files, linked=stats.linked, mb_saved=round(stats.bytes_saved / 1e6, 1),
+                )
+    freed = store.prune()
+    if freed:
+        log.info("Pruned unused files from the content store", mb_freed=round(freed / 1e6, 1))
+
+
+def install_game_sources(
+    log: BoundLogger,
+    venv_path: Path,
+    config: SourceConfig,
+    cache: InstallCache | None = None,
+    on_reinstall: Callable[[list[str]], None] | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> dict[str, Path]:
+    """
+    Install the game packages of a source config and return their module paths.
+    
+    Packages whose source is unchanged since they were installed (per the install cache) are skipped.
+    The first usable source of every other package is installed in a single batch, so shared
+    dependencies (like the torch stack) are resolved and downloaded once.
+    Packages that fail in the batch fall back to installing one by one, trying each of their sources.
+    `on_reinstall` is called with the names of the packages about to be (re)installed, before installing them.
+    Installs time out after DWEAM_INSTALL_TIMEOUT seconds per package.
+    """
+    backend = get_installer_backend(log, venv_path)
+    mirrors = get_git_mirrors(log)
+    module_paths: dict[str, Path] = {}
+
+    # Packages built into the wheelhouse are installed from their wheel, whatever their sources
+    wheelhouse = backend.wheelhouse
+    prebuilt = {name for name in config.packages if wheelhouse is not None and wheelhouse.get_wheel(name) is not None}
+
+    # Pick the first source of each package that can be installed on this host
+    selected: dict[str, GameSource] = {}
+    for name, sources in config.packages.items():
+        for source in sources:
+            if evaluate_markers(source.markers) and (name in prebuilt or can_install_source(log, source)):
+                selected[name] = source
+                break
+
+    def get_fingerprint(name: str) -> str | None:
+        if wheelhouse is not None and name in prebuilt:
+            return wheelhouse.get_fingerprint(name)
+        return get_source_fingerprint(log, selected[name], mirrors)
+
+    # Git sources take a network round trip to fingerprint, so do them concurrently
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        fingerprints = dict(zip(selected, executor.map(get_fingerprint, selected)))
+
+    batch: dict[str, GameSource] = {}
+    for name, source in selected.items():
+        entry = cache.get(name) if cache is not None else None
+        if entry is not None and entry.module_dir is not None:
+            if entry.fingerprint == fingerprints[name]:
+                log.info("Package unchanged since last install, skipping", package=name)
+                module_paths[name] = entry.module_dir
+                continue
+            if fingerprints[name] is None and entry.source == source.model_dump(mode="json"):
+                log.warning("Could not check package for changes, using the installed version", package=name)
+                module_paths[name] = entry.module_dir
+                continue
+        batch[name] = source
+
+    pending = [name for name in config.packages if name not in module_paths]
+    if on_reinstall is not None and pending:
+        on_reinstall(pending)
+
+    try:
+        batch_requirements: dict[str, list[str]] = {}
+        if backend.is_available():
+            for name, source in batch.items():
+                if name in prebuilt:
+                    requirements = [name]
+                else:
+                    requirements = get_source_requirements(log, source, name, mirrors)
+                if requirements is not None:
+                    batch_requirements[name] = requirements
+
+        if batch_requirements:
+            log.info("Installing game packages", package=", ".join(batch_requirements), installer=backend.name)
+            requirements = [arg for package_requirements in batch_requirements.values() for arg in package_requirements]
+            timeout = get_install_timeout()
+            if timeout is not None:
+                timeout *= len(batch_requirements)
+            if install_requirements(log, backend, requirements, on_progress, timeout):
+                for name in batch_requirements:
+                    module_path = get_package_location(log, venv_path, name)
+                    if module_path is not None:
+                        module_paths[name] = module_path
+                        if cache is not None:
+                            cache.record(name, batch[name], fingerprints[name], module_path)
+            else:
+                log.warning("Batch install failed, installing packages one by one")
+
+        for name, sources in config.packages.items():
+            if name in module_paths:
+                continue
+            for source in sources:
+                module_path = install_game_source(log, venv_path, source, name, backend, on_progress, mirrors)
+                if module_path is not None:
+                    module_paths[name] = module_path
+                    if cache is not None:
+                        cache.record(name, source, get_source_fingerprint(log, source, mirrors), module_path)
+                    break
+    finally:
+        mirrors.cleanup()
+
+    if cache is not None:
+        if pending:
+            # Installing a game can replace the editable dweam (e.g. with one from PyPI), so check it again
+            cache.forget("dweam")
+        cache.save()
+    return module_paths
+
+
 def load_toml(file: BinaryIO) -> dict:
     """Load TOML from a binary file object.
     Uses tomli if available, otherwise falls back to tomllib on Python >= 3.11.
@@ -314,64 +464,284 @@ def load_game_implementation(entrypoint: str) -> type:
         raise ImportError(f"Failed to load game implementation from {entrypoint}") from e
 
 
+def get_builtin_games_dir() -> Path:
+    """Get the directory of the CPU-only games that ship with dweam (enabled by DWEAM_BUILTIN_GAMES)"""
+    return Path(str(files('dweam').joinpath('builtin_games')))
+
+
+def register_games(
+    log: BoundLogger,
+    games: defaultdict[str, dict[str, GameInfo]],
+    metadata: PackageMetadata,
+) -> None:
+    """Add the games of a package to the games dict"""
+    for game_id, game_info in metadata.games.items():
+        if game_id in games[metadata.type]:
+            log.warning(
+                "Game ID already exists for type. Overriding...",
+                type=metadata.type,
+                id=game_id,
+            )
+        game_info._metadata = metadata
+        games[metadata.type][game_id] = game_info
+
+
+def load_builtin_games(log: BoundLogger, games: defaultdict[str, dict[str, GameInfo]]) -> None:
+    """Add the builtin games to the games dict, if enabled by DWEAM_BUILTIN_GAMES"""
+    if os.environ.get("DWEAM_BUILTIN_GAMES"):
+        metadata = load_metadata_from_path(log, get_builtin_games_dir())
+        if metadata is not None:
+            register_games(log, games, metadata)
+            log.info("Successfully loaded builtin games")
+
+
+def load_cached_packages(log: BoundLogger, venv_path: Path) -> dict[str, PackageMetadata]:
+    """
+    Get the metadata of the game packages loaded on a previous run, by package name, without installing anything.
+    Only packages whose install can still be found in the venv are included.
+    """
+    cache = get_install_cache(log, venv_path)
+    packages: dict[str, PackageMetadata] = {}
+    for name in DEFAULT_SOURCE_CONFIG.packages:
+        package_venv = get_package_venv_path(venv_path, name)
+        entry = cache.for_venv(package_venv).get(name)
+        if entry is None or entry.metadata is None or entry.module_dir is None:
+            continue
+        try:
+            metadata = PackageMetadata.model_validate(entry.metadata)
+        except ValidationError:
+            log.warning("Ignoring invalid cached metadata", package=name, exc_info=True)
+            continue
+        metadata._module_dir = entry.module_dir
+        metadata._package_name = name
+        metadata._venv_path = package_venv
+        packages[name] = metadata
+    return packages
+
+
+def load_lazy_packages(log: BoundLogger, venv_path: Path, cache: InstallCache) -> dict[str, PackageMetadata]:
+    """
+    Get the metadata of every game package by name, without installing any.
+    Installed packages use their installed metadata; others use the dweam.toml of their first reachable source
+    and have no module dir until they're installed with `install_package`.
+    """
+    packages: dict[str, PackageMetadata] = {}
+    for name, sources in DEFAULT_SOURCE_CONFIG.packages.items():
+        package_venv = get_package_venv_path(venv_path, name)
+        entry = cache.for_venv(package_venv).get(name)
+        if entry is not None and entry.metadata is not None and entry.module_dir is not None:
+            try:
+                metadata = PackageMetadata.model_validate(entry.metadata)
+                metadata._module_dir = entry.module_dir
+                metadata._package_name = name
+                metadata._venv_path = package_venv
+                packages[name] = metadata
+                continue
+            except ValidationError:
+                log.warning("Ignoring invalid cached metadata", package=name, exc_info=True)
+
+        usable_sources = [source for source in sources if evaluate_markers(source.markers)]
+        metadata = fetch_source_metadata(log, usable_sources, name, get_cache_dir() / "metadata")
+        if metadata is None:
+            log.error("No metadata found for game", name=name)
+            continue
+        metadata._package_name = name
+        metadata._venv_path = package_venv
+        packages[name] = metadata
+    return packages
+
+
+def evict_unused_packages(log: BoundLogger, venv_path: Path, cache: InstallCache, max_age: timedelta) -> list[str]:
+    """
+    Uninstall the game packages that weren't used within `max_age`, returning their names.
+    Packages in their own venv are removed along with the venv.
+    """
+    backend = get_installer_backend(log, venv_path)
+    now = datetime.now()
+    evicted = []
+    for name in DEFAULT_SOURCE_CONFIG.packages:
+        package_venv = get_package_venv_path(venv_path, name)
+        package_cache = cache.for_venv(package_venv)
+        entry = package_cache.packages.get(name)
+        if entry is None:
+            continue
+        last_used = entry.last_used_at or entry.installed_at
+        if now - last_used < max_age:
+            continue
+        log.info("Uninstalling unused game package", package=name, last_used=last_used.isoformat())
+        if package_venv != venv_path:
+            shutil.rmtree(package_venv, ignore_errors=True)
+            package_cache.packages.clear()
+            evicted.append(name)
+        elif uninstall_packages(log, backend, [name]):
+            cache.forget(name)
+            evicted.append(name)
+    if evicted and is_isolated_venvs():
+        get_content_store(log).prune()
+    return evicted
+
+
+def install_package(
+    log: BoundLogger,
+    venv_path: Path,
+    name: str,
+    on_progress: ProgressCallback | None = None,
+) -> PackageMetadata | None:
+    """Install a single game package on demand and return its installed metadata"""
+    with install_lock:
+        package_venv = get_package_venv_path(venv_path, name)
+        cache = get_install_cache(log, venv_path).for_venv(package_venv)
+        if package_venv != venv_path:
+            ensure_venv(log, package_venv)
+            # Before the game, so its dependency on dweam doesn't pull dweam from PyPI
+            ensure_dweam_installed(log, package_venv, cache)
+        config = SourceConfig(packages={name: DEFAULT_SOURCE_CONFIG.packages[name]})
+        module_path = install_game_sources(log, package_venv, config, cache, on_progress=on_progress).get(name)
+        ensure_dweam_installed(log, package_venv, cache)
+        if module_path is None:
+            log.error("Failed to install game from any source", name=name)
+            cache.save()
+            return None
+        if package_venv != venv_path:
+            link_venvs(log, [package_venv])
+        metadata = load_metadata_from_path(log, module_path)
+        if metadata is not None:
+            metadata._package_name = name
+            metadata._venv_path = package_venv
+            cache.record_metadata(name, metadata)
+            cache.touch(name)
+        cache.save()
+        return metadata
+
+
+def mark_package_used(log: BoundLogger, venv_path: Path, name: str) -> None:
+    """Record that a game package was just played, so it isn't evicted"""
+    with install_lock:
+        cache = get_install_cache(log, venv_path).for_venv(get_package_venv_path(venv_path, name))
+        cache.touch(name)
+        cache.save()
+
+
+def build_games(log: BoundLogger, packages: Iterable[PackageMetadata]) -> defaultdict[str, dict[str, GameInfo]]:
+    """Build a games dict from package metadata, along with the builtin games"""
+    games: defaultdict[str, dict[str, GameInfo]] = defaultdict(dict)
+    for metadata in packages:
+        register_games(log, games, metadata)
+    load_builtin_games(log, games)
+    return games
+
+
+def ensure_dweam_installed(log: BoundLogger, venv_path: Path, cache: InstallCache) -> None:
+    """Install dweam itself into a venv, unless it's unchanged since the last install"""
+    dweam_source = PathSource(path=get_dweam_source_path())
+    dweam_fingerprint = get_source_fingerprint(log, dweam_source)
+    if cache.is_fresh("dweam", dweam_fingerprint):
+        log.info("dweam unchanged since last install, skipping", venv_path=str(venv_path))
+        return
+    wheelhouse = get_installer_backend(log, venv_path).wheelhouse
+    ensure_correct_dweam_version(log, venv_path, wheelhouse.index_args() if wheelhouse is not None else None)
+    cache.record("dweam", dweam_source, dweam_fingerprint, None)
+
+
 def load_games(
     log: BoundLogger,
     venv_path: Path | None = None,
     games: defaultdict[str, dict[str, GameInfo]] | None = None,
-) -> dict[str, dict[str, GameInfo]]:
-    """Load games from their sources into a single venv"""
+    on_reinstall: Callable[[list[str]], None] | None = None,
+    on_progress: ProgressCallback | None = None,
+    lazy: bool = False,
+) -> defaultdict[str, dict[str, GameInfo]]:
+    """
+    Load games from their sources into a single venv, or a venv per package with DWEAM_ISOLATED_VENVS.
+    With `lazy`, game packages aren't installed; games are loaded from their metadata, see `load_lazy_packages`.
+    """
     if games is None:
         games = defaultdict(dict)
 
-    for name, sources in DEFAULT_SOURCE_CONFIG.packages.items():
-        success = False
-        for source in sources:
-            try:
-                if venv_path is not None:
-                    # Install and load from venv
-                    module_path = install_game_source(log, venv_path, source, name)
-                    if module_path is None:
-                        continue
-                    metadata = load_metadata_from_path(log, module_path)
-                else:
-                    # Try to load from installed package
-                    metadata = load_metadata_from_module(log, name)
+    with install_lock if venv_path is not None else nullcontext():
+        cache = get_install_cache(log, venv_path) if venv_path is not None else None
+        if lazy and venv_path is not None and cache is not None:
+            max_age = get_evict_after()
+            if max_age is not None:
+                evict_unused_packages(log, venv_path, cache, max_age)
+            for metadata in load_lazy_packages(log, venv_path, cache).values():
+                register_games(log, games, metadata)
+        else:
+            _load_installed_games(log, venv_path, games, cache, on_reinstall, on_progress)
 
-                if metadata is None:
-                    log.error("No metadata found for game", name=name)
-                    continue
-                    
-                # Add game info to the games dict
-                for game_id, game_info in metadata.games.items():
-                    if game_id in games[metadata.type]:
-                        log.warning(
-                            "Game ID already exists for type. Overriding...",
-                            type=metadata.type,
-                            id=game_id,
-                        )
-                    game_info._metadata = metadata
-                    games[metadata.type][game_id] = game_info
-                
-                log.info("Successfully loaded game", name=name)
-                success = True
-                break
-                
-            except Exception as e:
-                log.warning("Failed to load game from source", name=name, source=source, exc_info=True)
-                continue
-                
-        if not success:
-            log.error("Failed to load game from any source", name=name)
-    
-    if venv_path is not None:
-        pip_path = get_pip_path(venv_path)
-        ensure_correct_dweam_version(log, pip_path)
+        load_builtin_games(log, games)
+
+        if venv_path is not None and cache is not None:
+            venv_paths = get_venv_paths(venv_path)
+            for path in venv_paths:
+                ensure_dweam_installed(log, path, cache.for_venv(path))
+            if is_isolated_venvs():
+                link_venvs(log, venv_paths)
+            cache.save()
             
     log.info("Finished loading games")
 
     return games
 
 
+def _load_installed_games(
+    log: BoundLogger,
+    venv_path: Path | None,
+    games: defaultdict[str, dict[str, GameInfo]],
+    cache: InstallCache | None,
+    on_reinstall: Callable[[list[str]], None] | None,
+    on_progress: ProgressCallback | None,
+) -> None:
+    """Install every game package (if given a venv) and add their games to the games dict"""
+    module_paths: dict[str, Path] = {}
+    if venv_path is not None:
+        if is_isolated_venvs():
+            # Each package is resolved on its own, so it can't change the dependencies of another
+            for name, sources in DEFAULT_SOURCE_CONFIG.packages.items():
+                package_venv = get_package_venv_path(venv_path, name)
+                try:
+                    ensure_venv(log, package_venv)
+                except RuntimeError:
+                    log.exception("Failed to create package venv", package=name)
+                    continue
+                module_paths.update(install_game_sources(
+                    log, package_venv, SourceConfig(packages={name: sources}),
+                    cache.for_venv(package_venv) if cache is not None else None, on_reinstall, on_progress,
+                ))
+        else:
+            module_paths = install_game_sources(log, venv_path, DEFAULT_SOURCE_CONFIG, cache, on_reinstall, on_progress)
+
+    for name in DEFAULT_SOURCE_CONFIG.packages:
+        try:
+            if venv_path is not None:
+                # Load from the package installed in the venv
+                module_path = module_paths.get(name)
+                if module_path is None:
+                    log.error("Failed to install game from any source", name=name)
+                    continue
+                metadata = load_metadata_from_path(log, module_path)
+                if metadata is not None:
+                    metadata._venv_path = get_package_venv_path(venv_path, name)
+                    if cache is not None:
+                        cache.for_venv(metadata._venv_path).record_metadata(name, metadata)
+            else:
+                # Try to load from installed package
+                metadata = load_metadata_from_module(log, name)
+
+            if metadata is None:
+                log.error("No metadata found for game", name=name)
+                continue
+
+            metadata._package_name = name
+            register_games(log, games, metadata)
+            
+            log.info("Successfully loaded game", name=name)
+            
+        except Exception as e:
+            log.warning("Failed to load game", name=name, exc_info=True)
+            continue
+
+
 # def load_game_entrypoints(log: BoundLogger, games: defaultdict[str, dict[str, GameInfo]] | None = None) -> dict[str, dict[str, GameInfo]]:
 #     """Load all games from installed packages"""
 #     if games is None:
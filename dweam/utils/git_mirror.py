@@ -0,0 +1,151 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from structlog.stdlib import BoundLogger
+from typing_extensions import assert_never
+
+from dweam.models import GitBranchSource, GitRevSource, GitTagSource
+
+
+GitSource = GitBranchSource | GitTagSource | GitRevSource
+
+
+def get_mirror_name(url: str) -> str:
+    """Name of the mirror of a repository, e.g. github.com_dweam-team_diamond.git (predictable, so mirrors can be pre-seeded)"""
+    name = re.sub(r"^[a-z+]+://", "", url.strip().rstrip("/"))
+    name = re.sub(r"^[^@/]+@", "", name)
+    name = re.sub(r"\.git$", "", name)
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name) + ".git"
+
+
+def get_source_ref(source: GitSource) -> str:
+    """The ref a source points to, as it's named in a mirror"""
+    if isinstance(source, GitBranchSource):
+        return f"refs/heads/{source.branch}"
+    elif isinstance(source, GitTagSource):
+        return f"refs/tags/{source.tag}"
+    elif isinstance(source, GitRevSource):
+        return source.rev
+    else:
+        assert_never(source)
+
+
+class GitMirrors:
+    """
+    Bare, blobless clones of game repositories, kept in the cache dir and fetched incrementally.
+    Every source resolves to a commit, which is checked out into a throwaway worktree to build from.
+
+    On an offline host, refs already in a mirror are used as they are, so mirrors can be pre-seeded with
+    `git clone --bare <url> <cache dir>/git/mirrors/<name>.git`.
+    """
+
+    def __init__(self, log: BoundLogger, cache_dir: Path):
+        self.log = log
+        self.mirrors_dir = cache_dir / "mirrors"
+        self.worktrees_dir = cache_dir / "worktrees"
+        self._locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+        self._worktrees: list[tuple[Path, Path]] = []
+
+    def _lock(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[get_mirror_name(url)]
+
+    def _git(self, args: list[str], cwd: Path | None = None, timeout: float = 600) -> subprocess.CompletedProcess | None:
+        try:
+            return subprocess.run(
+                ["git", *args],
+                cwd=cwd,
+                capture_output=True,
+                text=True,
+                timeout=timeout,
+                # Fail instead of waiting for credentials nobody will type
+                env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.log.warning("Failed to run git", args=args, error=str(e))
+            return None
+
+    def get_mirror_path(self, url: str) -> Path:
+        return self.mirrors_dir / get_mirror_name(url)
+
+    def _ensure_mirror(self, url: str) -> Path | None:
+        mirror = self.get_mirror_path(url)
+        if (mirror / "HEAD").exists():
+            return mirror
+        self.log.info("Cloning git mirror", url=url)
+        self.mirrors_dir.mkdir(parents=True, exist_ok=True)
+        tmp_mirror = mirror.with_name(f".{mirror.name}-{uuid.uuid4().hex[:8]}")
+        result = self._git(["clone", "--bare", "--filter=blob:none", url, str(tmp_mirror)])
+        if result is None or result.returncode != 0:
+            self.log.warning("Failed to clone git mirror", url=url, stderr=result.stderr.strip() if result else None)
+            shutil.rmtree(tmp_mirror, ignore_errors=True)
+            return None
+        tmp_mirror.rename(mirror)
+        return mirror
+
+    def _rev_parse(self, mirror: Path, ref: str) -> str | None:
+        result = self._git(["rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"], cwd=mirror)
+        if result is None or result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    def resolve(self, source: GitSource, fetch: bool = True) -> str | None:
+        """Resolve a source to a commit, fetching it into the mirror first unless it's a revision already there"""
+        with self._lock(source.git):
+            ref = get_source_ref(source)
+            mirror = self.get_mirror_path(source.git)
+            if isinstance(source, GitRevSource) and (mirror / "HEAD").exists():
+                # Revisions never move, so a mirror that has one is up to date for it
+                commit = self._rev_parse(mirror, ref)
+                if commit is not None:
+                    return commit
+
+            if fetch:
+                cloned = (mirror / "HEAD").exists()
+                mirror = self._ensure_mirror(source.git)
+                # A fresh clone already has every branch and tag
+                if mirror is not None and (cloned or self._rev_parse(mirror, ref) is None):
+                    refspec = ref if isinstance(source, GitRevSource) else f"+{ref}:{ref}"
+                    result = self._git(["fetch", "--filter=blob:none", "origin", refspec], cwd=mirror)
+                    if result is None or result.returncode != 0:
+                        self.log.warning(
+                            "Failed to fetch git mirror, using what's already there",
+                            url=source.git, ref=ref, stderr=result.stderr.strip() if result else None,
+                        )
+            if mirror is None or not (mirror / "HEAD").exists():
+                return None
+            return self._rev_parse(mirror, ref)
+
+    def checkout(self, source: GitSource, commit: str | None = None) -> Path | None:
+        """Check out a commit of a source into a new worktree, removed again by `cleanup`"""
+        if commit is None:
+            # Usually fetched already, when fingerprinting the source
+            commit = self.resolve(source, fetch=False) or self.resolve(source)
+            if commit is None:
+                return None
+        with self._lock(source.git):
+            mirror = self.get_mirror_path(source.git)
+            worktree = self.worktrees_dir / get_mirror_name(source.git) / f"{commit}-{uuid.uuid4().hex[:8]}"
+            worktree.parent.mkdir(parents=True, exist_ok=True)
+            result = self._git(["worktree", "add", "--detach", str(worktree), commit], cwd=mirror)
+            if result is None or result.returncode != 0:
+                self.log.warning("Failed to check out git worktree", url=source.git, commit=commit, stderr=result.stderr.strip() if result else None)
+                return None
+            self._worktrees.append((mirror, worktree))
+            return worktree
+
+    def cleanup(self) -> None:
+        """Remove the worktrees checked out so far"""
+        for mirror, worktree in self._worktrees:
+            result = self._git(["worktree", "remove", "--force", str(worktree)], cwd=mirror)
+            if result is None or result.returncode != 0:
+                shutil.rmtree(worktree, ignore_errors=True)
+                self._git(["worktree", "prune"], cwd=mirror)
+        self._worktrees.clear()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError
+from structlog.stdlib import BoundLogger
+from typing_extensions import assert_never
+
+from dweam.utils.distinfo import find_dist_info
+from dweam.utils.git_mirror import GitMirrors
+from dweam.models import GameSource, GitBranchSource, GitRevSource, GitTagSource, PathSource, PyPISource
+
+
+# Files that affect how a local path is built and installed; other edits are picked up by editable installs
+PACKAGING_FILES = ("pyproject.toml", "setup.py", "setup.cfg", "requirements.txt", "MANIFEST.in")
+
+
+class InstalledPackage(BaseModel):
+    """A package installed into a venv, and what it was installed from"""
+    fingerprint: str
+    source: dict[str, Any]
+    module_dir: Path | None = None
+    dist_info: Path | None = None
+    metadata: dict[str, Any] | None = None
+    installed_at: datetime = Field(default_factory=datetime.now)
+    last_used_at: datetime | None = None
+
+
+class InstallManifest(BaseModel):
+    """Packages installed into each venv, by venv path and package name"""
+    venvs: dict[str, dict[str, InstalledPackage]] = Field(default_factory=dict)
+
+
+def get_path_fingerprint(path: Path) -> str:
+    """Hash the packaging files of a local source, which decide whether it needs reinstalling"""
+    digest = hashlib.sha256(str(path.absolute()).encode())
+    for filename in PACKAGING_FILES:
+        file_path = path / filename
+        if file_path.is_file():
+            digest.update(filename.encode())
+            digest.update(file_path.read_bytes())
+    return digest.hexdigest()
+
+
+def resolve_git_commit(log: BoundLogger, url: str, ref: str) -> str | None:
+    """Resolve a branch or tag of a remote repository to a commit, without cloning it"""
+    try:
+        result = subprocess.run(
+            ["git", "ls-remote", url, ref],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        log.warning("Failed to resolve git ref", url=url, ref=ref, error=str(e))
+        return None
+    if result.returncode != 0:
+        log.warning("Failed to resolve git ref", url=url, ref=ref, stderr=result.stderr.strip())
+        return None
+    refs = dict(line.split("\t")[::-1] for line in result.stdout.splitlines() if "\t" in line)
+    # Annotated tags are listed twice, the peeled ref being the commit
+    for remote_ref in (f"refs/tags/{ref}^{{}}", ref, f"refs/heads/{ref}", f"refs/tags/{ref}"):
+        if remote_ref in refs:
+            return refs[remote_ref]
+    return None
+
+
+def get_source_fingerprint(log: BoundLogger, source: GameSource, mirrors: GitMirrors | None = None) -> str | None:
+    """
+    Fingerprint what a source would install: the packaging files of a local path, the commit
+    a git ref points to (resolved in the git mirrors if given), or the pinned PyPI version.
+    None if it couldn't be determined.
+    """
+    if isinstance(source, PathSource):
+        if not source.path.exists():
+            return None
+        fingerprint = f"path:{get_path_fingerprint(source.path)}"
+    elif isinstance(source, (GitBranchSource, GitTagSource, GitRevSource)):
+        if mirrors is not None:
+            commit = mirrors.resolve(source)
+        elif isinstance(source, GitBranchSource):
+            commit = resolve_git_commit(log, source.git, source.branch)
+        elif isinstance(source, GitTagSource):
+            commit = resolve_git_commit(log, source.git, source.tag)
+        else:
+            commit = source.rev if re.fullmatch(r"[0-9a-f]{40}", source.rev) else None
+        if commit is None:
+            return None
+        fingerprint = f"git:{commit}"
+    elif isinstance(source, PyPISource):
+        fingerprint = f"pypi:{source.version}"
+    else:
+        assert_never(source)
+
+    # Switching to a different source always reinstalls
+    source_key = json.dumps(source.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(f"{source_key}\n{fingerprint}".encode()).hexdigest()
+
+
+class InstallCache:
+    """Remembers what was installed into a venv, so unchanged packages can be skipped on restart"""
+
+    def __init__(self, log: BoundLogger, venv_path: Path, manifest_path: Path, manifest: InstallManifest | None = None):
+        self.log = log
+        self.venv_path = venv_path
+        self.manifest_path = manifest_path
+        self.manifest = manifest if manifest is not None else self._load()
+
+    def for_venv(self, venv_path: Path) -> "InstallCache":
+        """The same manifest, for what was installed into another venv (saving either saves both)"""
+        if venv_path == self.venv_path:
+            return self
+        return InstallCache(self.log, venv_path, self.manifest_path, self.manifest)
+
+    def _load(self) -> InstallManifest:
+        if not self.manifest_path.exists():
+            return InstallManifest()
+        try:
+            return InstallManifest.model_validate_json(self.manifest_path.read_text())
+        except (OSError, ValidationError) as e:
+            self.log.warning("Ignoring unreadable install manifest", path=str(self.manifest_path), error=str(e))
+            return InstallManifest()
+
+    def save(self) -> None:
+        """Write the manifest atomically, so a crash never leaves it half-written"""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_path.parent, prefix=".install-manifest-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.manifest.model_dump_json(indent=2))
+            os.replace(tmp_path, self.manifest_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @property
+    def packages(self) -> dict[str, InstalledPackage]:
+        return self.manifest.venvs.setdefault(str(self.venv_path), {})
+
+    def get(self, name: str) -> InstalledPackage | None:
+        """Get the install record of a package, if it's still installed"""
+        entry = self.packages.get(name)
+        if entry is None:
+            return None
+        if entry.dist_info is None or not entry.dist_info.exists():
+            return None
+        if entry.module_dir is not None and not entry.module_dir.exists():
+            return None
+        return entry
+
+    def is_fresh(self, name: str, fingerprint: str | None) -> bool:
+        """Whether the package is installed from a source matching the fingerprint"""
+        entry = self.get(name)
+        return entry is not None and fingerprint is not None and entry.fingerprint == fingerprint
+
+    def record(self, name: str, source: BaseModel, fingerprint: str | None, module_dir: Path | None) -> None:
+        dist_info = find_dist_info(self.venv_path, name)
+        if fingerprint is None or dist_info is None:
+            # Without a fingerprint or a verifiable install, the next start has nothing to compare against
+            self.packages.pop(name, None)
+            return
+        self.packages[name] = InstalledPackage(
+            fingerprint=fingerprint,
+            source=source.model_dump(mode="json"),
+            module_dir=module_dir,
+            dist_info=dist_info,
+        )
+
+    def record_metadata(self, name: str, metadata: BaseModel) -> None:
+        entry = self.packages.get(name)
+        if entry is not None:
+            entry.metadata = metadata.model_dump(mode="json")
+
+    def touch(self, name: str) -> None:
+        """Record that a package was just used, for evicting unused packages"""
+        entry = self.packages.get(name)
+        if entry is not None:
+            entry.last_used_at = datetime.now()
+
+    def forget(self, name: str) -> None:
+        self.packages.pop(name, None)
@@ -0,0 +1,214 @@
+import asyncio
+import re
+import threading
+from pathlib import PurePosixPath
+from typing import Callable
+
+from structlog.stdlib import BoundLogger
+
+from dweam.models import InstallProgress
+
+
+ProgressCallback = Callable[[InstallProgress], None]
+
+
+_SIZE_UNITS = {
+    "B": 1,
+    "kB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3,
+    "KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3,
+}
+
+# pip (`--progress-bar raw` needs pip >= 24.1)
+_RAW_PROGRESS = re.compile(r"^Progress (\d+) of (\d+)$")
+_COLLECTING = re.compile(r"^Collecting (\S+)")
+# "Downloading numpy-1.26.4-...whl (18.3 MB)" from pip, "Downloading numpy (17.4MiB)" from uv
+_DOWNLOADING = re.compile(r"^\s*Downloading (\S+) \(([\d.]+) ?([kMG]i?B|B)\)")
+_PIP_BUILDING = re.compile(r"^\s*Building (?:wheel|editable) for (\S+)")
+_PIP_INSTALLING = re.compile(r"^Installing collected packages: ")
+_PIP_DONE = re.compile(r"^Successfully installed ")
+# uv
+_UV_RESOLVED = re.compile(r"^Resolved \d+ packages? ")
+_UV_DOWNLOADED = re.compile(r"^\s*Downloaded (\S+)")
+_UV_BUILDING = re.compile(r"^\s*Building (\S+) @ ")
+_UV_PREPARED = re.compile(r"^Prepared \d+ packages? ")
+_UV_DONE = re.compile(r"^(?:Installed \d+ packages?|Audited \d+ packages?) ")
+
+
+def parse_size(value: str, unit: str) -> int:
+    return int(float(value) * _SIZE_UNITS[unit])
+
+
+def get_package_name(requirement_or_file: str) -> str:
+    """Get the package name from a requirement, a distribution file name, or a URL to one"""
+    name = PurePosixPath(requirement_or_file).name
+    # Distribution files are named {name}-{version}...
+    match = re.match(r"^(.+?)-\d", name)
+    if match:
+        return match.group(1)
+    return re.split(r"[<>=!~\[;@ ]", name, maxsplit=1)[0]
+
+
+class ProgressParser:
+    """Turns pip or uv output lines into progress events"""
+
+    def __init__(self):
+        self.package: str | None = None
+        self.sizes: dict[str, int] = {}
+
+    def feed(self, line: str) -> InstallProgress | None:
+        if match := _RAW_PROGRESS.match(line):
+            return InstallProgress(
+                phase="downloading", package=self.package,
+                bytes_done=int(match.group(1)), bytes_total=int(match.group(2)) or None,
+            )
+        if match := _DOWNLOADING.match(line):
+            self.package = get_package_name(match.group(1))
+            size = parse_size(match.group(2), match.group(3))
+            self.sizes[self.package] = size
+            return InstallProgress(phase="downloading", package=self.package, bytes_done=0, bytes_total=size)
+        if match := _UV_DOWNLOADED.match(line):
+            package = match.group(1)
+            size = self.sizes.get(package)
+            return InstallProgress(phase="downloading", package=package, bytes_done=size, bytes_total=size)
+        if match := _COLLECTING.match(line):
+            self.package = get_package_name(match.group(1))
+            return InstallProgress(phase="resolving", package=self.package)
+        if _UV_RESOLVED.match(line):
+            return InstallProgress(phase="resolving")
+        if match := (_PIP_BUILDING.match(line) or _UV_BUILDING.match(line)):
+            self.package = get_package_name(match.group(1))
+            return InstallProgress(phase="building", package=self.package)
+        if _PIP_INSTALLING.match(line) or _UV_PREPARED.match(line):
+            return InstallProgress(phase="installing")
+        if _PIP_DONE.match(line) or _UV_DONE.match(line):
+            return InstallProgress(phase="done")
+        return None
+
+
+async def _stop_process(process: asyncio.subprocess.Process) -> None:
+    """Terminate a process, killing it if it doesn't exit in time"""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+async def run_installer(
+    log: BoundLogger,
+    args: list[str],
+    on_progress: ProgressCallback | None = None,
+    timeout: float | None = None,
+) -> int:
+    """
+    Run an installer command, logging its output as it arrives and reporting parsed progress.
+    The installer is stopped when the timeout (in seconds) passes or the task is cancelled.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=1024 * 1024,
+    )
+    parser = ProgressParser()
+
+    async def pump(stream: asyncio.StreamReader, event: str):
+        while line := await stream.readline():
+            text = line.decode(errors="replace").rstrip()
+            progress = parser.feed(text)
+            if progress is not None and on_progress is not None:
+                on_progress(progress)
+            # Raw progress lines only matter as progress
+            if text and not _RAW_PROGRESS.match(text):
+                log.info(event, output=text)
+
+    assert process.stdout is not None and process.stderr is not None
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(pump(process.stdout, "pip stdout"), pump(process.stderr, "pip stderr"), process.wait()),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        log.error("Installer timed out, stopping it", timeout=timeout)
+        await _stop_process(process)
+    except asyncio.CancelledError:
+        log.warning("Installer cancelled, stopping it")
+        await _stop_process(process)
+        raise
+    assert process.returncode is not None
+    return process.returncode
+
+
+class InstallRun:
+    """An installer run in its own event loop, which other threads can cancel"""
+
+    def __init__(self, log: BoundLogger, args: list[str], on_progress: ProgressCallback | None, timeout: float | None):
+        self.log = log
+        self.args = args
+        self.on_progress = on_progress
+        self.timeout = timeout
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._cancelled = False
+
+    async def _main(self) -> int:
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        if self._cancelled:
+            raise asyncio.CancelledError()
+        return await run_installer(self.log, self.args, self.on_progress, self.timeout)
+
+    def run(self) -> int:
+        """Run the installer to completion and return its exit code (-1 if cancelled)"""
+        try:
+            return asyncio.run(self._main())
+        except asyncio.CancelledError:
+            return -1
+
+    def cancel(self) -> None:
+        """Stop the installer, from any thread"""
+        self._cancelled = True
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            loop.call_soon_threadsafe(task.cancel)
+
+
+_running: set[InstallRun] = set()
+_running_lock = threading.Lock()
+_cancelled_all = False
+
+
+def run_installer_sync(
+    log: BoundLogger,
+    args: list[str],
+    on_progress: ProgressCallback | None = None,
+    timeout: float | None = None,
+) -> int:
+    """Run an installer from a thread without an event loop (like the game loader), see `run_installer`"""
+    install_run = InstallRun(log, args, on_progress, timeout)
+    with _running_lock:
+        if _cancelled_all:
+            log.warning("Installs were cancelled, not starting installer")
+            return -1
+        _running.add(install_run)
+    try:
+        return install_run.run()
+    finally:
+        with _running_lock:
+            _running.discard(install_run)
+
+
+def cancel_running_installs() -> None:
+    """Stop every installer started with `run_installer_sync` and refuse to start new ones, e.g. on shutdown"""
+    global _cancelled_all
+    with _running_lock:
+        _cancelled_all = True
+        running = list(_running)
+    for install_run in running:
+        install_run.cancel()
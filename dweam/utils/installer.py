@@ -0,0 +1,195 @@
+import os
+import shutil
+from pathlib import Path
+
+from packaging.version import InvalidVersion, Version
+from structlog.stdlib import BoundLogger
+from typing_extensions import assert_never
+
+from dweam.models import GameSource, GitBranchSource, GitRevSource, GitTagSource, PathSource, PyPISource
+from dweam.utils.distinfo import find_distribution
+from dweam.utils.git_mirror import GitMirrors
+from dweam.utils.install_runner import ProgressCallback
+from dweam.utils.venv import get_pip_path, get_python_path, run_pip_with_output
+from dweam.utils.wheelhouse import Wheelhouse, load_wheelhouse
+
+
+# Index for the CUDA builds of the torch stack that most games depend on
+PYTORCH_INDEX_URL = "https://download.pytorch.org/whl/cu121"
+
+
+class InstallerBackend:
+    """A package installer that can install requirements into a venv"""
+    name: str
+
+    def __init__(self, venv_path: Path, wheelhouse: Wheelhouse | None = None):
+        self.venv_path = venv_path
+        self.wheelhouse = wheelhouse
+
+    def is_available(self) -> bool:
+        raise NotImplementedError
+
+    def index_args(self) -> list[str]:
+        """Args choosing where packages come from: the wheelhouse if there is one, PyPI and the PyTorch index otherwise"""
+        if self.wheelhouse is not None:
+            return self.wheelhouse.index_args()
+        return ["--extra-index-url", PYTORCH_INDEX_URL]
+
+    def install_command(self, requirements: list[str]) -> list[str]:
+        """Command that installs the given requirements (pip-style args) in a single resolve"""
+        raise NotImplementedError
+
+    def uninstall_command(self, names: list[str]) -> list[str]:
+        raise NotImplementedError
+
+
+class PipBackend(InstallerBackend):
+    name = "pip"
+
+    def is_available(self) -> bool:
+        return get_pip_path(self.venv_path).exists()
+
+    def supports_raw_progress(self) -> bool:
+        """Whether the venv's pip can print machine-readable download progress (pip >= 24.1)"""
+        dist = find_distribution(self.venv_path, "pip")
+        if dist is None:
+            return False
+        try:
+            return Version(dist.version) >= Version("24.1")
+        except InvalidVersion:
+            return False
+
+    def install_command(self, requirements: list[str]) -> list[str]:
+        progress_args = ["--progress-bar", "raw"] if self.supports_raw_progress() else []
+        return [
+            str(get_pip_path(self.venv_path)),
+            "install",
+            *progress_args,
+            *self.index_args(),
+            *requirements,
+        ]
+
+    def uninstall_command(self, names: list[str]) -> list[str]:
+        return [str(get_pip_path(self.venv_path)), "uninstall", "-y", *names]
+
+
+class UvBackend(InstallerBackend):
+    """Installs with uv, which downloads and builds packages in parallel"""
+    name = "uv"
+
+    def __init__(self, venv_path: Path, wheelhouse: Wheelhouse | None = None, uv_path: str | None = None):
+        super().__init__(venv_path, wheelhouse)
+        self.uv_path = uv_path or shutil.which("uv")
+
+    def is_available(self) -> bool:
+        return self.uv_path is not None and get_python_path(self.venv_path).exists()
+
+    def index_args(self) -> list[str]:
+        if self.wheelhouse is not None:
+            return self.wheelhouse.index_args()
+        # Pick the best version across both indexes, like pip does
+        return [*super().index_args(), "--index-strategy", "unsafe-best-match"]
+
+    def install_command(self, requirements: list[str]) -> list[str]:
+        assert self.uv_path is not None
+        return [
+            self.uv_path,
+            "pip",
+            "install",
+            "--python",
+            str(get_python_path(self.venv_path)),
+            *self.index_args(),
+            *requirements,
+        ]
+
+    def uninstall_command(self, names: list[str]) -> list[str]:
+        assert self.uv_path is not None
+        return [self.uv_path, "pip", "uninstall", "--python", str(get_python_path(self.venv_path)), *names]
+
+
+def get_installer_backend(log: BoundLogger, venv_path: Path) -> InstallerBackend:
+    """
+    Get the installer backend chosen by DWEAM_INSTALLER (pip, uv, or auto to prefer uv when it's on PATH),
+    installing from the wheelhouse set by DWEAM_WHEELHOUSE if any
+    """
+    wheelhouse = load_wheelhouse(log)
+    choice = os.environ.get("DWEAM_INSTALLER", "auto").lower()
+    if choice not in ("auto", "pip", "uv"):
+        log.warning("Unknown installer backend, using auto", installer=choice)
+        choice = "auto"
+
+    if choice in ("auto", "uv"):
+        uv = UvBackend(venv_path, wheelhouse)
+        if uv.is_available():
+            return uv
+        if choice == "uv":
+            log.warning("uv not found on PATH, falling back to pip")
+    return PipBackend(venv_path, wheelhouse)
+
+
+def can_install_source(log: BoundLogger, source: GameSource) -> bool:
+    """Whether a source can be installed here, without fetching anything"""
+    if isinstance(source, PathSource):
+        if not source.path.absolute().exists():
+            log.warning("Source path does not exist", path=str(source.path.absolute()))
+            return False
+    return True
+
+
+def get_source_requirements(
+    log: BoundLogger,
+    source: GameSource,
+    name: str,
+    mirrors: GitMirrors | None = None,
+) -> list[str] | None:
+    """
+    Get the install args for a game source, or None if the source can't be installed here.
+    Git sources are checked out from the git mirrors if given, and cloned by pip otherwise.
+    """
+    if isinstance(source, PathSource):
+        abs_path = source.path.absolute()
+        if not abs_path.exists():
+            log.warning("Source path does not exist", path=str(abs_path))
+            return None
+        return ["-e", str(abs_path)]
+    elif isinstance(source, (GitBranchSource, GitTagSource, GitRevSource)):
+        if mirrors is not None:
+            worktree = mirrors.checkout(source)
+            if worktree is None:
+                return None
+            return [f"{name} @ {worktree.as_uri()}"]
+        if isinstance(source, GitBranchSource):
+            ref = source.branch
+        elif isinstance(source, GitTagSource):
+            ref = source.tag
+        else:
+            ref = source.rev
+        return [f"{name} @ git+{source.git}@{ref}"]
+    elif isinstance(source, PyPISource):
+        return [f"{name}=={source.version}"]
+    else:
+        assert_never(source)
+
+
+def get_install_timeout() -> float | None:
+    """Get the time in seconds a single package may take to install, from DWEAM_INSTALL_TIMEOUT (unlimited by default)"""
+    timeout = os.environ.get("DWEAM_INSTALL_TIMEOUT")
+    return float(timeout) if timeout else None
+
+
+def install_requirements(
+    log: BoundLogger,
+    backend: InstallerBackend,
+    requirements: list[str],
+    on_progress: ProgressCallback | None = None,
+    timeout: float | None = None,
+) -> bool:
+    """Install requirements with the given backend, streaming its output to the log and its progress to `on_progress`"""
+    returncode = run_pip_with_output(log, backend.install_command(requirements), on_progress, timeout)
+    return returncode == 0
+
+
+def uninstall_packages(log: BoundLogger, backend: InstallerBackend, names: list[str]) -> bool:
+    """Uninstall packages with the given backend (their dependencies are left installed)"""
+    returncode = run_pip_with_output(log, backend.uninstall_command(names))
+    return returncode == 0
@@ -0,0 +1,63 @@
+import os
+import sys
+
+
+def get_memory_info() -> tuple[int | None, int | None]:
+    """Get the (total, available) system memory in bytes, or None where unknown"""
+    if sys.platform.startswith("linux"):
+        try:
+            values = {}
+            with open("/proc/meminfo") as f:
+                for line in f:
+                    key, _, rest = line.partition(":")
+                    values[key] = int(rest.split()[0]) * 1024
+            return values.get("MemTotal"), values.get("MemAvailable")
+        except (OSError, ValueError, IndexError):
+            pass
+
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        total = os.sysconf("SC_PHYS_PAGES") * page_size
+        available = os.sysconf("SC_AVPHYS_PAGES") * page_size
+        return total, available
+    except (ValueError, OSError, AttributeError):
+        return None, None
+
+
+def get_process_rss(pid: int | None = None) -> int | None:
+    """Get the resident set size of a process in bytes (defaults to the current process)"""
+    if pid is None:
+        pid = os.getpid()
+
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    if pid == os.getpid():
+        try:
+            import resource
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+            return max_rss if sys.platform == "darwin" else max_rss * 1024
+        except (ImportError, OSError):
+            return None
+
+    return None
+
+
+def get_system_cpu_times() -> tuple[float, float] | None:
+    """Get the (busy, total) CPU time of the whole system in seconds, summed over cores (Linux only)"""
+    try:
+        with open("/proc/stat") as f:
+            fields = [float(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    # user nice system idle iowait irq softirq steal ...
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    total = sum(fields[:8])
+    return (total - idle) / ticks, total / ticks
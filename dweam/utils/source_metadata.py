@@ -0,0 +1,94 @@
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Sequence
+
+import requests
+from pydantic import ValidationError
+from structlog.stdlib import BoundLogger
+from typing_extensions import assert_never
+
+try:
+    import tomli as toml_lib
+except ImportError:
+    if sys.version_info >= (3, 11):
+        import tomllib as toml_lib
+    else:
+        raise ImportError("Neither tomli nor tomllib (Python >= 3.11) are available. Please install tomli.")
+
+from dweam.models import GameSource, GitBranchSource, GitRevSource, GitTagSource, PackageMetadata, PathSource, PyPISource
+
+
+def get_raw_file_url(git_url: str, ref: str, path: str) -> str | None:
+    """Get the URL of a single file in a git repository, for hosts that serve raw files (GitHub)"""
+    match = re.match(r"^https://github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$", git_url)
+    if match is None:
+        return None
+    owner, repo = match.groups()
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{path}"
+
+
+def read_source_metadata_text(log: BoundLogger, source: GameSource, name: str) -> str | None:
+    """Read a package's dweam.toml straight from its source, without installing the package"""
+    if isinstance(source, PathSource):
+        dweam_path = source.path / name / "dweam.toml"
+        try:
+            return dweam_path.read_text()
+        except OSError:
+            return None
+    elif isinstance(source, (GitBranchSource, GitTagSource, GitRevSource)):
+        if isinstance(source, GitBranchSource):
+            ref = source.branch
+        elif isinstance(source, GitTagSource):
+            ref = source.tag
+        else:
+            ref = source.rev
+        url = get_raw_file_url(source.git, ref, f"{name}/dweam.toml")
+        if url is None:
+            return None
+        try:
+            response = requests.get(url, timeout=10)
+        except requests.RequestException as e:
+            log.warning("Failed to fetch package metadata", url=url, error=str(e))
+            return None
+        if not response.ok:
+            log.warning("Failed to fetch package metadata", url=url, status=response.status_code)
+            return None
+        return response.text
+    elif isinstance(source, PyPISource):
+        # Would need the sdist or wheel, which is most of the install
+        return None
+    else:
+        assert_never(source)
+
+
+def fetch_source_metadata(log: BoundLogger, sources: Sequence[GameSource], name: str, cache_dir: Path) -> PackageMetadata | None:
+    """
+    Get a package's metadata from the first of its sources that has it, without installing it.
+    Fetched metadata is kept in the cache dir, and used when none of the sources can be reached.
+    """
+    cache_path = cache_dir / f"{name}.toml"
+    text = None
+    for source in sources:
+        text = read_source_metadata_text(log, source, name)
+        if text is not None:
+            break
+    if text is None:
+        try:
+            text = cache_path.read_text()
+        except OSError:
+            return None
+    else:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f".{name}-")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+
+    try:
+        return PackageMetadata.model_validate(toml_lib.loads(text))
+    except (ValueError, ValidationError):
+        log.warning("Invalid package metadata", package=name, exc_info=True)
+        return None
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import BaseModel, Field, ValidationError
+
+from dweam.models import PackageMetadata
+
+
+MANIFEST_NAME = "thumbnails.json"
+
+
+class ThumbnailFile(BaseModel):
+    file: str
+    sha256: str
+    size: int
+
+
+class ThumbnailEntry(BaseModel):
+    """The thumbnail clips of a game, and what they were generated from"""
+    key: str = Field(description="Hash of the source and encode settings; the clips are rebuilt when it changes")
+    source: str
+    frames: int
+    width: int
+    height: int
+    fps: int
+    generated_at: datetime = Field(default_factory=datetime.now)
+    files: dict[str, ThumbnailFile] = Field(default_factory=dict, description="Clips by extension")
+
+
+class ThumbnailManifest(BaseModel):
+    games: dict[str, ThumbnailEntry] = Field(default_factory=dict)
+
+
+def get_thumbnail_dir(metadata: PackageMetadata) -> Path | None:
+    """The thumbnail dir of an installed package"""
+    if metadata._module_dir is None:
+        return None
+    return metadata._module_dir / metadata.thumbnail_dir
+
+
+def load_manifest(thumbnail_dir: Path) -> ThumbnailManifest:
+    try:
+        return ThumbnailManifest.model_validate_json((thumbnail_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValidationError):
+        return ThumbnailManifest()
+
+
+def write_manifest(thumbnail_dir: Path, manifest: ThumbnailManifest) -> None:
+    """Write the manifest atomically, so the server never reads half of it"""
+    thumbnail_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=thumbnail_dir, prefix=f".{MANIFEST_NAME}-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(manifest.model_dump_json(indent=2))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, thumbnail_dir / MANIFEST_NAME)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
@@ -6,7 +6,10 @@ import venv
 from pathlib import Path
 from structlog.stdlib import BoundLogger
 from importlib.resources import files
-import time
+
+from dweam.utils.distinfo import find_distribution, get_editable_location
+from dweam.utils.install_runner import ProgressCallback, run_installer_sync
+from dweam.utils.wheelhouse import load_wheelhouse
 
 
 class PyInstallerEnvBuilder(venv.EnvBuilder):
@@ -59,6 +62,16 @@ class PyInstallerEnvBuilder(venv.EnvBuilder):
                 shutil.copyfile(src_path, dst)
 
 
+def get_pip_path(venv_path: Path) -> Path:
+    """Get the pip executable path for the given venv"""
+    return venv_path / "Scripts" / "pip.exe" if sys.platform == "win32" else venv_path / "bin" / "pip"
+
+
+def get_python_path(venv_path: Path) -> Path:
+    """Get the python executable path for the given venv"""
+    return venv_path / "Scripts" / "python.exe" if sys.platform == "win32" else venv_path / "bin" / "python"
+
+
 def get_venv_path(log: BoundLogger) -> Path:
     """Get and setup the virtual environment path"""
     home_dir = os.environ.get("CACHE_DIR")
@@ -67,11 +80,14 @@ def get_venv_path(log: BoundLogger) -> Path:
     else:
         home_dir = Path.home() / ".dweam"
     
-    venv_path = home_dir / "dweam-venv"
-    
+    return ensure_venv(log, home_dir / "dweam-venv")
+
+
+def ensure_venv(log: BoundLogger, venv_path: Path) -> Path:
+    """Create a virtual environment unless it already exists, replacing it if it's corrupted"""
     # If venv exists but is corrupted/incomplete, try to remove it
     if venv_path.exists():
-        pip_path = venv_path / "Scripts" / "pip.exe" if sys.platform == "win32" else venv_path / "bin" / "pip"
+        pip_path = get_pip_path(venv_path)
         if pip_path.exists():
             return venv_path
         log.warning("Pip not found; cleaning up corrupted venv")
@@ -114,13 +130,25 @@ def create_and_setup_venv(log: BoundLogger, path: Path) -> Path:
     """Create a new virtual environment and return its path"""
     if not getattr(sys, 'frozen', False):
         # In development, use normal venv creation
+        wheelhouse = load_wheelhouse(log)
         builder = venv.EnvBuilder(
             with_pip=True,
-            upgrade_deps=True,
+            # Upgrading pip and setuptools needs PyPI, which offline nodes (with a wheelhouse) can't reach
+            upgrade_deps=wheelhouse is None,
             clear=True,
             symlinks=False
         )
         builder.create(path)
+        if wheelhouse is not None:
+            upgrades = [name for name in ("pip", "setuptools") if wheelhouse.get_wheel(name) is not None]
+            if upgrades:
+                returncode = run_pip_with_output(log, [
+                    str(get_pip_path(path)), "install", "--upgrade",
+                    "--no-index", "--find-links", str(wheelhouse.path), *upgrades,
+                ])
+                if returncode != 0:
+                    # The bundled pip still works
+                    log.warning("Failed to upgrade pip from the wheelhouse", returncode=returncode)
         return path
 
     # In frozen app, use the copied Python
@@ -147,14 +175,8 @@ def create_and_setup_venv(log: BoundLogger, path: Path) -> Path:
     return path
 
 
-def ensure_correct_dweam_version(log: BoundLogger, pip_path: Path):
-    """
-    Ensure the correct version of dweam is installed in the venv.
-    
-    Args:
-        log: Logger instance
-        pip_path: Path to pip executable
-    """
+def get_dweam_source_path() -> Path:
+    """Get the root directory of the dweam project (containing pyproject.toml), to install it into venvs"""
     import dweam
     
     if getattr(sys, 'frozen', False):
@@ -173,20 +195,29 @@ def ensure_correct_dweam_version(log: BoundLogger, pip_path: Path):
             # python 3.10-
             import inspect
             dweam_path = Path(inspect.getsourcefile(dweam)).parent.parent
+    return dweam_path
 
-    # Get installed version using pip show
-    result = subprocess.run(
-        [str(pip_path), "show", "dweam"],
-        capture_output=True,
-        text=True
-    )
+
+def ensure_correct_dweam_version(log: BoundLogger, venv_path: Path, index_args: list[str] | None = None):
+    """
+    Ensure the correct version of dweam is installed in the venv.
     
-    if result.returncode != 0:
-        log.warning("dweam not installed, installing", stdout=result.stdout, stderr=result.stderr)
+    Args:
+        log: Logger instance
+        venv_path: Path to the venv
+        index_args: Installer args choosing where dependencies come from (e.g. a wheelhouse)
+    """
+    dweam_path = get_dweam_source_path()
+    pip_path = get_pip_path(venv_path)
+
+    dist = find_distribution(venv_path, "dweam")
+    if dist is None:
+        log.warning("dweam not installed, installing")
         # Use streaming output for installation
         returncode = run_pip_with_output(log, [
             str(pip_path),
             "install",
+            *(index_args or []),
             "-e",
             str(dweam_path)
         ])
@@ -195,21 +226,15 @@ def ensure_correct_dweam_version(log: BoundLogger, pip_path: Path):
             return
         return
 
-    # Parse location from pip show output
-    install_location = None
-    for line in result.stdout.splitlines():
-        if line.startswith("Location: "):
-            install_location = line.split(": ")[1].strip()
-            break
-    
-    # If dweam isn't installed from our path, reinstall it
-    # TODO this wrongly detects incorrect install methinks
-    if not install_location or not Path(install_location).samefile(dweam_path):
+    # If dweam isn't installed (editable) from our path, reinstall it
+    install_location = get_editable_location(dist)
+    if install_location is None or not install_location.exists() or not install_location.samefile(dweam_path):
         log.warning("dweam is not installed from the correct location, reinstalling", new_location=dweam_path, old_location=install_location)
         # Use streaming output for reinstallation
         returncode = run_pip_with_output(log, [
             str(pip_path),
             "install",
+            *(index_args or []),
             "-e",
             str(dweam_path)
         ])
@@ -219,82 +244,11 @@ def ensure_correct_dweam_version(log: BoundLogger, pip_path: Path):
     
     return True
 
-def run_pip_with_output(log: BoundLogger, args: list[str]) -> int:
-    """Run pip with real-time output logging"""
-    process = subprocess.Popen(
-        args,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-        bufsize=1,  # Line buffered
-        universal_newlines=True
-    )
-    
-    if sys.platform == "win32":
-        # Windows implementation - use threads
-        from threading import Thread
-        from queue import Queue, Empty
-        
-        def reader_thread(stream, queue):
-            """Thread to read from a stream and put lines into a queue"""
-            for line in stream:
-                queue.put(line)
-            stream.close()
-
-        # Start reader threads
-        stdout_queue = Queue()
-        stderr_queue = Queue()
-        Thread(target=reader_thread, args=(process.stdout, stdout_queue), daemon=True).start()
-        Thread(target=reader_thread, args=(process.stderr, stderr_queue), daemon=True).start()
-
-        while True:
-            # Check if process has finished
-            if process.poll() is not None and stdout_queue.empty() and stderr_queue.empty():
-                break
-
-            # Read from queues
-            try:
-                line = stdout_queue.get_nowait()
-                log.info("pip stdout", output=line.strip())
-            except Empty:
-                pass
-
-            try:
-                line = stderr_queue.get_nowait()
-                log.info("pip stderr", output=line.strip())
-            except Empty:
-                pass
-
-            time.sleep(0.01)  # Small sleep to prevent CPU spinning
-    else:
-        # Unix implementation - use select
-        import select
-        
-        while True:
-            reads = [process.stdout, process.stderr]
-            reads = [f for f in reads if f]  # Remove closed pipes
-            if not reads:
-                break
-                
-            ready, _, _ = select.select(reads, [], [], 0.1)
-            
-            for pipe in ready:
-                line = pipe.readline()
-                if line:
-                    if pipe is process.stdout:
-                        log.info("pip stdout", output=line.strip())
-                    else:
-                        log.info("pip stderr", output=line.strip())
-            
-            if process.poll() is not None:
-                # Read any remaining output
-                for pipe in [process.stdout, process.stderr]:
-                    if pipe:
-                        for line in pipe:
-                            if pipe is process.stdout:
-                                log.info("pip stdout", output=line.strip())
-                            else:
-                                log.info("pip stderr", output=line.strip())
-                break
-    
-    return process.wait()
+def run_pip_with_output(
+    log: BoundLogger,
+    args: list[str],
+    on_progress: ProgressCallback | None = None,
+    timeout: float | None = None,
+) -> int:
+    """Run pip (or another installer) with real-time output logging"""
+    return run_installer_sync(log, args, on_progress, timeout)
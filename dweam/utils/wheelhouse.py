@@ -0,0 +1,123 @@
+import hashlib
+import os
+from datetime import datetime
+from pathlib import Path
+
+from pydantic import BaseModel, Field, ValidationError
+from structlog.stdlib import BoundLogger
+from typing_extensions import assert_never
+
+from dweam.models import GameSource, GitBranchSource, GitRevSource, GitTagSource, PathSource, PyPISource
+from dweam.utils.distinfo import normalize_name
+from dweam.utils.git_mirror import GitMirrors
+
+
+LOCK_FILENAME = "wheelhouse.lock.json"
+CONSTRAINTS_FILENAME = "constraints.txt"
+
+
+class LockedWheel(BaseModel):
+    name: str
+    version: str
+    filename: str
+    sha256: str
+
+
+class WheelhouseLock(BaseModel):
+    """The wheels in a wheelhouse, and which game packages were built into it from which source"""
+    created_at: datetime = Field(default_factory=datetime.now)
+    python: str | None = None
+    wheels: dict[str, LockedWheel] = Field(default_factory=dict, description="Wheels by normalized name")
+    packages: dict[str, dict] = Field(default_factory=dict, description="Source of each game package, by name")
+
+
+def parse_wheel_filename(filename: str) -> tuple[str, str]:
+    """Get the (name, version) of a wheel from its file name"""
+    name, version = filename.split("-")[:2]
+    return name, version
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_wheel_requirement(log: BoundLogger, source: GameSource, name: str, mirrors: GitMirrors) -> str | None:
+    """Get what `pip wheel` should build for a game source"""
+    if isinstance(source, PathSource):
+        abs_path = source.path.absolute()
+        if not abs_path.exists():
+            return None
+        return str(abs_path)
+    elif isinstance(source, (GitBranchSource, GitTagSource, GitRevSource)):
+        worktree = mirrors.checkout(source)
+        if worktree is None:
+            return None
+        return f"{name} @ {worktree.as_uri()}"
+    elif isinstance(source, PyPISource):
+        return f"{name}=={source.version}"
+    else:
+        assert_never(source)
+
+
+def write_lock(log: BoundLogger, wheelhouse_dir: Path, packages: dict[str, GameSource], python: str | None) -> WheelhouseLock:
+    """Hash every wheel in a wheelhouse and write its lockfile and pip constraints"""
+    lock = WheelhouseLock(
+        python=python,
+        packages={name: source.model_dump(mode="json") for name, source in packages.items()},
+    )
+    for wheel_path in sorted(wheelhouse_dir.glob("*.whl")):
+        name, version = parse_wheel_filename(wheel_path.name)
+        key = normalize_name(name)
+        if key in lock.wheels:
+            log.warning("Multiple wheels for one package in the wheelhouse", package=name, filename=wheel_path.name)
+        lock.wheels[key] = LockedWheel(name=name, version=version, filename=wheel_path.name, sha256=hash_file(wheel_path))
+
+    (wheelhouse_dir / LOCK_FILENAME).write_text(lock.model_dump_json(indent=2))
+    (wheelhouse_dir / CONSTRAINTS_FILENAME).write_text(
+        "".join(f"{wheel.name}=={wheel.version}\n" for wheel in lock.wheels.values())
+    )
+    return lock
+
+
+class Wheelhouse:
+    """A directory of prebuilt wheels that packages are installed from, without any index"""
+
+    def __init__(self, path: Path, lock: WheelhouseLock):
+        self.path = path
+        self.lock = lock
+
+    @property
+    def constraints_path(self) -> Path:
+        return self.path / CONSTRAINTS_FILENAME
+
+    def get_wheel(self, name: str) -> LockedWheel | None:
+        return self.lock.wheels.get(normalize_name(name))
+
+    def index_args(self) -> list[str]:
+        """Installer args that install only from this wheelhouse, at the locked versions"""
+        return ["--no-index", "--find-links", str(self.path), "-c", str(self.constraints_path)]
+
+    def get_fingerprint(self, name: str) -> str | None:
+        """Fingerprint of a game package's wheel, which changes whenever the wheelhouse is rebuilt with a new version"""
+        wheel = self.get_wheel(name)
+        return f"wheel:{wheel.sha256}" if wheel is not None else None
+
+
+def load_wheelhouse(log: BoundLogger, path: Path | None = None) -> Wheelhouse | None:
+    """Load the wheelhouse set by DWEAM_WHEELHOUSE, if any"""
+    if path is None:
+        env_path = os.environ.get("DWEAM_WHEELHOUSE")
+        if not env_path:
+            return None
+        path = Path(env_path)
+    lock_path = path / LOCK_FILENAME
+    try:
+        lock = WheelhouseLock.model_validate_json(lock_path.read_text())
+    except (OSError, ValidationError) as e:
+        log.warning("Ignoring wheelhouse without a valid lockfile", path=str(path), error=str(e))
+        return None
+    return Wheelhouse(path, lock)
@@ -0,0 +1,256 @@
+"""
+Model weights shared between game workers.
+
+Weights are downloaded once into the cache dir and stored as safetensors, which are mapped read-only
+instead of read into each worker's memory. Every session of a game then shares the same physical pages
+(the page cache), instead of holding its own copy of the tensors:
+
+    from dweam.weights import load_weights
+
+    state_dict = load_weights("diamond_csgo", "https://huggingface.co/.../model.pt", state_dict_key="model")
+    model.load_state_dict(state_dict, assign=True)
+
+The mapped tensors are read-only; moving them to the GPU (or `.clone()`) makes a private copy.
+"""
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+from urllib.parse import urlparse
+
+import requests
+
+from dweam.utils.distinfo import normalize_name
+from dweam.utils.entrypoint import get_cache_dir
+
+if TYPE_CHECKING:
+    import torch
+
+
+# safetensors dtype names, by torch dtype name
+SAFETENSORS_DTYPES = {
+    "float64": "F64", "float32": "F32", "float16": "F16", "bfloat16": "BF16",
+    "int64": "I64", "int32": "I32", "int16": "I16", "int8": "I8", "uint8": "U8", "bool": "BOOL",
+}
+
+
+@dataclass
+class MappedFile:
+    package: str | None
+    path: Path
+    size: int
+    mapping: mmap.mmap
+    tensors: "dict[str, torch.Tensor]"
+
+
+# Weights mapped by this process, by path (mapping a file twice returns the same tensors)
+_mapped: dict[Path, MappedFile] = {}
+
+
+def get_weights_dir(package: str) -> Path:
+    """Where a game package's weights are cached"""
+    return get_cache_dir() / "weights" / normalize_name(package)
+
+
+def flatten_state_dict(state: Any, prefix: str = "") -> "dict[str, torch.Tensor]":
+    """Flatten nested dicts of tensors (like a training checkpoint) into dotted names, dropping everything else"""
+    import torch
+
+    tensors = {}
+    if isinstance(state, torch.Tensor):
+        tensors[prefix] = state
+    elif isinstance(state, dict):
+        for key, value in state.items():
+            tensors.update(flatten_state_dict(value, f"{prefix}.{key}" if prefix else str(key)))
+    return tensors
+
+
+def save_safetensors(tensors: "dict[str, torch.Tensor]", path: Path) -> None:
+    """Write tensors in the safetensors format, atomically"""
+    import torch
+
+    # Largest dtypes first, so every tensor starts aligned to its element size
+    items = sorted(tensors.items(), key=lambda item: (-item[1].element_size(), item[0]))
+    header: dict[str, Any] = {}
+    offset = 0
+    for name, tensor in items:
+        dtype = SAFETENSORS_DTYPES.get(str(tensor.dtype).removeprefix("torch."))
+        if dtype is None:
+            raise ValueError(f"Unsupported dtype {tensor.dtype} for {name}")
+        size = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": dtype, "shape": list(tensor.shape), "data_offsets": [offset, offset + size]}
+        offset += size
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # Pad so the data starts 8-byte aligned
+    header_bytes += b" " * (-(8 + len(header_bytes)) % 8)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(len(header_bytes).to_bytes(8, "little"))
+            f.write(header_bytes)
+            for _, tensor in items:
+                f.write(tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def _copy_to_cache(source: str | Path, path: Path) -> None:
+    """Download (or copy) a file into the cache, atomically, so concurrent workers never see half a file"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(source, Path):
+                with open(source, "rb") as source_file:
+                    shutil.copyfileobj(source_file, f)
+            else:
+                with requests.get(source, stream=True, timeout=60) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on a file, across the processes of the host"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+            while True:
+                try:
+                    # Gives up after 10 attempts, a download takes longer
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        yield
+
+
+def fetch_weights(package: str, source: str | Path, name: str | None = None, state_dict_key: str | None = None) -> Path:
+    """
+    Get a cached safetensors file of a package's weights, downloading (or copying) them from the source the first time.
+    Sources in another format are loaded with `torch.load` and converted; `state_dict_key` picks the
+    state dict out of a checkpoint that holds more than one.
+    """
+    if isinstance(source, Path):
+        source_name = source.name
+    else:
+        source_name = Path(urlparse(source).path).name
+    if name is None:
+        name = source_name.rsplit(".", 1)[0] + (f"-{state_dict_key}" if state_dict_key else "")
+    path = get_weights_dir(package) / f"{name}.safetensors"
+    if path.exists():
+        return path
+
+    # Sessions starting together on a new node fetch the weights once, the others wait for them
+    # (one lock per package, as weights converted from the same checkpoint share its download)
+    with _file_lock(path.parent / ".lock"):
+        if path.exists():
+            return path
+
+        if source_name.endswith(".safetensors") and state_dict_key is None:
+            _copy_to_cache(source, path)
+            return path
+
+        import torch
+
+        if isinstance(source, Path):
+            checkpoint_path = source
+        else:
+            checkpoint_path = get_weights_dir(package) / "downloads" / source_name
+            _copy_to_cache(source, checkpoint_path)
+        state = torch.load(checkpoint_path, map_location="cpu", weights_only=True)
+        if state_dict_key is not None:
+            state = state[state_dict_key]
+        save_safetensors(flatten_state_dict(state), path)
+        if checkpoint_path != source:
+            checkpoint_path.unlink()
+    return path
+
+
+def map_safetensors(path: Path, package: str | None = None) -> "dict[str, torch.Tensor]":
+    """Map a safetensors file read-only, as tensors backed by the page cache that processes share"""
+    import torch
+
+    path = path.absolute()
+    mapped = _mapped.get(path)
+    if mapped is not None:
+        return mapped.tensors
+
+    dtypes = {safetensors_dtype: getattr(torch, torch_dtype) for torch_dtype, safetensors_dtype in SAFETENSORS_DTYPES.items()}
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = int.from_bytes(mapping[:8], "little")
+    header = json.loads(mapping[8:8 + header_size])
+    data_start = 8 + header_size
+
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = dtypes[info["dtype"]]
+        start, end = info["data_offsets"]
+        if start == end:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        with warnings.catch_warnings():
+            # torch warns that the buffer isn't writable, which is the point
+            warnings.filterwarnings("ignore", message=".*not writable.*")
+            tensor = torch.frombuffer(mapping, dtype=torch.uint8, count=end - start, offset=data_start + start)
+        tensors[name] = tensor.view(dtype).view(info["shape"])
+
+    _mapped[path] = MappedFile(package, path, mapping.size(), mapping, tensors)
+    return tensors
+
+
+def load_weights(package: str, source: str | Path, name: str | None = None, state_dict_key: str | None = None) -> "dict[str, torch.Tensor]":
+    """Fetch a package's weights into the cache (see `fetch_weights`) and map them (see `map_safetensors`)"""
+    return map_safetensors(fetch_weights(package, source, name, state_dict_key), package)
+
+
+def get_mapped_memory(paths: set[str]) -> dict[str, tuple[int, int]]:
+    """Get the (resident, proportional) bytes of this process's mappings of the given files (Linux only)"""
+    memory: dict[str, tuple[int, int]] = {}
+    if not sys.platform.startswith("linux"):
+        return memory
+    try:
+        with open("/proc/self/smaps") as f:
+            current = None
+            for line in f:
+                fields = line.split(None, 5)
+                if not fields:
+                    continue
+                if not fields[0].endswith(":"):
+                    # A mapping's header line: address perms offset dev inode [path]
+                    current = fields[5].strip() if len(fields) > 5 and fields[5].strip() in paths else None
+                elif current is not None and fields[0] in ("Rss:", "Pss:"):
+                    rss, pss = memory.get(current, (0, 0))
+                    value = int(fields[1]) * 1024
+                    memory[current] = (rss + value, pss) if fields[0] == "Rss:" else (rss, pss + value)
+    except (OSError, ValueError, IndexError):
+        pass
+    return memory
+
+
+def get_mapped_weights() -> list[MappedFile]:
+    return list(_mapped.values())
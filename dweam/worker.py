@@ -1,7 +1,10 @@
 import asyncio
 from asyncio.subprocess import Process
+from collections import defaultdict
 import json
 import os
+import secrets
+import time
 from typing import Optional, Any
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -20,8 +23,10 @@ from dweam.log_config import get_logger
 from dweam.utils.turn import create_turn_credentials, get_turn_stun_urls
 from dweam.constants import JS_TO_PYGAME_KEY_MAP, JS_TO_PYGAME_BUTTON_MAP
 from structlog.stdlib import BoundLogger
-from dweam.commands import Command, Response, SchemaCommand, StopCommand, UpdateParamsCommand, HandleOfferCommand, OfferData, ErrorResponse
+from dweam.commands import Command, Response, SchemaCommand, StopCommand, UpdateParamsCommand, HandleOfferCommand, MetricsCommand, SpectateCommand, SnapshotCommand, OfferData, ErrorResponse
+from dweam.metrics import Summary, WorkerMetrics
 from dweam.utils.process import get_asyncio_subprocess_flags
+from dweam.zygote import ZygoteProcess, get_zygote
 
 def is_debug_build() -> bool:
     """Detect if we're running the debug build based on executable name"""
@@ -40,6 +45,7 @@ class GameWorker:
         game_type: str,
         game_id: str,
         venv_path: Path,
+        snapshot: Path | None = None,
     ):
         self.log = log
         self.game_info = game_info
@@ -47,12 +53,16 @@ class GameWorker:
         self.game_id = game_id
         self.session_id = session_id
         self.venv_path = venv_path
+        # Snapshot the game is resumed from
+        self.snapshot_path = snapshot
+        # Given only to the player, so that knowing the session id (like spectators do) isn't enough to reconnect
+        self.reconnect_token = secrets.token_urlsafe(16)
 
         self.last_heartbeat = datetime.now()
         self.cleanup_scheduled = False
         
         # Communication handles
-        self.process: Optional[Process] = None
+        self.process: Optional[Process | ZygoteProcess] = None
         self.reader: Optional[StreamReader] = None
         self.writer: Optional[StreamWriter] = None
         
@@ -61,6 +71,14 @@ class GameWorker:
 
         self.last_log_line: str | None = None
 
+        # Commands share one connection, so only one may be in flight at a time
+        self._command_lock = asyncio.Lock()
+
+        # Performance counters
+        self.spawn_seconds: float | None = None
+        self.rpc_seconds: defaultdict[str, Summary] = defaultdict(Summary)
+        self.metrics: WorkerMetrics | None = None
+
     async def _monitor_process_output(self, stream: StreamReader | None, stream_name: str):
         """Monitor output stream of the worker process and log any output"""
         if stream is None:
@@ -84,7 +102,7 @@ class GameWorker:
                 
             self.log.info(f"Worker {stream_name}", line=output_line)
 
-    async def _collect_process_output(self, process: Process) -> tuple[str | None, str | None]:
+    async def _collect_process_output(self, process: Process | ZygoteProcess) -> tuple[str | None, str | None]:
         stdout_str = None
         stderr_str = None
 
@@ -131,6 +149,7 @@ class GameWorker:
         
         max_retries = 3
         retry_delay = 1.0
+        spawn_start = time.perf_counter()
 
         for attempt in range(max_retries):
             try:
@@ -165,20 +184,21 @@ class GameWorker:
                              game_type=self.game_type,
                              game_id=self.game_id)
                 
-                # Start the worker process with the port number
-                self.process = await asyncio.create_subprocess_exec(
-                    str(venv_python),
-                    str(worker_script),
-                    json.dumps(self.game_type),
-                    self.game_id,
-                    json.dumps([]),
-                    str(port),
-                    stdin=asyncio.subprocess.PIPE,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    creationflags=get_asyncio_subprocess_flags()
-                )
-                self.log.info("Started worker process", pid=self.process.pid)
+                # Start the worker process with the port number, forked from the venv's zygote if there is one
+                worker_args = [str(worker_script), json.dumps(self.game_type), self.game_id, json.dumps([]), str(port)]
+                zygote = await get_zygote(self.log, self.venv_path)
+                if zygote is not None:
+                    self.process = await zygote.spawn(worker_args)
+                else:
+                    self.process = await asyncio.create_subprocess_exec(
+                        str(venv_python),
+                        *worker_args,
+                        stdin=asyncio.subprocess.PIPE,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        creationflags=get_asyncio_subprocess_flags()
+                    )
+                self.log.info("Started worker process", pid=self.process.pid, forked=zygote is not None)
 
                 # Add immediate process status check with timeout
                 try:
@@ -255,6 +275,7 @@ class GameWorker:
                         
                         self.log.info("Client connected")
 
+                    self.spawn_seconds = time.perf_counter() - spawn_start
                     return  # Success!
                 except Exception:
                     self.log.exception("Error during connection")
@@ -277,26 +298,58 @@ class GameWorker:
         # Pass the offer to game process and get answer
         response = await self._send_command(HandleOfferCommand(
             cmd="handle_offer",
-            data=OfferData(sdp=offer.sdp, type=offer.type)
+            data=OfferData(sdp=offer.sdp, type=offer.type),
+            snapshot=str(self.snapshot_path) if self.snapshot_path is not None else None,
         ))
         
         # Convert response to RTCSessionDescription
         return RTCSessionDescription(sdp=response["sdp"], type=response["type"])
 
+    async def reconnect(self, offer: RTCSessionDescription) -> RTCSessionDescription:
+        """Attach a new connection of the player to the running game, replacing the lost one"""
+        if not self.process:
+            raise RuntimeError("Worker process not started")
+        response = await self._send_command(HandleOfferCommand(data=OfferData(sdp=offer.sdp, type=offer.type)))
+        return RTCSessionDescription(sdp=response["sdp"], type=response["type"])
+
+    async def spectate(self, offer: RTCSessionDescription) -> RTCSessionDescription:
+        """Attach a read-only viewer to the running session"""
+        if not self.process:
+            raise RuntimeError("Worker process not started")
+        response = await self._send_command(SpectateCommand(data=OfferData(sdp=offer.sdp, type=offer.type)))
+        return RTCSessionDescription(sdp=response["sdp"], type=response["type"])
+
+    async def snapshot(self) -> dict[str, Any]:
+        """Save the game's state, returning the snapshot's metadata"""
+        if not self.process:
+            raise RuntimeError("Worker process not started")
+        return await self._send_command(SnapshotCommand())
+
+    async def _exchange(self, command: Command) -> bytes:
+        assert self.writer is not None and self.reader is not None
+        async with self._command_lock:
+            start = time.perf_counter()
+            message = command.model_dump_json() + "\n"
+            self.writer.write(message.encode())
+            await self.writer.drain()
+
+            response = await self.reader.readline()
+            if response == b"":
+                raise RuntimeError("Worker process closed")
+            self.rpc_seconds[command.cmd].observe(time.perf_counter() - start)
+        return response
+
     async def _send_command(self, command: Command) -> Any:
         """Send a command to the worker process and get the response"""
         if not self.writer or not self.reader:
             raise RuntimeError("Worker process not started")
-        
-        message = command.model_dump_json() + "\n"
-        self.writer.write(message.encode())
-        await self.writer.drain()
-        
-        response = await self.reader.readline()
-        if response == b"":
-            raise RuntimeError("Worker process closed")
-        
-        self.log.info("Worker response", response=response)
+
+        # A command that was written must have its reply read, or the next command would get it:
+        # cancelling the caller doesn't cancel the exchange
+        response = await asyncio.shield(self._exchange(command))
+
+        if not isinstance(command, MetricsCommand):
+            self.log.info("Worker response", response=response)
         result = TypeAdapter(Response).validate_json(response)
         
         if isinstance(result, ErrorResponse):
@@ -310,11 +363,18 @@ class GameWorker:
         return await self._send_command(SchemaCommand())
 
     async def update_params(self, params: dict) -> None:
-        """Update game parameters"""
+        """Update some of the game parameters, before the game's next step"""
         if not self.process:
             await self.start()
         return await self._send_command(UpdateParamsCommand(data=params))
 
+    async def get_metrics(self) -> WorkerMetrics | None:
+        """Fetch the session's performance counters, unless the worker is busy with another command"""
+        if not self.writer or self._command_lock.locked() or self.cleanup_scheduled:
+            return self.metrics
+        self.metrics = WorkerMetrics.model_validate(await self._send_command(MetricsCommand()))
+        return self.metrics
+
     async def cleanup(self):
         """Clean up worker resources"""
         if self.cleanup_scheduled:
@@ -0,0 +1,368 @@
+"""
+Zygotes: a process per venv that imports the worker runtime once, then forks a game worker per session.
+
+Started on its own, each worker pays for a fresh interpreter and for importing torch, av and aiortc,
+which takes seconds. A zygote runs on the venv's python like a worker, imports `dweam.game_process`
+(and the modules in DWEAM_ZYGOTE_PRELOAD), and listens on a unix socket. For every request it forks a
+child that runs the worker's main, writing to the requester's pipes, and reports the child's pid and
+later its exit code back on the request's connection.
+
+Forking is only safe in a single-threaded process, and only available on Linux; elsewhere (or with
+DWEAM_ZYGOTE=0) workers are started directly.
+"""
+import asyncio
+import importlib
+import json
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import traceback
+from asyncio.subprocess import Process
+from collections import defaultdict
+from importlib.resources import files
+from pathlib import Path
+from typing import NoReturn
+
+from structlog.stdlib import BoundLogger
+
+from dweam.utils.venv import get_python_path
+
+
+ZYGOTE_READY = "zygote ready"
+
+
+def is_zygote_supported() -> bool:
+    """Whether workers are forked from a zygote (Linux only, and the frozen app has no venv python to run one on)"""
+    if os.environ.get("DWEAM_ZYGOTE") == "0":
+        return False
+    return sys.platform == "linux" and not getattr(sys, "frozen", False)
+
+
+async def open_pipe_reader(fd: int) -> asyncio.StreamReader:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", 0))
+    return reader
+
+
+class ZygoteProcess:
+    """A worker forked by a zygote, with the parts of `asyncio.subprocess.Process` that `GameWorker` uses"""
+
+    def __init__(self, pid: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, stdout: asyncio.StreamReader, stderr: asyncio.StreamReader):
+        self.pid = pid
+        self.returncode: int | None = None
+        self.stdout = stdout
+        self.stderr = stderr
+        self._exited = asyncio.create_task(self._wait_for_exit(reader, writer))
+
+    async def _wait_for_exit(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        line = await reader.readline()
+        writer.close()
+        try:
+            self.returncode = json.loads(line)["returncode"]
+            return
+        except (ValueError, KeyError):
+            pass
+        # The zygote is gone, so wait for the orphaned worker to go too
+        while True:
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                break
+            await asyncio.sleep(0.5)
+        self.returncode = -1
+
+    async def wait(self) -> int:
+        await asyncio.shield(self._exited)
+        assert self.returncode is not None
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.returncode is not None:
+            return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class Zygote:
+    """The zygote of a venv, as seen from the server"""
+
+    def __init__(self, log: BoundLogger, venv_path: Path):
+        self.log = log.bind(venv_path=str(venv_path))
+        self.venv_path = venv_path
+        self.process: Process | None = None
+        self._tmp_dir: Path | None = None
+
+    @property
+    def socket_path(self) -> Path:
+        assert self._tmp_dir is not None
+        return self._tmp_dir / "zygote.sock"
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def _monitor_output(self, stream: asyncio.StreamReader, stream_name: str) -> None:
+        while line := await stream.readline():
+            self.log.info(f"Zygote {stream_name}", line=line.decode(errors="replace").rstrip())
+
+    async def start(self, timeout: float = 120) -> None:
+        """Start the zygote, and wait until it has imported the runtime and is ready to fork workers"""
+        if getattr(sys, "frozen", False):
+            raise RuntimeError("Zygotes aren't supported in the frozen app")
+        self._tmp_dir = Path(tempfile.mkdtemp(prefix="dweam-zygote-"))
+        self.log.info("Starting zygote")
+        self.process = await asyncio.create_subprocess_exec(
+            str(get_python_path(self.venv_path)),
+            str(files("dweam").joinpath("zygote.py")),
+            str(self.socket_path),
+            # The zygote exits when its stdin closes, i.e. when the server goes away
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        assert self.process.stdout is not None and self.process.stderr is not None
+        asyncio.create_task(self._monitor_output(self.process.stderr, "stderr"))
+
+        async def wait_until_ready() -> bool:
+            assert self.process is not None and self.process.stdout is not None
+            while line := await self.process.stdout.readline():
+                text = line.decode(errors="replace").rstrip()
+                if text == ZYGOTE_READY:
+                    return True
+                self.log.info("Zygote stdout", line=text)
+            return False
+
+        try:
+            ready = await asyncio.wait_for(wait_until_ready(), timeout)
+        except asyncio.TimeoutError:
+            ready = False
+        if not ready:
+            await self.stop()
+            raise RuntimeError("Zygote failed to start")
+        asyncio.create_task(self._monitor_output(self.process.stdout, "stdout"))
+        self.log.info("Zygote ready", pid=self.process.pid)
+
+    async def spawn(self, args: list[str], timeout: float = 10) -> ZygoteProcess:
+        """Fork a worker running `dweam.game_process` with the given command line args"""
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(str(self.socket_path))
+                socket.send_fds(sock, [json.dumps({"argv": args}).encode() + b"\n"], [stdout_write, stderr_write])
+            except OSError:
+                sock.close()
+                raise
+        except OSError:
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise
+        finally:
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+        stdout = await open_pipe_reader(stdout_read)
+        stderr = await open_pipe_reader(stderr_read)
+        reader, writer = await asyncio.open_unix_connection(sock=sock)
+        try:
+            pid = json.loads(await asyncio.wait_for(reader.readline(), timeout))["pid"]
+        except (asyncio.TimeoutError, ValueError, KeyError) as e:
+            writer.close()
+            raise RuntimeError("Zygote failed to fork a worker") from e
+        return ZygoteProcess(pid, reader, writer, stdout, stderr)
+
+    async def stop(self) -> None:
+        if self.is_running:
+            assert self.process is not None
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                self.process.kill()
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+_zygotes: dict[Path, Zygote] = {}
+_zygote_locks: defaultdict[Path, asyncio.Lock] = defaultdict(asyncio.Lock)
+# Venvs whose zygote failed to start, which aren't retried
+_failed_venvs: set[Path] = set()
+
+
+async def get_zygote(log: BoundLogger, venv_path: Path) -> Zygote | None:
+    """The zygote of a venv, started on first use; None when workers should be started directly"""
+    if not is_zygote_supported() or venv_path in _failed_venvs:
+        return None
+    async with _zygote_locks[venv_path]:
+        zygote = _zygotes.get(venv_path)
+        if zygote is not None and zygote.is_running:
+            return zygote
+        zygote = Zygote(log, venv_path)
+        try:
+            await zygote.start()
+        except (OSError, RuntimeError):
+            log.warning("Failed to start zygote, starting workers directly", venv_path=str(venv_path), exc_info=True)
+            _failed_venvs.add(venv_path)
+            return None
+        _zygotes[venv_path] = zygote
+        return zygote
+
+
+async def stop_zygotes() -> None:
+    """Stop every zygote (workers forked from them keep running until they're cleaned up)"""
+    await asyncio.gather(*[zygote.stop() for zygote in _zygotes.values()])
+    _zygotes.clear()
+
+
+# The zygote process itself
+
+
+def run_worker(argv: list[str], stdout_fd: int, stderr_fd: int) -> NoReturn:
+    """Run a game worker in a freshly forked child, never returning"""
+    code = 1
+    try:
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+        # Every child would otherwise generate the same random numbers as its siblings
+        random.seed()
+        if "numpy" in sys.modules:
+            sys.modules["numpy"].random.seed()
+        if "torch" in sys.modules:
+            sys.modules["torch"].seed()
+
+        from dweam import game_process
+        sys.argv = argv
+        asyncio.run(game_process.main())
+        code = 0
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def main():
+    socket_path = sys.argv[1]
+
+    from dweam.log_config import get_logger
+    log = get_logger().bind(process="zygote")
+
+    preload = [module for module in os.environ.get("DWEAM_ZYGOTE_PRELOAD", "").split(",") if module]
+    for module in ["dweam.game_process", *preload]:
+        importlib.import_module(module)
+    if threading.active_count() > 1:
+        # A child would be forked with locks held by threads that don't exist in it
+        log.error("Threads were started while preloading, forking isn't safe", threads=threading.active_count())
+        sys.exit(1)
+
+    # Exited children wake the loop up through this pipe
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(16)
+    print(ZYGOTE_READY, flush=True)
+
+    # Connections of the running children by pid, to report their exit on
+    children: dict[int, socket.socket] = {}
+
+    def fork_worker(conn: socket.socket) -> None:
+        data, fds, _, _ = socket.recv_fds(conn, 1024 * 1024, 2)
+        if len(fds) != 2:
+            for fd in fds:
+                os.close(fd)
+            conn.close()
+            log.error("Invalid fork request", fds=len(fds))
+            return
+        argv = json.loads(data)["argv"]
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            listener.close()
+            conn.close()
+            for child_conn in children.values():
+                child_conn.close()
+            os.close(wakeup_read)
+            os.close(wakeup_write)
+            run_worker(argv, *fds)
+
+        for fd in fds:
+            os.close(fd)
+        children[pid] = conn
+        conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+        log.info("Forked worker", pid=pid)
+
+    def reap_children() -> None:
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            conn = children.pop(pid, None)
+            if conn is None:
+                continue
+            try:
+                conn.sendall(json.dumps({"returncode": os.waitstatus_to_exitcode(status)}).encode() + b"\n")
+            except OSError:
+                pass
+            conn.close()
+
+    try:
+        while True:
+            try:
+                readable, _, _ = select.select([listener, sys.stdin, wakeup_read], [], [])
+            except InterruptedError:
+                continue
+            if sys.stdin in readable and not os.read(sys.stdin.fileno(), 4096):
+                log.info("Server went away, exiting")
+                break
+            if wakeup_read in readable:
+                os.read(wakeup_read, 4096)
+            if listener in readable:
+                conn, _ = listener.accept()
+                try:
+                    fork_worker(conn)
+                except (OSError, ValueError, KeyError):
+                    log.exception("Failed to fork worker")
+                    conn.close()
+            reap_children()
+    finally:
+        listener.close()
+        Path(socket_path).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
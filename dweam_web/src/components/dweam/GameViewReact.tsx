@@ -6,6 +6,19 @@ interface GameViewReactProps {
   gameId: string;
 }
 
+// The worker keeps the session for a while after the connection is lost (DWEAM_RECONNECT_GRACE)
+const RECONNECT_DELAY_MS = 2000;
+const RECONNECT_ATTEMPTS = 10;
+
+function sendVisibility(dataChannel: RTCDataChannel | null) {
+  if (dataChannel?.readyState === 'open') {
+    dataChannel.send(JSON.stringify({
+      type: 'visibility',
+      visible: document.visibilityState === 'visible'
+    }));
+  }
+}
+
 export default function GameViewReact({ gameType, gameId }: GameViewReactProps) {
   const videoRef = useRef<HTMLVideoElement>(null);
   const playOverlayRef = useRef<HTMLDivElement>(null);
@@ -18,8 +31,17 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
   const dataChannelRef = useRef<RTCDataChannel | null>(null);
   const heartbeatIntervalRef = useRef<number | null>(null);
   const abortControllerRef = useRef<AbortController | null>(null);
+  const sessionIdRef = useRef<string | null>(null);
+  const reconnectTokenRef = useRef<string | null>(null);
+  const iceServersRef = useRef<RTCIceServer[]>([]);
+  const reconnectTimeoutRef = useRef<number | null>(null);
+
+  const closePeer = () => {
+    if (reconnectTimeoutRef.current) {
+      clearTimeout(reconnectTimeoutRef.current);
+      reconnectTimeoutRef.current = null;
+    }
 
-  const cleanup = () => {
     if (heartbeatIntervalRef.current) {
       clearInterval(heartbeatIntervalRef.current);
       heartbeatIntervalRef.current = null;
@@ -34,6 +56,12 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       pcRef.current.close();
       pcRef.current = null;
     }
+  };
+
+  const cleanup = () => {
+    closePeer();
+    sessionIdRef.current = null;
+    reconnectTokenRef.current = null;
 
     if (videoRef.current?.srcObject) {
       const stream = videoRef.current.srcObject as MediaStream;
@@ -113,12 +141,18 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       setIsPointerLocked(document.pointerLockElement === videoRef.current);
     };
 
+    // The worker pauses the game while nobody is looking at it
+    const handleVisibilityChange = () => {
+      sendVisibility(dataChannelRef.current);
+    };
+
     document.addEventListener('keydown', handleKeydown);
     document.addEventListener('keyup', handleKeyup);
     document.addEventListener('mousemove', handleMouseMove);
     document.addEventListener('mousedown', handleMouseDown);
     document.addEventListener('mouseup', handleMouseUp);
     document.addEventListener('pointerlockchange', handlePointerLockChange);
+    document.addEventListener('visibilitychange', handleVisibilityChange);
 
     return () => {
       document.removeEventListener('keydown', handleKeydown);
@@ -127,6 +161,7 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       document.removeEventListener('mousedown', handleMouseDown);
       document.removeEventListener('mouseup', handleMouseUp);
       document.removeEventListener('pointerlockchange', handlePointerLockChange);
+      document.removeEventListener('visibilitychange', handleVisibilityChange);
     };
   }, [isPointerLocked]);
 
@@ -136,37 +171,8 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
     };
   }, []);
 
-  const startPlayback = async () => {
-    if (connectionState === 'connecting') return;
-    
-    setConnectionState('connecting');
-    setError(null);
-
-    // Create new AbortController for this connection
-    abortControllerRef.current = new AbortController();
-
-    let iceServers: RTCIceServer[] = [];
-    
-    const turnCredentials = await api.getTurnCredentials();
-    if (turnCredentials.turn_urls.length > 0 || turnCredentials.stun_urls.length > 0) {
-      // Production mode with ICE servers
-      if (turnCredentials.turn_urls.length > 0) {
-        iceServers.push({
-          urls: turnCredentials.turn_urls,
-          username: turnCredentials.username,
-          credential: turnCredentials.credential
-        });
-      }
-      if (turnCredentials.stun_urls.length > 0) {
-        iceServers.push({
-          urls: turnCredentials.stun_urls
-        });
-      }
-    } else {
-      console.log('Running in local mode without ICE servers');
-    }
-
-    pcRef.current = new RTCPeerConnection({ iceServers });
+  const createPeerConnection = () => {
+    pcRef.current = new RTCPeerConnection({ iceServers: iceServersRef.current });
     const pc = pcRef.current;
 
     dataChannelRef.current = pc.createDataChannel('controls');
@@ -175,6 +181,7 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
     pc.addTransceiver('video', { direction: 'recvonly' });
 
     dataChannel.onopen = () => {
+      sendVisibility(dataChannel);
       heartbeatIntervalRef.current = window.setInterval(() => {
         if (dataChannel?.readyState === 'open') {
           dataChannel.send(JSON.stringify({ type: 'heartbeat' }));
@@ -186,15 +193,15 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       console.log('Received track:', event);
       const track = event.track;
       console.log('Track state:', track.readyState);
-      
+    
       if (event.streams?.[0] && videoRef.current) {
         videoRef.current.srcObject = event.streams[0];
         console.log('Video stream set to video element.');
-        
+      
         videoRef.current.onloadeddata = () => {
           console.log('First frame received, video ready to play');
           setConnectionState('connected');
-          
+        
           // Close the SSE connection by aborting the fetch
           if (abortControllerRef.current) {
             abortControllerRef.current.abort();
@@ -207,7 +214,9 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
 
     pc.oniceconnectionstatechange = () => {
       console.log('ICE Connection State:', pc.iceConnectionState);
-      if (pc.iceConnectionState === 'failed' || pc.iceConnectionState === 'closed') {
+      if (pc.iceConnectionState === 'failed' || pc.iceConnectionState === 'disconnected') {
+        scheduleReconnect(pc);
+      } else if (pc.iceConnectionState === 'closed') {
         cleanup();
       }
     };
@@ -220,6 +229,84 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       }
     };
 
+    return pc;
+  };
+
+  // Give a disconnected connection a moment to recover, then reattach to the session with a new one
+  const scheduleReconnect = (pc: RTCPeerConnection) => {
+    if (!sessionIdRef.current) {
+      cleanup();
+      return;
+    }
+    if (reconnectTimeoutRef.current) return;
+    reconnectTimeoutRef.current = window.setTimeout(() => {
+      reconnectTimeoutRef.current = null;
+      if (pcRef.current === pc && !['connected', 'completed'].includes(pc.iceConnectionState)) {
+        reconnect();
+      }
+    }, RECONNECT_DELAY_MS);
+  };
+
+  const reconnect = async () => {
+    const sessionId = sessionIdRef.current;
+    setConnectionState('connecting');
+    setLoadingMessage('Reconnecting...');
+
+    for (let attempt = 0; attempt < RECONNECT_ATTEMPTS; attempt++) {
+      if (!sessionId || sessionIdRef.current !== sessionId) return;
+      closePeer();
+      const pc = createPeerConnection();
+      try {
+        const offer = await pc.createOffer();
+        await pc.setLocalDescription(offer);
+        const response = await api.reconnect(sessionId, reconnectTokenRef.current!, {
+          sdp: pc.localDescription!.sdp,
+          type: pc.localDescription!.type
+        });
+        await pc.setRemoteDescription(new RTCSessionDescription(response));
+        return;
+      } catch (error) {
+        console.error('Reconnect failed:', error);
+        await new Promise(resolve => setTimeout(resolve, RECONNECT_DELAY_MS));
+      }
+    }
+    cleanup();
+    setError('Lost the connection to the game');
+  };
+
+  const startPlayback = async () => {
+    if (connectionState === 'connecting') return;
+    
+    setConnectionState('connecting');
+    setError(null);
+
+    // Create new AbortController for this connection
+    abortControllerRef.current = new AbortController();
+
+    let iceServers: RTCIceServer[] = [];
+    
+    const turnCredentials = await api.getTurnCredentials();
+    if (turnCredentials.turn_urls.length > 0 || turnCredentials.stun_urls.length > 0) {
+      // Production mode with ICE servers
+      if (turnCredentials.turn_urls.length > 0) {
+        iceServers.push({
+          urls: turnCredentials.turn_urls,
+          username: turnCredentials.username,
+          credential: turnCredentials.credential
+        });
+      }
+      if (turnCredentials.stun_urls.length > 0) {
+        iceServers.push({
+          urls: turnCredentials.stun_urls
+        });
+      }
+    } else {
+      console.log('Running in local mode without ICE servers');
+    }
+
+    iceServersRef.current = iceServers;
+    const pc = createPeerConnection();
+
     const offer = await pc.createOffer();
     await pc.setLocalDescription(offer);
 
@@ -236,6 +323,8 @@ export default function GameViewReact({ gameType, gameId }: GameViewReactProps)
       );
 
       await pc.setRemoteDescription(new RTCSessionDescription(response));
+      sessionIdRef.current = response.sessionId;
+      reconnectTokenRef.current = response.reconnectToken;
       
       window.dispatchEvent(new CustomEvent('gameSessionReady', {
         detail: { sessionId: response.sessionId }
@@ -1,11 +1,18 @@
 import { useStore } from '@nanostores/react';
 import { useEffect } from 'react';
-import { isLoading, loadingMessage, loadingDetail, initializeStore } from '../../stores/gameStore';
+import { isLoading, loadingMessage, loadingDetail, loadingProgress, initializeStore } from '../../stores/gameStore';
+
+function formatBytes(bytes: number) {
+  if (bytes >= 1e9) return `${(bytes / 1e9).toFixed(1)} GB`;
+  if (bytes >= 1e6) return `${(bytes / 1e6).toFixed(1)} MB`;
+  return `${Math.round(bytes / 1e3)} kB`;
+}
 
 export default function LoadingOverlay() {
   const loading = useStore(isLoading);
   const message = useStore(loadingMessage);
   const detail = useStore(loadingDetail);
+  const progress = useStore(loadingProgress);
 
   useEffect(() => {
     initializeStore();
@@ -24,6 +31,19 @@ export default function LoadingOverlay() {
             {message}
           </div>
         )}
+        {progress && progress.phase === 'downloading' && progress.bytes_total ? (
+          <div className="mb-2">
+            <div className="text-xs font-mono opacity-75 mb-1">
+              Downloading {progress.package} ({formatBytes(progress.bytes_done ?? 0)} / {formatBytes(progress.bytes_total)})
+            </div>
+            <div className="w-full h-2 bg-gray-200 rounded">
+              <div
+                className="h-2 bg-blue-600 rounded"
+                style={{ width: `${Math.min(100, ((progress.bytes_done ?? 0) / progress.bytes_total) * 100)}%` }}
+              />
+            </div>
+          </div>
+        ) : null}
         {detail && (
           <div className="text-xs font-mono opacity-50 max-w-md text-center px-4">
             {detail}
@@ -72,7 +72,19 @@ class ApiClient {
 
   // Game related endpoints
   async getStatus() {
-    return this.request<{ is_loading: boolean }>('/status');
+    return this.request<{
+      is_loading: boolean;
+      is_refreshing?: boolean;
+      catalog_version?: number;
+      loading_message?: string | null;
+      loading_detail?: string | null;
+      loading_progress?: {
+        phase: 'resolving' | 'downloading' | 'building' | 'installing' | 'done';
+        package: string | null;
+        bytes_done: number | null;
+        bytes_total: number | null;
+      } | null;
+    }>('/status');
   }
 
   async getGameInfo() {
@@ -109,7 +121,7 @@ class ApiClient {
     data: any,
     onLoadingMessage?: (message: string) => void,
     signal?: AbortSignal
-  ): Promise<RTCSessionDescriptionInit & { sessionId: string }> {
+  ): Promise<RTCSessionDescriptionInit & { sessionId: string; reconnectToken: string }> {
     const url = `${this.getBaseUrl()}/offer/${gameType}/${gameId}`;
     
     const response = await fetch(url, {
@@ -141,7 +153,8 @@ class ApiClient {
               resolve({
                 sdp: parsed.sdp,
                 type: parsed.type,
-                sessionId: parsed.sessionId
+                sessionId: parsed.sessionId,
+                reconnectToken: parsed.reconnectToken
               });
             } catch (e) {
               console.error('Failed to parse answer:', e);
@@ -173,6 +186,14 @@ class ApiClient {
     });
   }
 
+  // Reattach to a running session after losing the connection
+  async reconnect(sessionId: string, reconnectToken: string, data: RTCSessionDescriptionInit) {
+    return this.request<RTCSessionDescriptionInit & { sessionId: string }>(`/reconnect/${sessionId}`, {
+      method: 'POST',
+      body: JSON.stringify({ ...data, reconnectToken }),
+    });
+  }
+
   // Params related endpoints
   async getParamsSchema(sid: string) {
     return this.request<{
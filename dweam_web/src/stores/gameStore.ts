@@ -19,6 +19,15 @@ export const isLoading = atom<boolean>(false);
 export const loadingMessage = atom<string | null>(null);
 export const loadingDetail = atom<string | null>(null);
 
+export interface InstallProgress {
+  phase: 'resolving' | 'downloading' | 'building' | 'installing' | 'done';
+  package: string | null;
+  bytes_done: number | null;
+  bytes_total: number | null;
+}
+
+export const loadingProgress = atom<InstallProgress | null>(null);
+
 export interface ParamsSchema {
   schema: Record<string, any>;
   uiSchema: Record<string, any>;
@@ -33,6 +42,7 @@ export async function initializeStore() {
     isLoading.set(false);
     loadingMessage.set(null);
     loadingDetail.set(null);
+    loadingProgress.set(null);
 
     const status = await api.getStatus();
     console.log('Status response:', status);
@@ -41,19 +51,24 @@ export async function initializeStore() {
       isLoading.set(true);
       loadingMessage.set(status.loading_message || null);
       loadingDetail.set(status.loading_detail || null);
-      startPolling();
+      loadingProgress.set(status.loading_progress || null);
     }
 
     // Get initial games
     const gamesData = await api.getGameInfo();
     games.set(gamesData);
+
+    // While loading or refreshing the cached catalog, poll for catalog changes
+    if (status.is_loading || status.is_refreshing) {
+      startPolling(status.catalog_version);
+    }
   } catch (error) {
     console.error('Error initializing store:', error);
     startPolling();
   }
 }
 
-function startPolling() {
+function startPolling(catalogVersion?: number) {
   let pollInterval = setInterval(async () => {
     try {
       const status = await api.getStatus();
@@ -61,11 +76,16 @@ function startPolling() {
       isLoading.set(status.is_loading);
       loadingMessage.set(status.loading_message || null);
       loadingDetail.set(status.loading_detail || null);
-      const gamesData = await api.getGameInfo();
-      games.set(gamesData);
+      loadingProgress.set(status.loading_progress || null);
+      // Only refetch the games when the server swapped in a new catalog
+      if (status.is_loading || status.catalog_version === undefined || status.catalog_version !== catalogVersion) {
+        catalogVersion = status.catalog_version;
+        const gamesData = await api.getGameInfo();
+        games.set(gamesData);
+      }
 
-      // Stop polling when status is running
-      if (!status.is_loading) {
+      // Stop polling once games are loaded and up to date
+      if (!status.is_loading && !status.is_refreshing) {
         clearInterval(pollInterval);
       }
     } catch (error) {